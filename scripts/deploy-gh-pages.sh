@@ -6,7 +6,6 @@ BRANCH=${BRANCH:-gh-pages}
 REMOTE=${REMOTE:-origin}
 SOURCE_DIR=${SOURCE_DIR:-docs}
 SITE_DIR=${SITE_DIR:-build/html}
-WORKTREE_DIR=${WORKTREE_DIR:-build/.gh-pages-worktree}
 PYTHON_BIN=${PYTHON:-python3}
 COMMIT_MSG=${1:-"Deploy site"}
 
@@ -15,11 +14,6 @@ if ! command -v git >/dev/null 2>&1; then
   exit 1
 fi
 
-if ! command -v rsync >/dev/null 2>&1; then
-  echo "Error: rsync is required but was not found in PATH." >&2
-  exit 1
-fi
-
 if ! command -v "$PYTHON_BIN" >/dev/null 2>&1; then
   echo "Error: '$PYTHON_BIN' was not found in PATH. Set PYTHON to the desired interpreter." >&2
   exit 1
@@ -43,7 +37,17 @@ if [[ ! -d "$SOURCE_DIR" ]]; then
   exit 1
 fi
 
-# Build the static site before touching the gh-pages worktree.
+# Make sure the local branch matches the remote so the deploy builds on it.
+NEW_BRANCH=0
+if ! git show-ref --verify --quiet "refs/heads/$BRANCH"; then
+  if git ls-remote --exit-code "$REMOTE" "$BRANCH" >/dev/null 2>&1; then
+    git fetch "$REMOTE" "$BRANCH:$BRANCH"
+  else
+    NEW_BRANCH=1
+  fi
+fi
+
+# Build the static site; the build records which outputs changed in its manifest.
 "$PYTHON_BIN" -m md2html --src "$SOURCE_DIR" --dst "$SITE_DIR"
 
 if [[ ! -d "$SITE_DIR" ]]; then
@@ -51,50 +55,20 @@ if [[ ! -d "$SITE_DIR" ]]; then
   exit 1
 fi
 
-# Ensure a clean worktree location before re-adding it.
-git worktree remove --force "$WORKTREE_DIR" >/dev/null 2>&1 || true
-rm -rf "$WORKTREE_DIR"
-git worktree prune >/dev/null 2>&1 || true
-
-cleanup() {
-  git worktree remove --force "$WORKTREE_DIR" >/dev/null 2>&1 || true
-  rm -rf "$WORKTREE_DIR"
-}
-trap cleanup EXIT
-
-NEW_BRANCH=0
-if git show-ref --verify --quiet "refs/heads/$BRANCH"; then
-  git worktree add --force "$WORKTREE_DIR" "$BRANCH"
-elif git ls-remote --exit-code "$REMOTE" "$BRANCH" >/dev/null 2>&1; then
-  git fetch "$REMOTE" "$BRANCH:$BRANCH"
-  git worktree add --force "$WORKTREE_DIR" "$BRANCH"
-else
-  NEW_BRANCH=1
-  git worktree add --force "$WORKTREE_DIR" --detach
-  git -C "$WORKTREE_DIR" switch --orphan "$BRANCH"
-fi
-
-# Sync the freshly built site into the gh-pages worktree.
-rsync -av --delete "$SITE_DIR"/ "$WORKTREE_DIR"/
+# Commit only the changed files to the branch (adds .nojekyll and CNAME).
+BEFORE=$(git rev-parse --verify --quiet "refs/heads/$BRANCH" || true)
+"$PYTHON_BIN" -m md2html deploy --site "$SITE_DIR" --repo "$ROOT_DIR" --branch "$BRANCH" --message "$COMMIT_MSG"
+AFTER=$(git rev-parse --verify --quiet "refs/heads/$BRANCH" || true)
 
-touch "$WORKTREE_DIR/.nojekyll"
-
-if [[ -f "$ROOT_DIR/CNAME" ]]; then
-  cp "$ROOT_DIR/CNAME" "$WORKTREE_DIR/CNAME"
-fi
-
-if [[ -z $(git -C "$WORKTREE_DIR" status --porcelain) ]]; then
+if [[ "$BEFORE" == "$AFTER" ]]; then
   echo "No changes to deploy." >&2
   exit 0
 fi
 
-git -C "$WORKTREE_DIR" add --all
-git -C "$WORKTREE_DIR" commit -m "$COMMIT_MSG"
-
 if [[ $NEW_BRANCH -eq 1 ]]; then
-  git -C "$WORKTREE_DIR" push --set-upstream "$REMOTE" "$BRANCH"
+  git push --set-upstream "$REMOTE" "$BRANCH"
 else
-  git -C "$WORKTREE_DIR" push "$REMOTE" "$BRANCH"
+  git push "$REMOTE" "$BRANCH"
 fi
 
 echo "Deployment complete."
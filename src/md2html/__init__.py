@@ -1,8 +1,19 @@
 """Markdown to HTML conversion package."""
 
-from .converter import convert_docs_directory
-from .theme import ThemeManager, ThemeNotFoundError
-from .config import AppConfig, load_config
+from __future__ import annotations
+
+from importlib import import_module
+from typing import Any
+
+# Public names are resolved lazily so that `md2html --help`, daemon-forwarded
+# builds and other short-lived entry points do not import the rendering stack.
+_LAZY_EXPORTS = {
+    "convert_docs_directory": ".converter",
+    "ThemeManager": ".theme",
+    "ThemeNotFoundError": ".theme",
+    "AppConfig": ".config",
+    "load_config": ".config",
+}
 
 __all__ = [
     "convert_docs_directory",
@@ -11,3 +22,16 @@ __all__ = [
     "AppConfig",
     "load_config",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
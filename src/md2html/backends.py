@@ -0,0 +1,599 @@
+"""Markdown parser backends feeding :class:`~md2html.converter.MarkdownRenderer`.
+
+Every backend turns a Markdown body into a markdown-it token stream, so hide
+filtering, heading ids, the TOC and deferred hide bodies work the same way
+whichever parser ran. ``markdown-it`` is the reference implementation.
+``cmark-gfm`` hands each run of plain Markdown to the C library and wraps the
+resulting HTML in block tokens: ``:::`` containers are split off beforehand
+and headings, task lists and table alignment are rebuilt afterwards.
+``!include`` lines are split off the same way. Documents whose containers or
+includes cannot be split safely fall back to markdown-it.
+"""
+
+from __future__ import annotations
+
+import abc
+import argparse
+import difflib
+import functools
+import logging
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Mapping, Match, Optional, Pattern, Sequence, Tuple, Union
+
+from .includes import INCLUDE_LINE, INCLUDE_TOKEN
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from markdown_it import MarkdownIt  # type: ignore[import]
+    from markdown_it.token import Token  # type: ignore[import]
+
+MARKDOWN_BACKENDS = ("markdown-it", "cmark-gfm")
+DEFAULT_MARKDOWN_BACKEND = "markdown-it"
+
+logger = logging.getLogger(__name__)
+
+ContainerValidator = Callable[[str, str], bool]
+
+_INDENT = re.compile(r"[ \t]*")
+_CONTAINER_MARKER = re.compile(r":{3,}")
+_FENCE_OPEN = re.compile(r"(`{3,}|~{3,})(.*)")
+# Container markers the line splitter cannot place: inside quotes, lists or indented.
+_NESTED_MARKER = re.compile(
+    r"^(?:[ \t]*(?:>|[*+-][ \t]|\d{1,9}[.)][ \t]))+[ \t]*(?::{3,}|!include[ \t])|^[ \t]+(?::{3,}|!include[ \t])",
+    re.MULTILINE,
+)
+_REFERENCE_DEFINITION = re.compile(r"^ {0,3}\[[^\]\n]+\]:[ \t]*\S.*$", re.MULTILINE)
+_ATX_HEADING = re.compile(r"#{1,6}(?:[ \t]|$)")
+_SOURCEPOS_TAG = re.compile(r'<([a-z][a-z0-9]*)([^<>]*?) data-sourcepos="(\d+):(\d+)-(\d+):(\d+)"([^<>]*)>')
+_SOURCEPOS_ATTRIBUTE = re.compile(r' data-sourcepos="[^"]*"')
+_TASK_CHECKBOX = re.compile(r'<input type="checkbox"( checked="")? disabled="" /> (\n<p[^>]*>)?')
+_BLOCK_END = re.compile(r"(?:</(?:pre|ul|ol|li|blockquote|table|p|h[1-6])>|<hr />|<li[^>]*>)$")
+_CELL_ALIGN = re.compile(r' align="(left|center|right)"')
+# Blocks whose contents markdown-it wraps in an inline token one level deeper.
+_LEAF_BLOCKS = {"p", "h1", "h2", "h3", "h4", "h5", "h6", "th", "td"}
+
+
+class BackendUnavailableError(RuntimeError):
+    """Raised when the configured backend's optional package is not installed."""
+
+
+def _indent_width(line: str) -> int:
+    width = 0
+    for character in _INDENT.match(line).group():  # type: ignore[union-attr]
+        width = width + 4 - width % 4 if character == "\t" else width + 1
+    return width
+
+
+@dataclass
+class _Container:
+    name: str
+    markup: str
+    info: str
+    line: int
+    children: List["_Segment"] = field(default_factory=list)
+
+
+@dataclass
+class _Text:
+    lines: List[str]
+    first_line: int
+    open_fence: bool = False
+
+
+@dataclass
+class _Include:
+    argument: str
+    line: int
+
+
+_Segment = Union[_Text, _Container, _Include]
+
+
+def split_containers(lines: Sequence[str], validators: Mapping[str, ContainerValidator], first_line: int = 0) -> List[_Segment]:
+    """Split top-level ``:::`` containers and ``!include`` lines off ``lines`` the way markdown-it would.
+
+    Mirrors mdit_py_plugins' container rule: the first bare marker line at
+    least as long as the opening one closes a container, even inside code,
+    and an unclosed container runs to the end of its parent. Fenced code
+    outside containers is skipped so examples of the syntax stay code.
+    """
+
+    segments: List[_Segment] = []
+    text: List[str] = []
+    text_start = first_line
+    fence: Optional[Tuple[str, int]] = None
+    html_end: Optional[Pattern[str]] = None
+    index = 0
+
+    def flush(next_line: int) -> None:
+        nonlocal text, text_start
+        if text:
+            segments.append(_Text(text, text_start, open_fence=fence is not None))
+        text = []
+        text_start = next_line
+
+    while index < len(lines):
+        line = lines[index]
+        indent = _indent_width(line)
+        stripped = line.strip()
+        if fence is not None:
+            character, length = fence
+            if indent < 4 and stripped.startswith(character * length) and not stripped.strip(character):
+                fence = None
+            text.append(line)
+            index += 1
+            continue
+        if html_end is not None:
+            # Blocks that end at a blank line stop before it.
+            if html_end.search(line.lstrip(" \t")):
+                html_end = None
+                if not stripped:
+                    continue
+            text.append(line)
+            index += 1
+            continue
+        opening = _container_opening(line, indent, validators)
+        if opening is not None:
+            name, markup, info = opening
+            close = _container_close(lines, index + 1, len(markup))
+            flush(first_line + index)
+            container = _Container(name, markup, info, first_line + index)
+            container.children = split_containers(lines[index + 1:close], validators, first_line + index + 1)
+            segments.append(container)
+            index = close + 1
+            text_start = first_line + index
+            continue
+        include = INCLUDE_LINE.match(line) if indent == 0 else None
+        if include is not None:
+            flush(first_line + index)
+            segments.append(_Include(include.group(1), first_line + index))
+            index += 1
+            text_start = first_line + index
+            continue
+        if indent < 4:
+            match = _FENCE_OPEN.match(stripped)
+            if match and not (match.group(1)[0] == "`" and "`" in match.group(2)):
+                fence = (match.group(1)[0], len(match.group(1)))
+            elif stripped.startswith("<"):
+                in_paragraph = bool(text) and bool(text[-1].strip())
+                for start, end, interrupts_paragraph in _html_sequences():
+                    if start.search(stripped) and (interrupts_paragraph or not in_paragraph):
+                        if not end.search(stripped):
+                            html_end = end
+                        break
+        text.append(line)
+        index += 1
+    flush(first_line + index)
+    return segments
+
+
+@functools.lru_cache(maxsize=None)
+def _html_sequences() -> Tuple[Tuple[Pattern[str], Pattern[str], bool], ...]:
+    # The same start and end conditions markdown-it uses for raw HTML blocks.
+    from markdown_it.rules_block.html_block import HTML_SEQUENCES  # type: ignore[import]
+
+    return tuple((start, end, bool(interrupts)) for start, end, interrupts in HTML_SEQUENCES)
+
+
+def _container_opening(line: str, indent: int, validators: Mapping[str, ContainerValidator]) -> Optional[Tuple[str, str, str]]:
+    if indent >= 4:
+        return None
+    body = line.lstrip(" \t")
+    match = _CONTAINER_MARKER.match(body)
+    if match is None:
+        return None
+    markup = match.group()
+    info = body[len(markup):]
+    for name, validate in validators.items():
+        if validate(info, markup):
+            return name, markup, info
+    return None
+
+
+def _container_close(lines: Sequence[str], start: int, length: int) -> int:
+    for index in range(start, len(lines)):
+        line = lines[index]
+        if _indent_width(line) >= 4:
+            continue
+        body = line.strip()
+        match = _CONTAINER_MARKER.match(body)
+        if match is not None and len(match.group()) >= length and match.end() == len(body):
+            return index
+    return len(lines)
+
+
+def _join_tight_code(html: str) -> str:
+    """Drop the newline cmark puts between a tight list item's text and a code block.
+
+    markdown-it renders code right after the hidden paragraph, so both
+    backends produce the same bytes.
+    """
+
+    parts: List[str] = []
+    position = 0
+    enclosing: List[Tuple[Tuple[int, int], str]] = []
+    for match in _SOURCEPOS_TAG.finditer(html):
+        start = (int(match.group(3)), int(match.group(4)))
+        while enclosing and enclosing[-1][0] < start:
+            enclosing.pop()
+        if match.group(1) == "pre" and enclosing and enclosing[-1][1] == "li":
+            line_start = html.rfind("\n", 0, match.start() - 1) + 1
+            text = html[line_start:match.start() - 1]
+            if html[match.start() - 1] == "\n" and text.strip() and not _BLOCK_END.search(text):
+                parts.append(html[position:match.start() - 1])
+                position = match.start()
+        enclosing.append(((int(match.group(5)), int(match.group(6))), match.group(1)))
+    if not parts:
+        return html
+    parts.append(html[position:])
+    return "".join(parts)
+
+
+def _heading_content(lines: Sequence[str], start_line: int, start_column: int, end_line: int) -> str:
+    """Return the raw source of a heading, as markdown-it stores it on the inline token."""
+
+    first = lines[start_line].encode("utf-8")[start_column:].decode("utf-8", "replace")
+    if _ATX_HEADING.match(first):
+        content = first.lstrip("#").strip(" \t")
+        trimmed = content.rstrip("#")
+        if trimmed != content and (not trimmed or trimmed[-1] in " \t"):
+            content = trimmed
+        return content.strip()
+    # Setext: every line but the underline.
+    return "\n".join([first, *lines[start_line + 1:end_line]]).strip()
+
+
+class MarkdownBackend(abc.ABC):
+    """Parse a Markdown body into the markdown-it tokens the renderer consumes."""
+
+    name = ""
+
+    def __init__(self, md: MarkdownIt, validators: Mapping[str, ContainerValidator]) -> None:
+        self.md = md
+        self.validators = dict(validators)
+
+    @abc.abstractmethod
+    def parse(self, body: str, env: Dict[str, Any]) -> List[Token]:
+        """Return the block tokens of ``body``; ``env`` is the markdown-it environment."""
+
+    def fingerprint(self) -> str:
+        """Identify the backend and version for fragment cache keys."""
+
+        return self.name
+
+
+class MarkdownItBackend(MarkdownBackend):
+    """The pure Python reference parser."""
+
+    name = "markdown-it"
+
+    def parse(self, body: str, env: Dict[str, Any]) -> List[Token]:
+        return self.md.parse(body, env)
+
+
+class CmarkGfmBackend(MarkdownBackend):
+    """Parse with the C implementation of GitHub Flavored Markdown (``cmarkgfm``)."""
+
+    name = "cmark-gfm"
+
+    def __init__(self, md: MarkdownIt, validators: Mapping[str, ContainerValidator]) -> None:
+        super().__init__(md, validators)
+        try:
+            import cmarkgfm  # type: ignore[import]
+            from cmarkgfm.cmark import Options  # type: ignore[import]
+        except ImportError as exc:
+            raise BackendUnavailableError("The cmark-gfm backend requires the optional 'cmarkgfm' package") from exc
+        from markdown_it.token import Token  # type: ignore[import]
+
+        self._token = Token
+        self._version = getattr(cmarkgfm, "__version__", "")
+        options = Options.CMARK_OPT_UNSAFE | Options.CMARK_OPT_SOURCEPOS
+        self._to_html = lambda text: cmarkgfm.markdown_to_html_with_extensions(
+            text, options=options, extensions=["table", "tasklist"]
+        )
+
+    def fingerprint(self) -> str:
+        return f"{self.name}:{self._version}"
+
+    def parse(self, body: str, env: Dict[str, Any]) -> List[Token]:
+        lines = body.split("\n")
+        if _NESTED_MARKER.search(body) or lines[0].rstrip() == "---":
+            # Containers and includes inside quotes or lists, and a second
+            # front matter block, need markdown-it's own block parser.
+            logger.debug("Parsing with markdown-it: the container layout cannot be split by line")
+            return self.md.parse(body, env)
+        segments = split_containers(lines, self.validators)
+        if len(segments) == 1 and isinstance(segments[0], _Text):
+            references = ""
+        else:
+            # markdown-it resolves references across the whole document.
+            references = "\n".join(_REFERENCE_DEFINITION.findall(body))
+        tokens: List[Token] = []
+        self._emit(segments, lines, references, 0, tokens)
+        return tokens
+
+    def _emit(self, segments: List[_Segment], lines: List[str], references: str, level: int, tokens: List[Token]) -> None:
+        for segment in segments:
+            if isinstance(segment, _Text):
+                text = "\n".join(segment.lines)
+                if references and not segment.open_fence:
+                    text = f"{text}\n\n{references}"
+                self._emit_html(self._to_html(text), lines, segment.first_line, level, tokens)
+                continue
+            if isinstance(segment, _Include):
+                include = self._token(INCLUDE_TOKEN, "", 0)
+                include.markup = "!include"
+                include.info = segment.argument
+                include.block = True
+                include.level = level
+                include.map = [segment.line, segment.line + 1]
+                tokens.append(include)
+                continue
+            opening = self._token(f"container_{segment.name}_open", "div", 1)
+            opening.markup = segment.markup
+            opening.info = segment.info
+            opening.block = True
+            opening.level = level
+            opening.map = [segment.line, segment.line + 1]
+            tokens.append(opening)
+            self._emit(segment.children, lines, references, level + 1, tokens)
+            closing = self._token(f"container_{segment.name}_close", "div", -1)
+            closing.markup = segment.markup
+            closing.block = True
+            closing.level = level
+            tokens.append(closing)
+
+    def _emit_html(self, html: str, lines: List[str], first_line: int, level: int, tokens: List[Token]) -> None:
+        """Turn cmark's HTML into ``html_block`` tokens around real heading tokens."""
+
+        html = _join_tight_code(self._adapt_task_lists(html))
+        html = _CELL_ALIGN.sub(r' style="text-align:\1"', html)
+        position = 0
+        deepest = 0
+        open_ends: List[Tuple[int, int]] = []
+        for match in _SOURCEPOS_TAG.finditer(html):
+            tag = match.group(1)
+            start = (int(match.group(3)), int(match.group(4)))
+            end = (int(match.group(5)), int(match.group(6)))
+            while open_ends and open_ends[-1] < start:
+                open_ends.pop()
+            depth = len(open_ends) + (2 if tag == "li" else 1 if tag in _LEAF_BLOCKS else 0)
+            deepest = max(deepest, depth)
+            open_ends.append(end)
+            if tag[0] != "h" or not tag[1:].isdigit():
+                continue
+            closing = html.index(f"</{tag}>", match.end())
+            self._push_html(html[position:match.start()], level, deepest, tokens)
+            deepest = 0
+            heading_level = level + len(open_ends) - 1
+            heading = self._token("heading_open", tag, 1)
+            heading.markup = "#" * int(tag[1])
+            heading.block = True
+            heading.level = heading_level
+            inline = self._token("inline", "", 0)
+            # cmark ends a setext heading at column 0 of the next line when a
+            # blank line follows its underline.
+            last_line = end[0] - 1 if end[1] == 0 else end[0]
+            inline.content = _heading_content(lines, first_line + start[0] - 1, start[1] - 1, first_line + last_line - 1)
+            inline.level = heading_level + 1
+            inline.block = True
+            child = self._token("html_inline", "", 0)
+            child.content = _SOURCEPOS_ATTRIBUTE.sub("", html[match.end():closing])
+            inline.children = [child]
+            close = self._token("heading_close", tag, -1)
+            close.markup = heading.markup
+            close.block = True
+            close.level = heading_level
+            tokens.extend((heading, inline, close))
+            position = closing + len(f"</{tag}>")
+            if html.startswith("\n", position):
+                position += 1
+        self._push_html(html[position:], level, deepest, tokens)
+
+    def _push_html(self, html: str, level: int, deepest: int, tokens: List[Token]) -> None:
+        if not html:
+            return
+        token = self._token("html_block", "", 0)
+        token.content = _SOURCEPOS_ATTRIBUTE.sub("", html)
+        token.block = True
+        # The deepest markdown-it level this HTML stands for, for the nesting limit.
+        token.level = level + deepest
+        tokens.append(token)
+
+    @staticmethod
+    def _adapt_task_lists(html: str) -> str:
+        """Rewrite cmark's task list items into the markup of markdown-it's tasklists plugin."""
+
+        if '<input type="checkbox"' not in html:
+            return html
+        lists: List[Tuple[int, Tuple[int, int], Tuple[int, int]]] = []
+        edits: Dict[int, Tuple[int, str]] = {}
+        for match in _SOURCEPOS_TAG.finditer(html):
+            tag = match.group(1)
+            start = (int(match.group(3)), int(match.group(4)))
+            end = (int(match.group(5)), int(match.group(6)))
+            if tag in ("ul", "ol"):
+                lists.append((match.start(), start, end))
+                continue
+            checkbox = _TASK_CHECKBOX.match(html, match.end()) if tag == "li" else None
+            if checkbox is None:
+                continue
+            parents = [offset for offset, first, last in lists if first <= start <= last]
+            if parents:
+                # Mark the innermost list; "<ul" and "<ol" are three characters long.
+                edits[max(parents) + 3] = (max(parents) + 3, ' class="contains-task-list"')
+            checked = ' checked="checked"' if checkbox.group(1) else ""
+            paragraph = f"\n{checkbox.group(2)[1:]}" if checkbox.group(2) else ""
+            edits[match.start()] = (
+                checkbox.end(),
+                f'<li class="task-list-item enabled"{match.group(2)}{match.group(7)}>{paragraph}'
+                f'<input class="task-list-item-checkbox"{checked}  type="checkbox"> ',
+            )
+        parts: List[str] = []
+        position = 0
+        for offset in sorted(edits):
+            stop, replacement = edits[offset]
+            parts.append(html[position:offset])
+            parts.append(replacement)
+            position = stop
+        parts.append(html[position:])
+        return "".join(parts)
+
+
+_BACKENDS = {backend.name: backend for backend in (MarkdownItBackend, CmarkGfmBackend)}
+
+
+def create_backend(name: str, md: MarkdownIt, validators: Mapping[str, ContainerValidator]) -> MarkdownBackend:
+    try:
+        backend = _BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown Markdown backend {name!r}; choose one of {', '.join(MARKDOWN_BACKENDS)}") from None
+    return backend(md, validators)
+
+
+@dataclass
+class BackendComparison:
+    """Throughput of each backend and the documents whose HTML differs from the first."""
+
+    seconds: Dict[str, float]
+    total_bytes: int
+    documents: int
+    differences: Dict[str, Dict[str, List[str]]] = field(default_factory=dict)
+
+    def throughput(self, backend: str) -> float:
+        """Source megabytes rendered per second."""
+
+        seconds = self.seconds[backend]
+        return self.total_bytes / seconds / 1024 / 1024 if seconds else float("inf")
+
+
+def compare_backends(
+    documents: Mapping[str, str],
+    backends: Sequence[str],
+    *,
+    theme: Any,
+    repeat: int = 1,
+    root: Optional[Path] = None,
+) -> BackendComparison:
+    """Render ``documents`` (name -> Markdown) with every backend.
+
+    Names are relative to ``root``, which ``!include`` directives resolve against.
+
+    The first backend is the reference: any other backend whose fragment HTML
+    differs for a document gets a unified diff under ``differences``.
+    Timings cover the fragment stage only (parse, post-processing, render).
+    """
+
+    from .converter import MarkdownRenderer
+
+    outputs: Dict[str, Dict[str, str]] = {}
+    seconds: Dict[str, float] = {}
+    for name in backends:
+        renderer = MarkdownRenderer(theme, markdown_backend=name, include_root=root)
+        rendered: Dict[str, str] = {}
+        best = float("inf")
+        for _ in range(max(repeat, 1)):
+            started = time.perf_counter()
+            for document, text in documents.items():
+                try:
+                    source_path = root / document if root is not None else Path(document)
+                    rendered[document] = renderer.render_fragment(text, source_path=source_path).html
+                except Exception as exc:  # pylint: disable=broad-except
+                    rendered[document] = f"<error: {type(exc).__name__}: {exc}>\n"
+            best = min(best, time.perf_counter() - started)
+        outputs[name] = rendered
+        seconds[name] = best
+
+    comparison = BackendComparison(
+        seconds=seconds,
+        total_bytes=sum(len(text.encode("utf-8")) for text in documents.values()),
+        documents=len(documents),
+    )
+    reference, *others = backends
+    for name in others:
+        for document in documents:
+            expected = outputs[reference][document]
+            actual = outputs[name][document]
+            if expected != actual:
+                diff = difflib.unified_diff(
+                    expected.splitlines(keepends=True),
+                    actual.splitlines(keepends=True),
+                    fromfile=f"{document} ({reference})",
+                    tofile=f"{document} ({name})",
+                )
+                comparison.differences.setdefault(name, {})[document] = list(diff)
+    return comparison
+
+
+def build_argument_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="md2html compare-backends",
+        description="Diff the HTML of Markdown backends over a directory and compare their throughput.",
+    )
+    parser.add_argument("--src", dest="source_dir", default="docs", help="Directory of Markdown files (default: docs)")
+    parser.add_argument(
+        "--backend",
+        dest="backends",
+        action="append",
+        choices=MARKDOWN_BACKENDS,
+        help="Backend to compare, repeatable; the first is the reference (default: all)",
+    )
+    parser.add_argument("--theme", default="github", help="Theme providing container titles (default: github)")
+    parser.add_argument("--repeat", type=int, default=3, help="Keep the best of this many timed passes (default: 3)")
+    parser.add_argument("--show-diff", type=int, default=5, metavar="N", help="Print diffs for up to N documents (default: 5)")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Exit with 1 when any backend's HTML differs from the reference."""
+
+    from .includes import is_partial
+    from .theme import ThemeManager
+    from .utils import is_markdown_file, parse_front_matter
+
+    args = build_argument_parser().parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="[%(levelname)s] %(message)s")
+    source_dir = Path(args.source_dir)
+    documents: Dict[str, str] = {}
+    for path in sorted(source_dir.rglob("*")):
+        if path.is_file() and is_markdown_file(path) and not is_partial(path):
+            try:
+                text = path.read_text(encoding="utf-8")
+                parse_front_matter(text)
+            except (OSError, ValueError) as exc:
+                logging.warning("Skipping %s: %s", path, exc)
+                continue
+            documents[path.relative_to(source_dir).as_posix()] = text
+    if not documents:
+        logging.error("No Markdown files found under %s", source_dir)
+        return 1
+
+    backends = args.backends or list(MARKDOWN_BACKENDS)
+    try:
+        comparison = compare_backends(
+            documents, backends, theme=ThemeManager().load(args.theme), repeat=args.repeat, root=source_dir
+        )
+    except BackendUnavailableError as exc:
+        logging.error("%s", exc)
+        return 1
+
+    reference = backends[0]
+    print(f"{comparison.documents} documents, {comparison.total_bytes / 1024:.1f} KB of Markdown")
+    for name in backends:
+        speedup = comparison.seconds[reference] / comparison.seconds[name] if comparison.seconds[name] else float("inf")
+        differing = len(comparison.differences.get(name, {}))
+        print(
+            f"  {name:<12} {comparison.seconds[name] * 1000:9.1f} ms  {comparison.throughput(name):7.2f} MB/s  "
+            f"x{speedup:.2f}  {differing} differing"
+        )
+    shown = 0
+    for name, documents_diff in comparison.differences.items():
+        for diff in documents_diff.values():
+            if shown >= args.show_diff:
+                break
+            sys.stdout.writelines(diff)
+            shown += 1
+    return 1 if comparison.differences else 0
@@ -0,0 +1,102 @@
+"""In-memory caches shared between builds."""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Generic, Hashable, Optional, TypeVar
+
+V = TypeVar("V")
+
+
+def content_hash(text: str) -> str:
+    """Return a stable digest of ``text`` suitable for content addressing."""
+
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+class LRUCache(Generic[V]):
+    """Thread-safe least recently used cache bounded by entries and optional weight."""
+
+    def __init__(
+        self,
+        max_entries: int,
+        *,
+        max_weight: Optional[int] = None,
+        weigher: Optional[Callable[[V], int]] = None,
+    ) -> None:
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        self.max_entries = max_entries
+        self.max_weight = max_weight
+        self._weigher = weigher
+        self._entries: "OrderedDict[Hashable, V]" = OrderedDict()
+        self._weights: dict[Hashable, int] = {}
+        self._total_weight = 0
+        self._lock = threading.Lock()
+        self.stats = CacheStats()
+
+    def get(self, key: Hashable) -> Optional[V]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: V) -> None:
+        weight = self._weigher(value) if self._weigher else 0
+        with self._lock:
+            if key in self._entries:
+                self._discard(key)
+            if self.max_weight is not None and weight > self.max_weight:
+                return
+            self._entries[key] = value
+            self._weights[key] = weight
+            self._total_weight += weight
+            self._evict()
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._discard(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._weights.clear()
+            self._total_weight = 0
+
+    @property
+    def weight(self) -> int:
+        return self._total_weight
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._entries
+
+    def _discard(self, key: Hashable) -> None:
+        del self._entries[key]
+        self._total_weight -= self._weights.pop(key, 0)
+
+    def _evict(self) -> None:
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_weight is not None and self._total_weight > self.max_weight)
+        ):
+            key, _ = self._entries.popitem(last=False)
+            self._total_weight -= self._weights.pop(key, 0)
+            self.stats.evictions += 1
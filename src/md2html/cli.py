@@ -8,9 +8,10 @@ import sys
 from pathlib import Path
 from typing import Any, Dict, Optional
 
+from .backends import MARKDOWN_BACKENDS
 from .config import AppConfig, load_config
-from .converter import convert_docs_directory
-from .theme import ThemeManager
+from .navigation import NAV_SORT_KEYS, NAV_SORT_ORDERS
+from .watcher import WATCH_BACKENDS
 
 LOG_FORMAT = "[%(levelname)s] %(message)s"
 
@@ -26,8 +27,47 @@ def build_argument_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="Exclude all ::: hide blocks from output HTML",
     )
+    parser.add_argument(
+        "--defer-hide",
+        dest="defer_hide_threshold",
+        help="Emit ::: hide bodies of at least this size (e.g. 4KB, 0 for all) in a <template> attached on first expand",
+    )
+    parser.add_argument(
+        "--minify-html",
+        dest="minify_html",
+        action="store_true",
+        help="Strip comments and collapsible whitespace from pages, keeping <pre>, <code> and <textarea> as is",
+    )
+    parser.add_argument(
+        "--no-lazy-images",
+        dest="lazy_images",
+        action="store_false",
+        default=None,
+        help="Do not add width/height, loading=lazy and decoding=async to local images",
+    )
+    parser.add_argument(
+        "--image-cache",
+        dest="image_cache",
+        help="File remembering image sizes between builds (default: .md2html-images.json in the output directory)",
+    )
+    parser.add_argument(
+        "--paginate-level",
+        dest="paginate_level",
+        type=int,
+        help="Split documents into one page per heading of this level or higher (1-6, 0 to disable)",
+    )
+    parser.add_argument(
+        "--paginate-threshold",
+        dest="paginate_threshold",
+        help="Only paginate documents of at least this size (e.g. 64KB, default: 0 for all)",
+    )
     parser.add_argument("--src", dest="source_dir", help="Source directory containing markdown files")
     parser.add_argument("--dst", dest="output_dir", help="Destination directory for generated HTML")
+    parser.add_argument(
+        "--archive",
+        dest="archive",
+        help="Write the site into a single .tar, .tar.gz, .tar.zst or .zip archive instead of --dst",
+    )
     parser.add_argument("--theme", dest="theme", help="Theme name or path to use")
     parser.add_argument(
         "--theme-dir",
@@ -59,6 +99,105 @@ def build_argument_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="Watch source directory and rebuild on file changes",
     )
+    parser.add_argument(
+        "--watch-backend",
+        dest="watch_backend",
+        choices=WATCH_BACKENDS,
+        help="File watching backend: native OS events or stat polling for NFS/container mounts (default: native)",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        dest="poll_interval",
+        type=float,
+        help="Seconds between scans with --watch-backend polling (default: 1.0)",
+    )
+    parser.add_argument(
+        "--markdown-backend",
+        dest="markdown_backend",
+        choices=MARKDOWN_BACKENDS,
+        help="Markdown parser; cmark-gfm needs the optional cmarkgfm package (default: markdown-it)",
+    )
+    parser.add_argument(
+        "--max-document-size",
+        dest="max_document_size",
+        help="Replace Markdown files larger than this (e.g. 4MB, 0 for no limit) with an error page (default: 16MB)",
+    )
+    parser.add_argument(
+        "--max-nesting-depth",
+        dest="max_nesting_depth",
+        type=int,
+        help="Deepest block nesting (quotes, lists, containers) a document may use (default: 20)",
+    )
+    parser.add_argument(
+        "--render-timeout",
+        dest="render_timeout",
+        type=float,
+        help="Seconds a suspect document may take in its isolated render worker, 0 to render in-process (default: 30)",
+    )
+    parser.add_argument(
+        "--io-threads",
+        dest="io_threads",
+        type=int,
+        help="Threads reading sources ahead of rendering and writing outputs behind it, 0 for a serial build (default: 4)",
+    )
+    parser.add_argument(
+        "--pipeline-depth",
+        dest="pipeline_depth",
+        type=int,
+        help="Sources and outputs each build stage may hold in memory (default: 16)",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        dest="metrics_file",
+        help="Write build counters and timings as JSON to this file after every build",
+    )
+    parser.add_argument(
+        "--weight-report",
+        dest="weight_report",
+        help="Write a per-page output size report (content, navigation, TOC, inline CSS/JS) as JSON",
+    )
+    parser.add_argument("--page-budget", dest="page_budget", help="Fail the build if any page exceeds this size, e.g. 300KB")
+    parser.add_argument("--site-budget", dest="site_budget", help="Fail the build if the whole site exceeds this size, e.g. 50MB")
+    parser.add_argument(
+        "--service-worker",
+        dest="service_worker",
+        action="store_true",
+        help="Generate sw.js with a hashed precache manifest for offline and instant repeat visits",
+    )
+    parser.add_argument(
+        "--service-worker-cache-size",
+        dest="service_worker_cache_size",
+        help="Largest total size the service worker precaches on install, e.g. 20MB (default: 50MB)",
+    )
+    parser.add_argument(
+        "--variant",
+        action="append",
+        dest="variants",
+        help="Build the named variant from the configuration file (can be supplied multiple times)",
+    )
+    parser.add_argument(
+        "--all-variants",
+        dest="all_variants",
+        action="store_true",
+        help="Build every configured variant from a single scan of the sources",
+    )
+    parser.add_argument(
+        "--shard",
+        dest="shard",
+        help="Build only shard i of n (e.g. 2/4); combine the outputs with `md2html merge-shards`",
+    )
+    parser.add_argument(
+        "--nav-sort",
+        dest="nav_sort",
+        choices=NAV_SORT_KEYS,
+        help="Navigation order: file name, modification time, front matter order/weight, or last git commit time",
+    )
+    parser.add_argument(
+        "--nav-order",
+        dest="nav_order",
+        choices=NAV_SORT_ORDERS,
+        help="Navigation sort direction (default: asc)",
+    )
     parser.add_argument(
         "--site-title",
         dest="site_title",
@@ -69,6 +208,12 @@ def build_argument_parser() -> argparse.ArgumentParser:
         dest="site_description",
         help="Override site description metadata for templates",
     )
+    parser.add_argument(
+        "--no-daemon",
+        dest="use_daemon",
+        action="store_false",
+        help="Always build in-process, even when a build daemon is running",
+    )
     parser.add_argument(
         "--verbose",
         dest="verbose",
@@ -78,18 +223,46 @@ def build_argument_parser() -> argparse.ArgumentParser:
     return parser
 
 
-def resolve_configuration(args: argparse.Namespace) -> AppConfig:
+def resolve_configuration(args: argparse.Namespace, *, cwd: Optional[Path] = None) -> AppConfig:
+    cwd = cwd or Path.cwd()
     cli_updates: Dict[str, Any] = {}
     if getattr(args, "exclude_hide", False):
         cli_updates["exclude_hide"] = True
     config = AppConfig()
 
-    config_path = Path(args.config).resolve() if args.config else None
+    config_path = (cwd / args.config).resolve() if args.config else None
+    config.config_path = config_path
     file_payload = load_config(config_path)
-    base_path = config_path.parent if config_path else Path.cwd()
+    base_path = config_path.parent if config_path else cwd
     config.apply_updates(file_payload, base_path=base_path)
 
-    for key in ("source_dir", "output_dir", "theme", "theme_dirs"):
+    for key in (
+        "source_dir",
+        "output_dir",
+        "archive",
+        "theme",
+        "theme_dirs",
+        "shard",
+        "nav_sort",
+        "nav_order",
+        "watch_backend",
+        "markdown_backend",
+        "poll_interval",
+        "metrics_file",
+        "weight_report",
+        "image_cache",
+        "page_budget",
+        "site_budget",
+        "service_worker_cache_size",
+        "defer_hide_threshold",
+        "paginate_level",
+        "paginate_threshold",
+        "max_document_size",
+        "max_nesting_depth",
+        "render_timeout",
+        "io_threads",
+        "pipeline_depth",
+    ):
         value = getattr(args, key, None)
         if value is not None:
             cli_updates[key] = value
@@ -100,8 +273,14 @@ def resolve_configuration(args: argparse.Namespace) -> AppConfig:
         cli_updates["copy_static"] = args.copy_static
     if getattr(args, "watch", None):
         cli_updates["watch"] = True
+    if getattr(args, "service_worker", None):
+        cli_updates["service_worker"] = True
+    if getattr(args, "minify_html", None):
+        cli_updates["minify_html"] = True
+    if getattr(args, "lazy_images", None) is not None:
+        cli_updates["lazy_images"] = args.lazy_images
 
-    config.apply_updates(cli_updates, base_path=Path.cwd())
+    config.apply_updates(cli_updates, base_path=cwd)
 
     if getattr(args, "site_title", None):
         config.metadata["title"] = args.site_title
@@ -112,20 +291,60 @@ def resolve_configuration(args: argparse.Namespace) -> AppConfig:
 
 
 def main(argv: Optional[list[str]] = None) -> int:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if argv and argv[0] == "daemon":
+        from .daemon import main as daemon_main
+
+        return daemon_main(argv[1:])
+    if argv and argv[0] == "merge-shards":
+        from .shards import main as merge_main
+
+        return merge_main(argv[1:])
+    if argv and argv[0] == "deploy":
+        from .deploy import main as deploy_main
+
+        return deploy_main(argv[1:])
+    if argv and argv[0] == "compare-backends":
+        from .backends import main as compare_main
+
+        return compare_main(argv[1:])
+
     parser = build_argument_parser()
     args = parser.parse_args(argv)
 
+    # The daemon also declines builds whose configuration file turns on watch mode.
+    if args.use_daemon and not (args.watch or args.variants or args.all_variants):
+        from .daemon import forward_build
+
+        status = forward_build(argv)
+        if status is not None:
+            return status
+
     logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format=LOG_FORMAT)
 
     try:
+        from .converter import build_variants, convert_docs_directory
+        from .theme import ThemeManager
+
         config = resolve_configuration(args)
         logging.debug("Resolved configuration: %s", config)
-        convert_docs_directory(config, theme_manager=ThemeManager(config.theme_dirs))
+        theme_manager = ThemeManager(config.theme_dirs)
+        if args.variants or args.all_variants:
+            if config.watch:
+                raise ValueError("--watch cannot be combined with variant builds")
+            results = build_variants(config, args.variants, theme_manager=theme_manager)
+        else:
+            results = convert_docs_directory(
+                config,
+                theme_manager=theme_manager,
+                reload_config=lambda: resolve_configuration(args),
+            )
     except Exception as exc:  # pylint: disable=broad-except
         logging.error("md2html failed: %s", exc)
         return 1
 
-    return 0
+    # The rest of the site was written; still fail so CI notices the error pages.
+    return 1 if any(result.error for result in results) else 0
 
 
 if __name__ == "__main__":
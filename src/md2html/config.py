@@ -2,15 +2,22 @@
 
 from __future__ import annotations
 
+import copy
 import logging
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, Iterable, Mapping, Optional
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
 
-import yaml  # type: ignore[import]
+from .backends import DEFAULT_MARKDOWN_BACKEND, MARKDOWN_BACKENDS
+from .navigation import NAV_SORT_KEYS, NAV_SORT_ORDERS
+from .utils import parse_size
+from .watcher import WATCH_BACKENDS
 
 logger = logging.getLogger(__name__)
 
+# Settings holding a single path, resolved against the configuration file's directory.
+_PATH_SETTINGS = frozenset({"source_dir", "output_dir", "archive", "metrics_file", "weight_report", "image_cache"})
+
 
 @dataclass
 class AppConfig:
@@ -27,6 +34,35 @@ class AppConfig:
     extra: Dict[str, Any] = field(default_factory=dict)
     ignore: list[str] = field(default_factory=list)
     exclude_hide: bool = False
+    defer_hide_threshold: Optional[int] = None
+    paginate_level: int = 0
+    paginate_threshold: int = 0
+    markdown_backend: str = DEFAULT_MARKDOWN_BACKEND
+    max_document_size: int = 16 * 1024 * 1024
+    io_threads: int = 4
+    pipeline_depth: int = 16
+    max_nesting_depth: int = 20
+    render_timeout: float = 30.0
+    fragment_cache_size: int = 1024
+    page_cache_size: int = 256
+    page_cache_bytes: int = 64 * 1024 * 1024
+    variants: List[Dict[str, Any]] = field(default_factory=list)
+    shard: Optional[str] = None
+    archive: Optional[Path] = None
+    nav_sort: str = "name"
+    nav_order: str = "asc"
+    watch_backend: str = "native"
+    poll_interval: float = 1.0
+    config_path: Optional[Path] = None
+    metrics_file: Optional[Path] = None
+    weight_report: Optional[Path] = None
+    page_budget: Optional[int] = None
+    site_budget: Optional[int] = None
+    service_worker: bool = False
+    service_worker_cache_size: int = 50 * 1024 * 1024
+    minify_html: bool = False
+    lazy_images: bool = True
+    image_cache: Optional[Path] = None
 
     def apply_updates(self, data: Mapping[str, Any], base_path: Optional[Path] = None) -> None:
         """Apply updates from a dictionary onto the current configuration."""
@@ -45,14 +81,48 @@ class AppConfig:
             self.extra[key] = value
 
     def _apply_path_setting(self, key: str, value: Any, base_path: Optional[Path]) -> None:
+        setattr(self, key, self._resolve_path(value, base_path))
+
+    @staticmethod
+    def _resolve_path(value: Any, base_path: Optional[Path]) -> Path:
         path_value = Path(value)
         if base_path and not path_value.is_absolute():
             path_value = (base_path / path_value).resolve()
-        setattr(self, key, path_value)
+        return path_value
 
     def _apply_boolean_setting(self, key: str, value: Any) -> None:
         setattr(self, key, bool(value))
 
+    def _apply_integer_setting(self, key: str, value: Any) -> None:
+        try:
+            setattr(self, key, int(value))
+        except (TypeError, ValueError):
+            logger.warning("%s expects an integer, got %r", key, value)
+
+    def _apply_float_setting(self, key: str, value: Any, *, allow_zero: bool = False) -> None:
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            logger.warning("%s expects a number, got %r", key, value)
+            return
+        if number < 0 or (number == 0 and not allow_zero):
+            logger.warning("%s must be positive, got %r", key, value)
+            return
+        setattr(self, key, number)
+
+    def _apply_size_setting(self, key: str, value: Any) -> None:
+        try:
+            setattr(self, key, parse_size(value))
+        except ValueError:
+            logger.warning("%s expects a size such as 300KB, got %r", key, value)
+
+    def _apply_choice_setting(self, key: str, value: Any, choices: Tuple[str, ...]) -> None:
+        text = str(value).strip().lower()
+        if text in choices:
+            setattr(self, key, text)
+        else:
+            logger.warning("%s expects one of %s, got %r", key, ", ".join(choices), value)
+
     def _merge_metadata(self, value: Any) -> None:
         if isinstance(value, Mapping):
             self.metadata.update(value)  # type: ignore[arg-type]
@@ -79,7 +149,7 @@ class AppConfig:
         return normalised
 
     def _apply_known_setting(self, key: str, value: Any, base_path: Optional[Path]) -> bool:
-        if key in {"source_dir", "output_dir"}:
+        if key in _PATH_SETTINGS:
             self._apply_path_setting(key, value, base_path)
             return True
 
@@ -87,14 +157,74 @@ class AppConfig:
             self.theme_dirs = self._normalise_theme_dirs(value, base_path)
             return True
 
-        if key == "theme":
-            self.theme = str(value)
+        if key in {"theme", "shard"}:
+            setattr(self, key, str(value))
             return True
 
-        if key in {"clean_output", "copy_static", "watch", "exclude_hide"}:
+        if key in {
+            "clean_output",
+            "copy_static",
+            "watch",
+            "exclude_hide",
+            "service_worker",
+            "minify_html",
+            "lazy_images",
+        }:
             self._apply_boolean_setting(key, value)
             return True
 
+        if key in {
+            "fragment_cache_size",
+            "page_cache_size",
+            "page_cache_bytes",
+            "max_nesting_depth",
+            "io_threads",
+            "pipeline_depth",
+            "paginate_level",
+        }:
+            self._apply_integer_setting(key, value)
+            return True
+
+        if key in {
+            "page_budget",
+            "site_budget",
+            "service_worker_cache_size",
+            "defer_hide_threshold",
+            "max_document_size",
+            "paginate_threshold",
+        }:
+            self._apply_size_setting(key, value)
+            return True
+
+        if key == "nav_sort":
+            self._apply_choice_setting(key, value, NAV_SORT_KEYS)
+            return True
+
+        if key == "nav_order":
+            self._apply_choice_setting(key, value, NAV_SORT_ORDERS)
+            return True
+
+        if key == "watch_backend":
+            self._apply_choice_setting(key, value, WATCH_BACKENDS)
+            return True
+
+        if key == "markdown_backend":
+            self._apply_choice_setting(key, value, MARKDOWN_BACKENDS)
+            return True
+
+        if key == "poll_interval":
+            self._apply_float_setting(key, value)
+            return True
+
+        if key == "render_timeout":
+            # 0 renders suspect documents in-process, without a time limit.
+            self._apply_float_setting(key, value, allow_zero=True)
+            return True
+
+        if key == "variants":
+            self.variants = self._normalise_variants(value, base_path)
+            return True
+
         if key == "metadata":
             self._merge_metadata(value)
             return True
@@ -105,6 +235,48 @@ class AppConfig:
 
         return False
 
+    def resolve_variants(self, names: Optional[Iterable[str]] = None) -> List[Tuple[str, "AppConfig"]]:
+        """Return one configuration per variant, layered over this one."""
+
+        if not self.variants:
+            raise ValueError("No variants are configured")
+
+        available = {variant["name"]: variant for variant in self.variants}
+        selected = list(names) if names else list(available)
+        unknown = [name for name in selected if name not in available]
+        if unknown:
+            raise ValueError(f"Unknown variant(s): {', '.join(unknown)}")
+
+        resolved: List[Tuple[str, AppConfig]] = []
+        for name in selected:
+            overrides = {key: value for key, value in available[name].items() if key != "name"}
+            variant = copy.deepcopy(self)
+            variant.variants = []
+            # Paths were resolved against the config file when variants were read.
+            variant.apply_updates(overrides)
+            resolved.append((name, variant))
+        return resolved
+
+    def _normalise_variants(self, value: Any, base_path: Optional[Path]) -> List[Dict[str, Any]]:
+        if not isinstance(value, Iterable) or isinstance(value, (str, Mapping)):
+            logger.warning("variants expects a list of mappings, got %s", type(value))
+            return list(self.variants)
+
+        normalised: List[Dict[str, Any]] = []
+        for index, item in enumerate(value, start=1):
+            if not isinstance(item, Mapping):
+                logger.warning("Ignoring variant #%d: expected mapping, got %s", index, type(item))
+                continue
+            variant = dict(item)
+            variant["name"] = str(variant.get("name") or f"variant-{index}")
+            for key in _PATH_SETTINGS.intersection(variant):
+                if variant[key] is not None:
+                    variant[key] = self._resolve_path(variant[key], base_path)
+            if variant.get("theme_dirs") is not None:
+                variant["theme_dirs"] = self._normalise_theme_dirs(variant["theme_dirs"], base_path)
+            normalised.append(variant)
+        return normalised
+
     @staticmethod
     def _normalise_theme_dirs(value: Any, base_path: Optional[Path]) -> list[Path]:
         dirs: Iterable[Any]
@@ -133,6 +305,8 @@ def load_config(path: Optional[Path]) -> Dict[str, Any]:
     if path is None:
         return {}
 
+    import yaml  # type: ignore[import]
+
     path = path.resolve()
     if not path.exists():
         logger.warning("Configuration file %s does not exist", path)
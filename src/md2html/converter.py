@@ -2,44 +2,81 @@
 
 from __future__ import annotations
 
+import functools
+import json
 import logging
+import os
 import re
-import shutil
 import threading
 import time
-from dataclasses import dataclass
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
 from fnmatch import fnmatch
-from html import escape
+from html import escape, unescape
 from pathlib import Path
-from typing import Any, Callable, Dict, Iterable, List, Match, Optional, Tuple
-
-from markdown_it import MarkdownIt  # type: ignore[import]
-from markdown_it.token import Token  # type: ignore[import]
-from mdit_py_plugins.container import container_plugin  # type: ignore[import]
-from mdit_py_plugins.front_matter import front_matter_plugin  # type: ignore[import]
-from mdit_py_plugins.tasklists import tasklists_plugin  # type: ignore[import]
-from watchdog.events import FileSystemEventHandler  # type: ignore[import]
-from watchdog.observers import Observer  # type: ignore[import]
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Mapping, Match, Optional, Set, Tuple
 
+from .backends import DEFAULT_MARKDOWN_BACKEND, create_backend
+from .cache import LRUCache, content_hash
 from .config import AppConfig
+from .includes import (
+    DEFAULT_INCLUDE_CACHE_SIZE,
+    INCLUDE_TOKEN,
+    MAX_INCLUDE_DEPTH,
+    IncludeError,
+    IncludeGraph,
+    IncludeSources,
+    collect_includes,
+    include_block_rule,
+    include_digest,
+    is_partial,
+    resolve_include,
+    select_section,
+    shift_tokens,
+)
+from .images import IMAGE_CACHE_NAME, ImageSizer
+from .limits import DEFAULT_MAX_NESTING, DocumentLimitError, DocumentLimits, check_nesting, run_isolated, suspect_reason
+from .manifest import BUILD_MANIFEST_NAME, BuildChanges, load_build_manifest, render_build_manifest
+from .metrics import BuildMetrics
+from .minify import minify_html
+from .navigation import NavNode, Navigation, build_navigation, format_segment_title, git_commit_times, git_head
+from .output import DirectoryWriter, OutputWriter, create_output_writer
+from .pagination import anchor_redirect_snippet, page_starts, pagination_level
+from .pipeline import DEFAULT_IO_THREADS, DEFAULT_PIPELINE_DEPTH, create_writer_pool, prefetch
+from .serviceworker import SERVICE_WORKER_NAME, registration_snippet, render_service_worker
+from .shards import SHARD_MANIFEST_NAME, ShardSpec, navigation_fingerprint, render_shard_manifest
 from .theme import Theme, ThemeManager
-from .utils import copy_static_resource, ensure_directory, is_markdown_file, parse_front_matter, slugify
+from .utils import copy_static_resource, format_size, is_markdown_file, parse_front_matter, slugify
+from .weight import BudgetExceededError, PageWeight, build_weight_report, log_weight_summary, measure_page, write_weight_report
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from markdown_it import MarkdownIt  # type: ignore[import]
+    from markdown_it.token import Token  # type: ignore[import]
 
 logger = logging.getLogger(__name__)
 
-_HEADING_PATTERN = re.compile(r"^\s*(#{1,6})\s+(.+?)\s*(?:#+\s*)?$", re.MULTILINE)
+# Matched line by line: across a whole body this pattern backtracks quadratically.
+_HEADING_LINE = re.compile(r"[ \t]*(#{1,6})[ \t]+(\S.*)")
+_HTML_TAG = re.compile(r"<[^>]*>")
 _OUTPUT_SEGMENT_SANITISER = re.compile(r"[^0-9A-Za-z\u4e00-\u9fff._-]")
 _OUTPUT_SEGMENT_WHITESPACE = re.compile(r"\s+")
 _HIDE_SHORTHAND_PATTERN = re.compile(r"^:::[ \t]+(.+)$", re.MULTILINE)
 _HIDE_CLOSING_PATTERN = re.compile(r"^:::[ \t]*$", re.MULTILINE)
-_KNOWN_CONTAINER_KEYWORDS = {"hide", "note", "warning"}
+_CONTAINER_NAMES = ("hide", "note", "warning")
+_KNOWN_CONTAINER_KEYWORDS = set(_CONTAINER_NAMES)
+# Bump whenever the fragment stage output changes shape or markup.
+FRAGMENT_CACHE_VERSION = 1
 
 
-def format_segment_title(segment: str) -> str:
-    """Convert a path segment into a human friendly title."""
+@dataclass(frozen=True)
+class SourceEntry:
+    """A file discovered by a single walk over the source directory."""
 
-    cleaned = segment.replace("_", " ").replace("-", " ").strip()
-    return cleaned or segment
+    path: Path
+    relative: Path
+    is_markdown: bool
+    mtime: float
+    size: int
 
 
 @dataclass
@@ -50,6 +87,47 @@ class RenderResult:
     metadata: Dict[str, Any]
     toc: List[Dict[str, Any]]
     front_matter: Dict[str, Any]
+    url: str = ""
+    # Set when the page could not be rendered and an error page was written instead.
+    error: Optional[str] = None
+    # Further pages of a paginated document, in order; this result is its first page.
+    parts: List["RenderResult"] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class FragmentPage:
+    """One page of a paginated fragment."""
+
+    # Text of the heading the page starts with; ``None`` for the first page.
+    title: Optional[str]
+    html: str
+
+
+@dataclass(frozen=True)
+class RenderedFragment:
+    """Theme independent output of the Markdown stage.
+
+    Cached fragments are shared between pages with identical sources, so the
+    contained mappings must be treated as read-only.
+    """
+
+    html: str
+    metadata: Dict[str, Any]
+    toc: List[Dict[str, Any]]
+    front_matter: Dict[str, Any]
+    # Every page of a paginated document, ``html`` being the first one's; empty
+    # otherwise. TOC entries then carry the index of their page as ``page``.
+    pages: Tuple[FragmentPage, ...] = ()
+
+
+@dataclass
+class ParsedDocument:
+    """Block tokens of a source, before hide filtering and heading decoration."""
+
+    front_matter: Dict[str, Any]
+    tokens: List[Token]
+    # UTF-8 size of the source, compared against ``paginate_threshold``.
+    size: int = 0
 
 
 @dataclass
@@ -60,47 +138,331 @@ class RenderedDocument:
     front_matter: Dict[str, Any]
 
 
+def _first_heading(body: str) -> Optional[str]:
+    """Return the text of the first ATX heading in ``body``, without closing hashes."""
+
+    for line in body.splitlines():
+        match = _HEADING_LINE.match(line)
+        if match is None:
+            continue
+        title = match.group(2).strip()
+        unclosed = title.rstrip("#")
+        if unclosed != title and (not unclosed or unclosed[-1] in " \t"):
+            title = unclosed.rstrip()
+        return title or None
+    return None
+
+
+def _token_levels(tokens: List[Token]) -> Iterator[int]:
+    for token in tokens:
+        yield token.level
+        for child in token.children or ():
+            yield token.level + child.level
+
+
+def _matching_close(tokens: List[Token], index: int) -> Optional[int]:
+    """Index of the token closing the container opened at ``tokens[index]``."""
+
+    closing = tokens[index].type[: -len("_open")] + "_close"
+    depth = 0
+    for position in range(index, len(tokens)):
+        if tokens[position].type == tokens[index].type:
+            depth += 1
+        elif tokens[position].type == closing:
+            depth -= 1
+            if depth == 0:
+                return position
+    return None
+
+
 class MarkdownRenderer:
     """Render markdown into themed HTML fragments."""
 
-    def __init__(self, theme: Theme, site_metadata: Optional[Dict[str, Any]] = None, exclude_hide: bool = False) -> None:
+    def __init__(
+        self,
+        theme: Theme,
+        site_metadata: Optional[Dict[str, Any]] = None,
+        exclude_hide: bool = False,
+        *,
+        fragment_cache: Optional[LRUCache[RenderedFragment]] = None,
+        defer_hide_threshold: Optional[int] = None,
+        max_nesting: int = DEFAULT_MAX_NESTING,
+        markdown_backend: str = DEFAULT_MARKDOWN_BACKEND,
+        include_root: Optional[Path] = None,
+        include_cache: Optional[LRUCache[List[Token]]] = None,
+        paginate_level: int = 0,
+        paginate_threshold: int = 0,
+    ) -> None:
         self.theme = theme
         self.site_metadata = dict(site_metadata or {})
         self.exclude_hide = exclude_hide
+        self.defer_hide_threshold = defer_hide_threshold
+        self.max_nesting = max_nesting
+        self.paginate_level = paginate_level
+        self.paginate_threshold = paginate_threshold
+        self.fragment_cache = fragment_cache
+        # Included files resolve below this directory; ``None`` allows only relative includes.
+        self.include_root = include_root
+        self.include_cache = include_cache if include_cache is not None else LRUCache(DEFAULT_INCLUDE_CACHE_SIZE)
         self.md = self._create_markdown_parser()
+        # markdown-it still renders the tokens, whichever backend produced them.
+        self.backend = create_backend(
+            markdown_backend,
+            self.md,
+            {name: self._make_container_validator(name) for name in _CONTAINER_NAMES},
+        )
+        self._fingerprint = self._compute_fingerprint()
 
-    def render(self, text: str, *, source_path: Path) -> RenderedDocument:
-        front_matter, body = parse_front_matter(text)
-        body = self._normalise_hide_shorthand(body)
-        env: Dict[str, Any] = {
-            "doc_path": str(source_path),
-            "front_matter": front_matter,
-            "default_hide_title": self.theme.default_hide_title(),
-            "default_hide_collapse_title": self.theme.default_hide_collapse_title(),
-            "admonitions": self.theme.admonition_defaults(),
-        }
+    def render(
+        self,
+        text: str,
+        *,
+        source_path: Path,
+        parse: Optional[Callable[[], ParsedDocument]] = None,
+    ) -> RenderedDocument:
+        return self.apply_theme(self.render_fragment(text, source_path=source_path, parse=parse))
 
-        tokens = self.md.parse(body, env)
-        if self.exclude_hide:
-            tokens = self._filter_hide_tokens(tokens)
-        toc = self._decorate_headings(tokens)
-        html_body = self.md.renderer.render(tokens, self.md.options, env)
+    def apply_theme(self, fragment: RenderedFragment) -> RenderedDocument:
+        """Wrap a rendered fragment in the theme template."""
 
-        metadata = self._build_metadata(front_matter, tokens, source_path)
         rendered_html = self.theme.render(
-            content=html_body,
-            metadata=metadata,
-            toc=toc,
-            front_matter=front_matter,
+            content=fragment.html,
+            metadata=fragment.metadata,
+            toc=fragment.toc,
+            front_matter=fragment.front_matter,
             site_metadata=self.site_metadata,
         )
         return RenderedDocument(
             html=rendered_html,
+            metadata=fragment.metadata,
+            toc=fragment.toc,
+            front_matter=fragment.front_matter,
+        )
+
+    def render_fragment(
+        self,
+        text: str,
+        *,
+        source_path: Path,
+        parse: Optional[Callable[[], ParsedDocument]] = None,
+        includes: Optional[IncludeSources] = None,
+        render: Optional[Callable[[], RenderedFragment]] = None,
+    ) -> RenderedFragment:
+        """Render the Markdown body without applying the theme template.
+
+        ``parse`` may supply a shared :class:`ParsedDocument` for ``text`` so
+        that several renderers only run the markdown-it block parser once.
+        ``includes`` may supply the files ``text`` includes, as returned by
+        :meth:`collect_includes`. ``render`` may replace the parse and render
+        on a fragment cache miss, e.g. to run them in an isolated worker.
+        """
+
+        if includes is None:
+            includes = self.collect_includes(text, source_path)
+        key = None
+        fragment = None
+        if self.fragment_cache is not None:
+            key = f"{content_hash(text)}:{self._fingerprint}"
+            if includes:
+                # Editing an included file must invalidate every page using it.
+                key = f"{key}:{include_digest(includes)}"
+            fragment = self.fragment_cache.get(key)
+        if fragment is None:
+            if render is not None:
+                fragment = render()
+            else:
+                parsed = parse() if parse is not None else self.parse(text, source_path=source_path, includes=includes)
+                fragment = self._render_parsed(parsed)
+            if key is not None:
+                self.fragment_cache.put(key, fragment)  # type: ignore[union-attr]
+        else:
+            logger.debug("Reusing cached fragment for %s", source_path)
+
+        metadata = dict(fragment.metadata)
+        if not metadata.get("title"):
+            metadata["title"] = format_segment_title(source_path.stem)
+        return RenderedFragment(
+            html=fragment.html,
             metadata=metadata,
-            toc=toc,
+            toc=list(fragment.toc),
+            front_matter=fragment.front_matter,
+            pages=fragment.pages,
+        )
+
+    def collect_includes(self, text: str, source_path: Optional[Path]) -> IncludeSources:
+        """Read the files ``text`` includes, directly or through other includes."""
+
+        return collect_includes(text, source_path, self.include_root)
+
+    def parse(
+        self,
+        text: str,
+        *,
+        source_path: Optional[Path] = None,
+        includes: Optional[Mapping[Path, Optional[str]]] = None,
+    ) -> ParsedDocument:
+        """Run the theme independent parse stage over a source document.
+
+        ``!include`` directives are resolved relative to ``source_path``;
+        included files come from ``includes`` when listed there, else from disk.
+        """
+
+        front_matter, body = parse_front_matter(text)
+        tokens = self._parse_body(body, front_matter)
+        if any(token.type == INCLUDE_TOKEN for token in tokens):
+            stack = (source_path,) if source_path is not None else ()
+            tokens = self._expand_includes(tokens, source_path, includes or {}, stack)
+        check_nesting(_token_levels(tokens), self.max_nesting)
+        return ParsedDocument(front_matter=front_matter, tokens=tokens, size=len(text.encode("utf-8")))
+
+    def _parse_body(self, body: str, front_matter: Dict[str, Any]) -> List[Token]:
+        body = self._normalise_hide_shorthand(body)
+        return self.backend.parse(body, {"front_matter": front_matter})
+
+    def _expand_includes(
+        self,
+        tokens: List[Token],
+        including: Optional[Path],
+        includes: Mapping[Path, Optional[str]],
+        stack: Tuple[Path, ...],
+    ) -> List[Token]:
+        expanded: List[Token] = []
+        for token in tokens:
+            if token.type != INCLUDE_TOKEN:
+                expanded.append(token)
+                continue
+            path, section = resolve_include(token.info, including, self.include_root)
+            if path in stack or len(stack) > MAX_INCLUDE_DEPTH:
+                chain = " -> ".join(item.name for item in (*stack, path))
+                raise IncludeError(f"!include {token.info}: include cycle {chain}")
+            included = self._parse_included(path, includes)
+            if section is not None:
+                included = select_section(included, section, path)
+            if any(item.type == INCLUDE_TOKEN for item in included):
+                included = self._expand_includes(included, path, includes, (*stack, path))
+            expanded.extend(shift_tokens(included, token.level))
+        return expanded
+
+    def _parse_included(self, path: Path, includes: Mapping[Path, Optional[str]]) -> List[Token]:
+        """Block tokens of an included file, before its own includes are expanded.
+
+        Cached by content hash, so a snippet shared by many pages is parsed once.
+        """
+
+        text = includes.get(path)
+        if text is None:
+            try:
+                text = path.read_text(encoding="utf-8")
+            except (OSError, UnicodeDecodeError) as exc:
+                raise IncludeError(f"!include {path.name}: {getattr(exc, 'strerror', None) or exc}") from exc
+        key = f"{content_hash(text)}:{self._fingerprint}"
+        tokens = self.include_cache.get(key)
+        if tokens is None:
+            front_matter, body = parse_front_matter(text)
+            tokens = self._parse_body(body, front_matter)
+            self.include_cache.put(key, tokens)
+        return tokens
+
+    def _render_parsed(self, parsed: ParsedDocument) -> RenderedFragment:
+        front_matter = parsed.front_matter
+        env = self._build_env(front_matter)
+        tokens = parsed.tokens
+        if self.exclude_hide:
+            tokens = self._filter_hide_tokens(tokens)
+        # Heading ids are (re)assigned on every render, so tokens shared with
+        # other variants are decorated consistently for this one.
+        toc = self._decorate_headings(tokens)
+        metadata = self._build_metadata(front_matter, tokens)
+        level = pagination_level(front_matter, parsed.size, self.paginate_level, self.paginate_threshold)
+        starts = page_starts(tokens, level) if level else [0]
+        if len(starts) == 1:
+            return RenderedFragment(
+                html=self._render_tokens(tokens, env),
+                metadata=metadata,
+                toc=toc,
+                front_matter=front_matter,
+            )
+
+        # Every page renders a slice of the decorated tokens, so heading ids
+        # are unique across the whole document.
+        pages: List[FragmentPage] = []
+        paged_toc: List[Dict[str, Any]] = []
+        entries = iter(toc)
+        for number, (start, end) in enumerate(zip(starts, starts[1:] + [len(tokens)])):
+            chunk = tokens[start:end]
+            headings = [next(entries) for token in chunk if token.type == "heading_open"]
+            paged_toc.extend({**entry, "page": number} for entry in headings)
+            title = headings[0]["title"] if number and chunk[0].type == "heading_open" else None
+            pages.append(FragmentPage(title=title, html=self._render_tokens(chunk, env)))
+        return RenderedFragment(
+            html=pages[0].html,
+            metadata=metadata,
+            toc=paged_toc,
             front_matter=front_matter,
+            pages=tuple(pages),
         )
 
+    def _render_tokens(self, tokens: List[Token], env: Dict[str, Any]) -> str:
+        if self.defer_hide_threshold is None:
+            return self.md.renderer.render(tokens, self.md.options, env)
+        return self._render_deferring_hide(tokens, env)
+
+    def _build_env(self, front_matter: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "front_matter": front_matter,
+            "default_hide_title": self.theme.default_hide_title(),
+            "default_hide_collapse_title": self.theme.default_hide_collapse_title(),
+            "admonitions": self.theme.admonition_defaults(),
+        }
+
+    def _compute_fingerprint(self) -> str:
+        """Digest every setting that influences the fragment stage output."""
+
+        payload = {
+            "version": FRAGMENT_CACHE_VERSION,
+            "options": {key: self.md.options.get(key) for key in ("html", "linkify", "typographer", "maxNesting")},
+            "rules": self.md.get_active_rules(),
+            "backend": self.backend.fingerprint(),
+            "exclude_hide": self.exclude_hide,
+            "defer_hide_threshold": self.defer_hide_threshold,
+            "paginate_level": self.paginate_level,
+            "paginate_threshold": self.paginate_threshold,
+            "hide_title": self.theme.default_hide_title(),
+            "hide_collapse_title": self.theme.default_hide_collapse_title(),
+            "admonitions": self.theme.admonition_defaults(),
+        }
+        return content_hash(json.dumps(payload, sort_keys=True, default=str))
+
+    def _render_deferring_hide(self, tokens: List[Token], env: Dict[str, Any]) -> str:
+        """Render ``tokens``, moving large ``::: hide`` bodies into inert ``<template>`` elements.
+
+        Each hide body is rendered on its own; bodies of at least
+        :attr:`defer_hide_threshold` UTF-8 bytes are wrapped so the browser
+        does not build their DOM until the theme attaches them on first expand.
+        """
+
+        render = self.md.renderer.render
+        options = self.md.options
+        parts: List[str] = []
+        start = index = 0
+        while index < len(tokens):
+            if tokens[index].type != "container_hide_open":
+                index += 1
+                continue
+            close = _matching_close(tokens, index)
+            if close is None:
+                break
+            parts.append(render(tokens[start:index], options, env))
+            body = self._render_deferring_hide(tokens[index + 1:close], env)
+            if len(body.encode("utf-8")) >= self.defer_hide_threshold:  # type: ignore[operator]
+                body = f"<template data-md2html-hide-body>\n{body}</template>\n"
+            parts.append(render(tokens[index:index + 1], options, env))
+            parts.append(body)
+            parts.append(render(tokens[close:close + 1], options, env))
+            start = index = close + 1
+        parts.append(render(tokens[start:], options, env))
+        return "".join(parts)
+
     def _filter_hide_tokens(self, tokens: List[Token]) -> List[Token]:
         # Remove all tokens between ::: hide ... and its close
         result = []
@@ -117,10 +479,24 @@ class MarkdownRenderer:
         return result
 
     def _create_markdown_parser(self) -> MarkdownIt:
-        md = MarkdownIt("commonmark", {"html": True, "linkify": True, "typographer": True})
+        from markdown_it import MarkdownIt  # type: ignore[import]
+        from mdit_py_plugins.container import container_plugin  # type: ignore[import]
+        from mdit_py_plugins.front_matter import front_matter_plugin  # type: ignore[import]
+        from mdit_py_plugins.tasklists import tasklists_plugin  # type: ignore[import]
+
+        md = MarkdownIt(
+            "commonmark",
+            {"html": True, "linkify": True, "typographer": True, "maxNesting": self.max_nesting},
+        )
         md.use(tasklists_plugin, enabled=True)
         md.use(front_matter_plugin)
         md.enable("table")
+        md.block.ruler.before(
+            "paragraph",
+            "md2html_include",
+            include_block_rule,
+            {"alt": ["paragraph", "reference", "blockquote", "list"]},
+        )
         md.use(
             container_plugin,
             "hide",
@@ -151,12 +527,13 @@ class MarkdownRenderer:
             if token.type == "heading_open" and token.tag.startswith("h"):
                 level = int(token.tag[1])
                 inline = tokens[index + 1]
-                text = inline.content.strip()
-                slug_base = slugify(text)
+                # Ids come from the Markdown source, so existing anchors keep working.
+                slug_base = slugify(inline.content.strip())
                 count = slug_counts.get(slug_base, 0)
                 slug_counts[slug_base] = count + 1
                 slug = slug_base if count == 0 else f"{slug_base}-{count}"
                 token.attrSet("id", slug)
+                text = self._heading_text(inline)
                 toc.append({"level": level, "title": text, "slug": slug})
                 logger.debug("Heading '%s' assigned id '%s'", text, slug)
                 index += 2
@@ -165,21 +542,30 @@ class MarkdownRenderer:
 
         return toc
 
-    def _build_metadata(
-        self,
-        front_matter: Dict[str, Any],
-        tokens: List[Token],
-        source_path: Path,
-    ) -> Dict[str, Any]:
+    @staticmethod
+    def _heading_text(inline: Token) -> str:
+        """Plain text of a heading, without Markdown or HTML markup."""
+
+        if inline.children is None:
+            return inline.content.strip()
+        parts = []
+        for child in inline.children:
+            if child.type in ("text", "code_inline"):
+                parts.append(child.content)
+            elif child.type in ("softbreak", "hardbreak"):
+                parts.append(" ")
+            elif child.type == "html_inline":
+                # The cmark-gfm backend hands over the whole heading as rendered HTML.
+                parts.append(unescape(_HTML_TAG.sub("", child.content)))
+        return " ".join("".join(parts).split())
+
+    def _build_metadata(self, front_matter: Dict[str, Any], tokens: List[Token]) -> Dict[str, Any]:
         metadata = dict(front_matter)
         if "title" not in metadata:
             for idx, token in enumerate(tokens):
                 if token.type == "heading_open" and token.tag == "h1":
-                    inline = tokens[idx + 1]
-                    metadata["title"] = inline.content.strip()
+                    metadata["title"] = self._heading_text(tokens[idx + 1])
                     break
-        if not metadata.get("title"):
-            metadata["title"] = format_segment_title(source_path.stem)
         return metadata
 
     @staticmethod
@@ -284,60 +670,376 @@ class SiteBuilder:
     """Build the entire site from source markdown documents."""
 
     def __init__(self, config: AppConfig, theme: Theme) -> None:
+        self.fragment_cache: Optional[LRUCache[RenderedFragment]] = None
+        self.include_cache: LRUCache[List[Token]] = LRUCache(DEFAULT_INCLUDE_CACHE_SIZE)
+        # Which pages include which files; lets watch mode skip unused partials.
+        self.include_graph = IncludeGraph()
+        # Pages and the local images whose sizes were baked into them.
+        self.image_graph = IncludeGraph()
+        self.image_sizer: Optional[ImageSizer] = None
+        self._title_cache: Dict[Path, Tuple[float, int, str, Optional[float]]] = {}
+        self._git_times: Tuple[Optional[str], Dict[str, float]] = (None, {})
+        self.last_changes: Optional[BuildChanges] = None
+        self.metrics = BuildMetrics()
+        self._configure(config, theme)
+
+    def reload_settings(self, config: AppConfig, theme: Theme) -> None:
+        """Switch to a new configuration and theme in place.
+
+        Title, git and fragment caches survive, so pages whose parse options
+        did not change are only re-templated on the next build.
+        """
+
+        self._configure(config, theme)
+
+    def _configure(self, config: AppConfig, theme: Theme) -> None:
         self.config = config
         self.theme = theme
         site_metadata = dict(config.metadata)
         site_metadata.update(config.extra)
+        site_metadata.setdefault("nav_sort", getattr(config, "nav_sort", "name"))
+        site_metadata.setdefault("nav_order", getattr(config, "nav_order", "asc"))
+        if getattr(config, "service_worker", False):
+            site_metadata.setdefault("service_worker_snippet", registration_snippet(site_metadata.get("base_url", "")))
+        cache_size = getattr(config, "fragment_cache_size", 0)
+        if cache_size <= 0:
+            self.fragment_cache = None
+        elif self.fragment_cache is None or self.fragment_cache.max_entries != cache_size:
+            self.fragment_cache = LRUCache(cache_size)
         self.renderer = MarkdownRenderer(
             theme,
             site_metadata=site_metadata,
             exclude_hide=getattr(config, "exclude_hide", False),
+            fragment_cache=self.fragment_cache,
+            defer_hide_threshold=getattr(config, "defer_hide_threshold", None),
+            max_nesting=getattr(config, "max_nesting_depth", DEFAULT_MAX_NESTING),
+            markdown_backend=getattr(config, "markdown_backend", DEFAULT_MARKDOWN_BACKEND),
+            include_root=config.source_dir,
+            include_cache=self.include_cache,
+            paginate_level=getattr(config, "paginate_level", 0),
+            paginate_threshold=getattr(config, "paginate_threshold", 0),
         )
+        self.limits = DocumentLimits.from_config(config)
+        if not getattr(config, "lazy_images", True):
+            self.image_sizer = None
+        elif self.image_sizer is None or self.image_sizer.root != Path(os.path.normpath(config.source_dir)):
+            self.image_sizer = ImageSizer(config.source_dir)
         self._output_path_map: Dict[Tuple[str, ...], List[str]] = {}
+        # (source segments, page number) -> output segments of later pages of paginated documents.
+        self._page_path_map: Dict[Tuple[Tuple[str, ...], int], List[str]] = {}
         self._used_output_paths: set[Tuple[str, ...]] = set()
+        self.shard = ShardSpec.parse(config.shard) if getattr(config, "shard", None) else None
+        self.writer: OutputWriter = create_output_writer(config)
+        self._navigation_digest: Optional[str] = None
+        self._page_weights: List[PageWeight] = []
+        self._document_errors: List[str] = []
+        # UTF-8 bytes of the pages of this build before and after minification.
+        self._minified = [0, 0]
+        self._previous_manifest: Optional[Dict[str, Any]] = None
         self._resolved_source_dir = self.config.source_dir.resolve()
         self._ignore_rules = self._prepare_ignore_rules(self.config.ignore)
 
     def build_all(self) -> List[RenderResult]:
-        logger.info("Starting static site build from %s", self.config.source_dir)
-        if not self.config.source_dir.exists():
-            raise FileNotFoundError(f"Source directory {self.config.source_dir} does not exist")
+        started = time.perf_counter()
+        metrics = self.metrics
+        fragment_hits = self._fragment_hits()
+        try:
+            entries = self.begin_build()
+            pages = [entry.path for entry in entries if entry.is_markdown]
+            self.include_graph.retain(pages)
+            self.image_graph.retain(pages)
+            try:
+                with metrics.phase("navigation"):
+                    navigation = self._build_navigation_structure(entries)
+                if self.shard is not None:
+                    # Navigation and output paths always cover the whole site so every
+                    # shard renders identical sidebars; only the page work is split.
+                    self._navigation_digest = navigation_fingerprint(navigation)
+                    entries = self.shard.select(entries)
+                    logger.info("Building shard %s: %d of the source files", self.shard, len(entries))
+                results: List[RenderResult] = []
+                render_seconds = static_seconds = 0.0
+                threads, depth = self._pipeline_settings()
+                pool = create_writer_pool(self._writer_threads(threads), depth)
+                sources = prefetch(entries, self._prefetch_source, threads=threads, depth=depth)
+                try:
+                    for entry, text in sources:
+                        tick = time.perf_counter()
+                        if entry.is_markdown:
+                            result = self._build_single_markdown(entry.path, navigation, text=text, submit=pool.submit)
+                            results.append(result)
+                            results.extend(result.parts)
+                            render_seconds += time.perf_counter() - tick
+                        elif self.config.copy_static:
+                            pool.submit(functools.partial(self._copy_static_entry, entry))
+                            static_seconds += time.perf_counter() - tick
+                except BaseException:
+                    pool.close(cancel=True)
+                    raise
+                finally:
+                    sources.close()
+                with metrics.phase("write"):
+                    pool.close()
+                metrics.phases.observe(render_seconds, phase="render")
+                metrics.phases.observe(static_seconds, phase="static")
+            except BaseException:
+                self.writer.abort()
+                raise
+
+            with metrics.phase("finish"):
+                self.finish_build()
+        except BaseException:
+            metrics.failures.inc()
+            raise
+
+        skipped = self._fragment_hits() - fragment_hits
+        metrics.pages.inc(len(results) - skipped, result="rendered")
+        metrics.pages.inc(skipped, result="skipped")
+        metrics.builds.inc()
+        metrics.duration.observe(time.perf_counter() - started)
+        self._dump_metrics()
+        return results
+
+    def _fragment_hits(self) -> int:
+        return self.fragment_cache.stats.hits if self.fragment_cache is not None else 0
+
+    def _dump_metrics(self) -> None:
+        metrics_file = getattr(self.config, "metrics_file", None)
+        if metrics_file is None:
+            return
+        try:
+            self.metrics.registry.dump_json(Path(metrics_file))
+        except OSError as exc:
+            logger.warning("Unable to write metrics to %s: %s", metrics_file, exc)
 
-        if self.config.clean_output and self.config.output_dir.exists():
-            logger.debug("Cleaning output directory %s", self.config.output_dir)
-            shutil.rmtree(self.config.output_dir)
+    def begin_build(self) -> List[SourceEntry]:
+        """Prepare the output directory and return the scanned source entries."""
 
-        ensure_directory(self.config.output_dir)
+        logger.info("Starting static site build from %s", self.config.source_dir)
+        with self.metrics.phase("scan"):
+            entries = self.scan_sources()
+        with self.metrics.phase("prepare"):
+            self.prepare_output()
+        return entries
+
+    def prepare_output(self) -> None:
+        # Read the previous manifest before cleaning so the build can report its changes.
+        self._previous_manifest = None
+        self._page_weights = []
+        self._document_errors = []
+        self._minified = [0, 0]
+        if self._writes_build_manifest():
+            self._previous_manifest = load_build_manifest(self.writer.location / BUILD_MANIFEST_NAME)
+        image_cache = self._image_cache_path()
+        if image_cache is not None:
+            self.image_sizer.load(image_cache)  # type: ignore[union-attr]
+        self.writer.open(clean=self.config.clean_output)
         self._output_path_map.clear()
+        self._page_path_map.clear()
         self._used_output_paths.clear()
 
-        navigation = self._build_navigation_structure()
-        results: List[RenderResult] = []
-        for path in sorted(self.config.source_dir.rglob("*")):
-            if self._should_ignore(path):
-                logger.debug("Skipping ignored path %s", path)
-                continue
-            if path.is_dir():
+    def _image_cache_path(self) -> Optional[Path]:
+        if self.image_sizer is None:
+            return None
+        path = getattr(self.config, "image_cache", None)
+        if path is not None:
+            return Path(path)
+        # Kept next to the build manifest, which survives cleaning the same way.
+        return self.writer.location / IMAGE_CACHE_NAME if self._writes_build_manifest() else None
+
+    def _writes_build_manifest(self) -> bool:
+        # Sharded builds describe their outputs in the shard manifest instead;
+        # merge-shards writes the build manifest for the combined site.
+        return self.shard is None and isinstance(self.writer, DirectoryWriter)
+
+    def finish_build(self) -> None:
+        service_worker = getattr(self.config, "service_worker", False)
+        if self.shard is not None and self._navigation_digest is not None:
+            manifest = render_shard_manifest(
+                self.shard,
+                self._navigation_digest,
+                self.writer.records,
+                service_worker={"cache_size": self.config.service_worker_cache_size} if service_worker else None,
+            )
+            self.writer.write_text(SHARD_MANIFEST_NAME, manifest)
+        elif service_worker and self.shard is None:
+            # Written before the build manifest so sw.js is listed like any other output.
+            script = render_service_worker(self.writer.records, max_bytes=self.config.service_worker_cache_size)
+            self.writer.write_text(SERVICE_WORKER_NAME, script)
+        if self._writes_build_manifest():
+            manifest, self.last_changes = render_build_manifest(self.writer.records, self._previous_manifest)
+            (self.writer.location / BUILD_MANIFEST_NAME).write_text(manifest, encoding="utf-8")
+        self.writer.close()
+        image_cache = self._image_cache_path()
+        if image_cache is not None:
+            self.image_sizer.save(image_cache)  # type: ignore[union-attr]
+        if self._document_errors:
+            self.metrics.document_errors.inc(len(self._document_errors))
+            logger.error(
+                "%d document(s) could not be rendered and were replaced by error pages: %s",
+                len(self._document_errors),
+                ", ".join(self._document_errors),
+            )
+        before, after = self._minified
+        if before:
+            logger.info(
+                "Minified HTML: %s -> %s, saved %s (%.1f%%)",
+                format_size(before),
+                format_size(after),
+                format_size(before - after),
+                100 * (before - after) / before,
+            )
+        if self._measures_weight():
+            self._report_weight()
+        if self.fragment_cache is not None:
+            stats = self.fragment_cache.stats
+            logger.debug(
+                "Fragment cache: %d hits, %d misses, %d entries",
+                stats.hits,
+                stats.misses,
+                len(self.fragment_cache),
+            )
+
+    def _measures_weight(self) -> bool:
+        config = self.config
+        return any(getattr(config, key, None) is not None for key in ("weight_report", "page_budget", "site_budget"))
+
+    def _report_weight(self) -> None:
+        site_budget = getattr(self.config, "site_budget", None)
+        if self.shard is not None and site_budget is not None:
+            # A shard only holds part of the site; merge-shards sees the whole.
+            logger.debug("Skipping the site budget for shard %s", self.shard)
+            site_budget = None
+        report, violations = build_weight_report(
+            self._page_weights,
+            self.writer.records,
+            page_budget=getattr(self.config, "page_budget", None),
+            site_budget=site_budget,
+        )
+        log_weight_summary(report)
+        report_path = getattr(self.config, "weight_report", None)
+        if report_path is not None:
+            write_weight_report(report, Path(report_path))
+            logger.info("Wrote page weight report to %s", report_path)
+        if violations:
+            for violation in violations:
+                logger.error("%s", violation)
+            raise BudgetExceededError(f"{len(violations)} page weight budget(s) exceeded")
+
+    def scan_sources(self) -> List[SourceEntry]:
+        """Walk the source tree once, pruning ignored directories."""
+
+        if not self.config.source_dir.exists():
+            raise FileNotFoundError(f"Source directory {self.config.source_dir} does not exist")
+
+        entries: List[SourceEntry] = []
+        pending = [self.config.source_dir]
+        while pending:
+            directory = pending.pop()
+            try:
+                iterator = os.scandir(directory)
+            except OSError as exc:
+                logger.warning("Unable to scan %s: %s", directory, exc)
                 continue
-            relative = path.relative_to(self.config.source_dir)
-            if is_markdown_file(path):
-                segments = list(relative.with_suffix("").parts)
-                if tuple(segments) not in self._output_path_map:
-                    self._register_output_path(segments)
-                result = self._build_single_markdown(path, navigation)
-                results.append(result)
-            elif self.config.copy_static:
-                destination = self.config.output_dir / relative
-                copy_static_resource(path, destination)
-                logger.debug("Copied static asset %s -> %s", path, destination)
+            with iterator:
+                for item in iterator:
+                    path = Path(item.path)
+                    if self._should_ignore(path):
+                        logger.debug("Skipping ignored path %s", path)
+                        continue
+                    try:
+                        if item.is_dir():
+                            pending.append(path)
+                            continue
+                        if is_partial(path) and is_markdown_file(path):
+                            # Partials only exist to be included by other pages.
+                            continue
+                        stat = item.stat()
+                    except OSError as exc:
+                        logger.warning("Unable to stat %s: %s", path, exc)
+                        continue
+                    entries.append(
+                        SourceEntry(
+                            path=path,
+                            relative=path.relative_to(self.config.source_dir),
+                            is_markdown=is_markdown_file(path),
+                            mtime=stat.st_mtime,
+                            size=stat.st_size,
+                        )
+                    )
+
+        entries.sort(key=lambda entry: entry.path)
+        return entries
+
+    def _pipeline_settings(self) -> Tuple[int, int]:
+        threads = max(getattr(self.config, "io_threads", DEFAULT_IO_THREADS), 0)
+        depth = max(getattr(self.config, "pipeline_depth", DEFAULT_PIPELINE_DEPTH), 1)
+        return threads, depth
+
+    def _writer_threads(self, threads: int) -> int:
+        # Archive members must be appended one at a time and in a stable order.
+        return threads if isinstance(self.writer, DirectoryWriter) else min(threads, 1)
+
+    def _prefetch_source(self, entry: SourceEntry) -> Optional[str]:
+        """Read a Markdown source ahead of rendering.
+
+        Returns ``None`` for other files and for sources that are oversized or
+        unreadable; the render stage then reads them itself and reports why.
+        """
 
-        return results
+        if not entry.is_markdown:
+            return None
+        max_size = self.limits.max_size
+        if max_size is not None and entry.size > max_size:
+            return None
+        try:
+            return entry.path.read_text(encoding="utf-8")
+        except (OSError, UnicodeDecodeError) as exc:
+            logger.debug("Unable to read %s: %s", entry.path, exc)
+            return None
+
+    def _copy_static_entry(self, entry: SourceEntry) -> None:
+        relative = entry.relative.as_posix()
+        self.writer.copy_file(entry.path, relative)
+        logger.debug("Copied static asset %s -> %s", entry.path, relative)
 
     def _build_single_markdown(
         self,
         source: Path,
-        navigation: List[Dict[str, Any]],
+        navigation: Navigation,
+        *,
+        text: Optional[str] = None,
+        parse: Optional[Callable[[], ParsedDocument]] = None,
+        submit: Optional[Callable[[Callable[[], None]], None]] = None,
+    ) -> RenderResult:
+        result = self.render_page(source, navigation, text=text, parse=parse)
+        if result.error is not None:
+            self._document_errors.append(result.url)
+        for page in (result, *result.parts):
+            write = functools.partial(self.writer.write_text, page.url, page.html)
+            if submit is None:
+                write()
+            else:
+                submit(write)
+            if self._measures_weight():
+                self._page_weights.append(measure_page(page.url, page.html))
+            logger.info("Generated %s", page.destination)
+        return result
+
+    def render_page(
+        self,
+        source: Path,
+        navigation: Navigation,
+        *,
+        text: Optional[str] = None,
+        parse: Optional[Callable[[], ParsedDocument]] = None,
     ) -> RenderResult:
+        """Render ``source`` into a full page without writing it.
+
+        Output paths must already be registered, normally by
+        :meth:`plan_navigation` or a build.
+        """
+
         logger.debug("Rendering %s", source)
         relative = source.relative_to(self.config.source_dir)
         current_segments = list(relative.with_suffix("").parts)
@@ -346,14 +1048,31 @@ class SiteBuilder:
             output_segments = self._register_output_path(current_segments)
         destination = self._build_destination_path(output_segments)
         current_url = self._segments_to_url(output_segments)
-        ensure_directory(destination.parent)
+        trail = navigation.trail(current_segments)
         self.renderer.site_metadata["navigation"] = navigation
-        self.renderer.site_metadata["current_segments"] = current_segments
+        self.renderer.site_metadata["current_segments"] = tuple(current_segments)
+        self.renderer.site_metadata["nav_trail"] = trail
+        self.renderer.site_metadata["nav_expanded"] = frozenset(node.segments for node in trail)
         self.renderer.site_metadata["current_page"] = current_url
-        text = source.read_text(encoding="utf-8")
-        rendered = self.renderer.render(text, source_path=source)
-        destination.write_text(rendered.html, encoding="utf-8")
-        logger.info("Generated %s", destination)
+        previous, following = navigation.neighbours(current_segments)
+        self.renderer.site_metadata["nav_previous"] = previous
+        self.renderer.site_metadata["nav_next"] = following
+        self.renderer.site_metadata["pagination"] = None
+        self.renderer.site_metadata["pagination_snippet"] = None
+        error: Optional[str] = None
+        try:
+            fragment = self._render_fragment(source, relative, text, parse)
+        except Exception as exc:  # pylint: disable=broad-except
+            # One broken document must not take the rest of the site down with it.
+            node = navigation.find(current_segments)
+            fragment = self._error_fragment(relative, node.title if node else relative.stem, exc)
+            error = str(exc)
+        if self.image_sizer is not None and error is None:
+            # After the fragment cache: sizes follow the image files, not the Markdown.
+            fragment = self._decorate_images(fragment, source)
+        if fragment.pages:
+            return self._render_paginated(source, fragment, current_segments, output_segments, (previous, following))
+        rendered = self._apply_theme(fragment)
         return RenderResult(
             source=source,
             destination=destination,
@@ -361,101 +1080,236 @@ class SiteBuilder:
             metadata=rendered.metadata,
             toc=rendered.toc,
             front_matter=rendered.front_matter,
+            url=current_url,
+            error=error,
         )
 
-    def _build_navigation_structure(self, sort_by: str = "name", order: str = "asc") -> List[Dict[str, Any]]:
+    def _render_paginated(
+        self,
+        source: Path,
+        fragment: RenderedFragment,
+        current_segments: List[str],
+        output_segments: List[str],
+        neighbours: Tuple[Optional[NavNode], Optional[NavNode]],
+    ) -> RenderResult:
+        """Theme every page of a paginated ``fragment``; later pages become ``parts``."""
+
+        count = len(fragment.pages)
+        paths = [output_segments] + [
+            self._register_page_path(current_segments, output_segments, number) for number in range(2, count + 1)
+        ]
+        urls = [self._segments_to_url(path) for path in paths]
+        title = fragment.metadata.get("title") or ""
+        segments = tuple(current_segments)
+        nodes = tuple(
+            NavNode(segments[-1], page.title or title, url, segments) for page, url in zip(fragment.pages, urls)
+        )
+        site_metadata = self.renderer.site_metadata
+        base_url = site_metadata.get("base_url", "")
+        results: List[RenderResult] = []
+        for index, page in enumerate(fragment.pages):
+            previous = nodes[index - 1] if index else None
+            following = nodes[index + 1] if index + 1 < count else None
+            site_metadata["current_page"] = urls[index]
+            site_metadata["nav_previous"] = previous or neighbours[0]
+            site_metadata["nav_next"] = following or neighbours[1]
+            site_metadata["pagination"] = {
+                "index": index + 1,
+                "count": count,
+                "pages": nodes,
+                "previous": previous,
+                "next": following,
+            }
+            # Headings on the other pages link there; old ``#slug`` links are redirected.
+            toc = [entry if entry["page"] == index else {**entry, "url": urls[entry["page"]]} for entry in fragment.toc]
+            site_metadata["pagination_snippet"] = anchor_redirect_snippet(
+                {entry["slug"]: entry["url"] for entry in toc if "url" in entry}, base_url
+            )
+            metadata = fragment.metadata
+            if page.title is not None:
+                metadata = {**metadata, "title": f"{page.title} - {title}"}
+            rendered = self._apply_theme(
+                RenderedFragment(html=page.html, metadata=metadata, toc=toc, front_matter=fragment.front_matter)
+            )
+            results.append(
+                RenderResult(
+                    source=source,
+                    destination=self._build_destination_path(paths[index]),
+                    html=rendered.html,
+                    metadata=rendered.metadata,
+                    toc=rendered.toc,
+                    front_matter=rendered.front_matter,
+                    url=urls[index],
+                )
+            )
+        results[0].parts = results[1:]
+        return results[0]
+
+    def _decorate_images(self, fragment: RenderedFragment, source: Path) -> RenderedFragment:
+        decorate = functools.partial(self.image_sizer.decorate, page=source)  # type: ignore[union-attr]
+        images: Set[Path] = set()
+        if not fragment.pages:
+            decorated = replace(fragment, html=decorate(fragment.html, measured=images))
+        else:
+            pages = tuple(replace(page, html=decorate(page.html, measured=images)) for page in fragment.pages)
+            decorated = replace(fragment, html=pages[0].html, pages=pages)
+        self.image_graph.record(source, images)
+        return decorated
+
+    def _apply_theme(self, fragment: RenderedFragment) -> RenderedDocument:
+        rendered = self.renderer.apply_theme(fragment)
+        if getattr(self.config, "minify_html", False):
+            html = minify_html(rendered.html)
+            before, after = len(rendered.html.encode("utf-8")), len(html.encode("utf-8"))
+            self._minified[0] += before
+            self._minified[1] += after
+            self.metrics.minify_saved_bytes.inc(before - after)
+            rendered.html = html
+        return rendered
+
+    def _render_fragment(
+        self,
+        source: Path,
+        relative: Path,
+        text: Optional[str],
+        parse: Optional[Callable[[], ParsedDocument]],
+    ) -> RenderedFragment:
+        """Render the Markdown stage of ``source`` within :attr:`limits`."""
+
+        limits = self.limits
+        label = relative.as_posix()
+        if text is None:
+            limits.check_size(source.stat().st_size, label)
+            text = source.read_text(encoding="utf-8")
+        else:
+            limits.check_size(len(text.encode("utf-8")), label)
+        # Recorded before rendering, so a page whose include is still missing
+        # is rebuilt once the file appears.
+        includes = self.renderer.collect_includes(text, source)
+        self.include_graph.record(source, includes)
+        reason = suspect_reason(text) if limits.timeout else None
+        if reason is None:
+            return self.renderer.render_fragment(text, source_path=source, parse=parse, includes=includes)
+        shared = parse if isinstance(parse, _SharedParse) else None
+
+        def render_isolated() -> RenderedFragment:
+            # Only reached on a fragment cache miss; the result is cached like any other.
+            logger.info("Rendering %s in an isolated worker (%s)", label, reason)
+            worker = _IsolatedFragment(self.renderer, text, source, includes, shared)  # type: ignore[arg-type]
+            fragment, parsed = run_isolated(worker, limits.timeout, label=label)  # type: ignore[arg-type]
+            if shared is not None and parsed is not None:
+                shared.parsed = parsed
+            return fragment
+
+        return self.renderer.render_fragment(text, source_path=source, includes=includes, render=render_isolated)
+
+    def _error_fragment(self, relative: Path, title: str, exc: Exception) -> RenderedFragment:
+        label = relative.as_posix()
+        if isinstance(exc, DocumentLimitError):
+            logger.error("Replacing %s with an error page: %s", label, exc)
+        else:
+            logger.error(
+                "Replacing %s with an error page: %s: %s",
+                label,
+                type(exc).__name__,
+                exc,
+                exc_info=logger.isEnabledFor(logging.DEBUG),
+            )
+        html = (
+            '<div class="md2html-admonition md2html-admonition--warning" data-md2html-error>\n'
+            '  <div class="md2html-admonition__title">无法渲染此文档</div>\n'
+            '  <div class="md2html-admonition__body">\n'
+            f"    <p><code>{escape(label)}</code>: {escape(str(exc))}</p>\n"
+            "  </div>\n</div>\n"
+        )
+        return RenderedFragment(html=html, metadata={"title": title}, toc=[], front_matter={})
+
+    def plan_navigation(self, entries: Iterable[SourceEntry]) -> Navigation:
+        """Assign output paths to ``entries`` from scratch and build the navigation."""
+
+        self._output_path_map.clear()
+        self._page_path_map.clear()
+        self._used_output_paths.clear()
+        return self._build_navigation_structure(entries)
+
+    def page_url(self, source: Path) -> Optional[str]:
+        """Return the output URL registered for a Markdown ``source``, if any."""
+
+        relative = source.relative_to(self.config.source_dir)
+        output_segments = self._output_path_map.get(tuple(relative.with_suffix("").parts))
+        return None if output_segments is None else self._segments_to_url(output_segments)
+
+    def _build_navigation_structure(
+        self,
+        entries: Iterable[SourceEntry],
+        sort_by: Optional[str] = None,
+        order: Optional[str] = None,
+    ) -> Navigation:
         """
-        sort_by: 'name' or 'mtime'
-        order: 'asc' or 'desc'
+        sort_by: 'name', 'mtime', 'order' (front matter order/weight) or 'git'
+        order: 'asc' or 'desc'; both default to the configuration.
         """
+        sort_by = sort_by or getattr(self.config, "nav_sort", "name")
+        order = order or getattr(self.config, "nav_order", "asc")
+        commit_times = self._commit_times() if sort_by == "git" else {}
         documents: List[Dict[str, Any]] = []
-        for path in self.config.source_dir.rglob("*"):
-            if path.is_dir() or not is_markdown_file(path):
-                continue
-            if self._should_ignore(path):
-                logger.debug("Excluding %s from navigation due to ignore rules", path)
+        for entry in entries:
+            if not entry.is_markdown:
                 continue
-            relative = path.relative_to(self.config.source_dir)
-            segments = list(relative.with_suffix("").parts)
-            title = self._extract_title(path)
+            segments = list(entry.relative.with_suffix("").parts)
             output_segments = self._register_output_path(segments)
-            mtime = 0
-            try:
-                mtime = path.stat().st_mtime
-            except Exception:
-                pass
+            title, weight = self._cached_nav_info(entry)
+            if sort_by == "order":
+                sort_key: Optional[float] = weight
+            elif sort_by == "git":
+                sort_key = commit_times.get(entry.relative.as_posix(), entry.mtime)
+            else:
+                sort_key = entry.mtime
             documents.append(
                 {
                     "segments": segments,
                     "title": title,
                     "url": self._segments_to_url(output_segments),
-                    "output_segments": output_segments,
-                    "mtime": mtime,
-                    "name": "/".join(segments),
+                    "mtime": entry.mtime,
+                    "sort_key": sort_key,
                 }
             )
-
-        # sort documents
-        reverse = order == "desc"
-        if sort_by == "mtime":
-            documents.sort(key=lambda d: d["mtime"], reverse=reverse)
-        else:
-            documents.sort(key=lambda d: d["name"].lower(), reverse=reverse)
-
-        tree: Dict[str, Any] = {}
-        for doc in documents:
-            current = tree
-            segments = doc["segments"]
-            for index, segment in enumerate(segments):
-                node = current.setdefault(
-                    segment,
-                    {
-                        "title": format_segment_title(segment),
-                        "segments": list(segments[: index + 1]),
-                        "children": {},
-                        "url": None,
-                        "is_leaf": False,
-                        "mtime": doc["mtime"],
-                        "name": doc["name"],
-                    },
-                )
-                if index == len(segments) - 1:
-                    node["title"] = doc["title"]
-                    node["url"] = doc["url"]
-                    node["is_leaf"] = True
-                    node["mtime"] = doc["mtime"]
-                    node["name"] = doc["name"]
-                current = node["children"]
-
-        return self._serialise_navigation(tree, sort_by=sort_by, order=order)
-
-    def _serialise_navigation(self, tree: Dict[str, Any], sort_by: str = "name", order: str = "asc") -> List[Dict[str, Any]]:
-        nodes: List[Dict[str, Any]] = []
-        for name, data in tree.items():
-            children = self._serialise_navigation(data["children"], sort_by=sort_by, order=order)
-            nodes.append(
-                {
-                    "name": name,
-                    "title": data["title"],
-                    "url": data["url"],
-                    "is_leaf": data.get("is_leaf", False),
-                    "segments": list(data["segments"]),
-                    "children": children,
-                    "mtime": data.get("mtime", 0),
-                }
-            )
-        reverse = order == "desc"
-        if sort_by == "mtime":
-            nodes.sort(key=lambda d: d["mtime"], reverse=reverse)
-        else:
-            nodes.sort(key=lambda d: d["name"].lower(), reverse=reverse)
-        return nodes
+        return build_navigation(documents, sort_by=sort_by, order=order)
+
+    def _commit_times(self) -> Dict[str, float]:
+        # One history walk per HEAD: watch and daemon rebuilds reuse it.
+        head = git_head(self._resolved_source_dir)
+        cached_head, times = self._git_times
+        if head != cached_head or head is None:
+            times = git_commit_times(self._resolved_source_dir) if head is not None else {}
+            self._git_times = (head, times)
+        return times
+
+    def _adopt_output_paths(self, other: "SiteBuilder") -> None:
+        self._output_path_map = {key: list(value) for key, value in other._output_path_map.items()}
+        self._page_path_map = {key: list(value) for key, value in other._page_path_map.items()}
+        self._used_output_paths = set(other._used_output_paths)
 
     def _register_output_path(self, segments: List[str]) -> List[str]:
         normalised = [self._normalise_segment(segment) for segment in segments]
         if not normalised:
             normalised = ["index"]
 
+        result = self._claim_output_path(normalised)
+        self._output_path_map[tuple(segments)] = result
+        return result
+
+    def _register_page_path(self, segments: List[str], output_segments: List[str], number: int) -> List[str]:
+        """Output path of page ``number`` (from 2) of the paginated document at ``segments``."""
+
+        key = (tuple(segments), number)
+        result = self._page_path_map.get(key)
+        if result is None:
+            result = self._claim_output_path([*output_segments[:-1], f"{output_segments[-1]}-{number}"])
+            self._page_path_map[key] = result
+        return result
+
+    def _claim_output_path(self, normalised: List[str]) -> List[str]:
         base_name = normalised[-1] or "page"
         candidate = tuple(normalised)
         suffix = 2
@@ -465,9 +1319,7 @@ class SiteBuilder:
             suffix += 1
 
         self._used_output_paths.add(candidate)
-        result = list(normalised)
-        self._output_path_map[tuple(segments)] = result
-        return result
+        return list(normalised)
 
     def _build_destination_path(self, segments: List[str]) -> Path:
         if not segments:
@@ -492,29 +1344,68 @@ class SiteBuilder:
         cleaned = cleaned.strip("-_.")
         return cleaned.lower() or "page"
 
-    def _extract_title(self, path: Path) -> str:
+    def adopt_caches(self, other: "SiteBuilder") -> None:
+        """Reuse the theme independent caches of a previous builder."""
+
+        self._title_cache = other._title_cache
+        self._git_times = other._git_times
+        self.include_graph = other.include_graph
+        self.image_graph = other.image_graph
+        self.include_cache = other.include_cache
+        self.renderer.include_cache = other.include_cache
+        sizer = other.image_sizer
+        if self.image_sizer is not None and sizer is not None and sizer.root == self.image_sizer.root:
+            self.image_sizer = sizer
+        if other.fragment_cache is not None and self.fragment_cache is not None:
+            self.fragment_cache = other.fragment_cache
+            self.renderer.fragment_cache = other.fragment_cache
+
+    def _cached_nav_info(self, entry: SourceEntry) -> Tuple[str, Optional[float]]:
+        cached = self._title_cache.get(entry.path)
+        if cached is not None and cached[0] == entry.mtime and cached[1] == entry.size:
+            return cached[2], cached[3]
+        max_size = self.limits.max_size
+        if max_size is not None and entry.size > max_size:
+            # Too large to render; do not read it just for a title either.
+            title, weight = format_segment_title(entry.path.stem), None
+        else:
+            title, weight = self._extract_nav_info(entry.path)
+        self._title_cache[entry.path] = (entry.mtime, entry.size, title, weight)
+        return title, weight
+
+    def _extract_nav_info(self, path: Path) -> Tuple[str, Optional[float]]:
+        """Return the navigation title and front matter ``order``/``weight`` of ``path``."""
+
         try:
             text = path.read_text(encoding="utf-8")
-        except OSError as exc:
+        except (OSError, UnicodeDecodeError) as exc:
             logger.warning("Unable to read %s: %s", path, exc)
-            return format_segment_title(path.stem)
+            return format_segment_title(path.stem), None
 
         try:
             front_matter, body = parse_front_matter(text)
         except ValueError as exc:
             logger.warning("Invalid front matter in %s: %s", path, exc)
             front_matter, body = {}, text
+        if not isinstance(front_matter, dict):
+            front_matter = {}
 
-        title_value = front_matter.get("title") if isinstance(front_matter, dict) else None
+        weight: Optional[float] = None
+        for key in ("order", "weight"):
+            value = front_matter.get(key)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                weight = float(value)
+                break
+
+        title_value = front_matter.get("title")
         if isinstance(title_value, str) and title_value.strip():
-            return title_value.strip()
+            return title_value.strip(), weight
 
-        match = _HEADING_PATTERN.search(body)
-        if match:
-            heading = match.group(2).strip()
-            return heading
+        heading = _first_heading(body)
+        if heading:
+            return heading, weight
 
-        return format_segment_title(path.stem)
+        return format_segment_title(path.stem), weight
 
     def _prepare_ignore_rules(self, patterns: Iterable[str]) -> List[Tuple[str, bool]]:
         rules: List[Tuple[str, bool]] = []
@@ -583,20 +1474,46 @@ class SiteBuilder:
                 continue
         return None
 
-    def watch(self, on_rebuild: Optional[Callable[[Path], None]] = None) -> None:
-        logger.info("Entering watch mode. Monitoring %s", self.config.source_dir)
-        observer = Observer()
-        handler = _WatchHandler(self, on_rebuild=on_rebuild)
-        observer.schedule(handler, str(self.config.source_dir), recursive=True)
+    def watch(
+        self,
+        on_rebuild: Optional[Callable[[Path], None]] = None,
+        *,
+        reload_config: Optional[Callable[[], AppConfig]] = None,
+    ) -> None:
+        """Rebuild on source changes until interrupted.
+
+        Edits to the configuration file (re-resolved via ``reload_config``) or
+        to the active theme are applied in place without restarting.
+        """
+
+        from .watcher import SettingsWatcher, create_observer
+
+        if getattr(self.config, "archive", None):
+            raise ValueError("Watch mode requires directory output, not an archive")
+        logger.info(
+            "Entering watch mode (%s). Monitoring %s",
+            getattr(self.config, "watch_backend", "native"),
+            self.config.source_dir,
+        )
+        handler = _WatchHandler(self, on_rebuild=on_rebuild, reload_config=reload_config)
+        observer = create_observer(self, handler)
+        settings_watcher = SettingsWatcher(
+            self,
+            handler,
+            config_path=getattr(self.config, "config_path", None),
+            interval=getattr(self.config, "poll_interval", 1.0),
+        )
         observer.start()
+        settings_watcher.start()
         try:
             while True:
                 time.sleep(0.5)
         except KeyboardInterrupt:
             logger.info("Stopping watch mode")
         finally:
-            observer.stop()
-            observer.join()
+            for watcher in (observer, settings_watcher):
+                watcher.stop()
+                watcher.join()
 
     def rebuild_path(self, path: Path) -> None:
         if path.is_dir():
@@ -607,7 +1524,22 @@ class SiteBuilder:
             return
 
         if is_markdown_file(path):
-            logger.debug("Markdown change detected; rebuilding entire site")
+            if is_partial(path):
+                dependents = self.include_graph.dependents(path)
+                if not dependents:
+                    logger.debug("No page includes %s; nothing to rebuild", path)
+                    return
+                # Only the dependents miss the fragment cache.
+                logger.info("%s changed; re-rendering %d page(s) that include it", path.name, len(dependents))
+            else:
+                logger.debug("Markdown change detected; rebuilding entire site")
+            self.build_all()
+            return
+
+        dependents = self.image_graph.dependents(path)
+        if dependents:
+            # Their width and height were read from this image; the build also copies it.
+            logger.info("%s changed; re-rendering %d page(s) that show it", path.name, len(dependents))
             self.build_all()
             return
 
@@ -618,40 +1550,272 @@ class SiteBuilder:
             logger.info("Copied static asset %s", relative)
 
 
-class _WatchHandler(FileSystemEventHandler):
-    """React to filesystem updates by rebuilding the changed target."""
+class _SharedParse:
+    """Parse a source at most once on behalf of several renderers."""
+
+    def __init__(self, renderer: MarkdownRenderer, text: str, source: Path) -> None:
+        self._renderer = renderer
+        self._text = text
+        self._source = source
+        # Also set by isolated renders, which parse in their worker.
+        self.parsed: Optional[ParsedDocument] = None
+
+    def __call__(self) -> ParsedDocument:
+        if self.parsed is None:
+            self.parsed = self._renderer.parse(self._text, source_path=self._source)
+        return self.parsed
+
+
+class _IsolatedFragment:
+    """Picklable ``render_fragment`` call for :func:`~md2html.limits.run_isolated`.
+
+    The worker starts without the build's state, so it builds its own
+    renderer from the settings of ``renderer``. Rendering a fragment needs
+    only the theme's configuration; its compiled template is left behind.
+    With a ``shared`` parse of several variants, the worker reuses a parse
+    that an earlier variant's worker sent back, or sends its own back.
+    """
+
+    def __init__(
+        self,
+        renderer: MarkdownRenderer,
+        text: str,
+        source: Path,
+        includes: IncludeSources,
+        shared: Optional[_SharedParse] = None,
+    ) -> None:
+        self._theme = replace(renderer.theme, template=None)
+        self._settings = {
+            "exclude_hide": renderer.exclude_hide,
+            "defer_hide_threshold": renderer.defer_hide_threshold,
+            "max_nesting": renderer.max_nesting,
+            "markdown_backend": renderer.backend.name,
+            "include_root": renderer.include_root,
+            "paginate_level": renderer.paginate_level,
+            "paginate_threshold": renderer.paginate_threshold,
+        }
+        self._text = text
+        self._source = source
+        self._includes = includes
+        self._share = shared is not None
+        self._parsed = shared.parsed if shared is not None else None
+
+    def __call__(self) -> Tuple[RenderedFragment, Optional[ParsedDocument]]:
+        renderer = MarkdownRenderer(self._theme, **self._settings)  # type: ignore[arg-type]
+        parsed = self._parsed
+        if parsed is None and self._share:
+            parsed = renderer.parse(self._text, source_path=self._source, includes=self._includes)
+        fragment = renderer.render_fragment(
+            self._text,
+            source_path=self._source,
+            parse=(lambda: parsed) if parsed is not None else None,  # type: ignore[return-value]
+            includes=self._includes,
+        )
+        # A parse that came from the parent need not travel back.
+        return fragment, parsed if self._parsed is None else None
+
+
+class VariantBuilder:
+    """Build several site variants from one source scan and shared parses.
+
+    Variants share the source tree, so navigation and output paths are
+    computed once; each variant only re-runs hide filtering and templating.
+    """
+
+    def __init__(self, builders: Dict[str, SiteBuilder]) -> None:
+        if not builders:
+            raise ValueError("At least one variant is required")
+        self.builders = builders
+        self._validate()
+
+    def _validate(self) -> None:
+        primary = next(iter(self.builders.values()))
+        seen_outputs: Dict[Path, str] = {}
+        for name, builder in self.builders.items():
+            if builder._resolved_source_dir != primary._resolved_source_dir:  # pylint: disable=protected-access
+                raise ValueError(f"Variant '{name}' must use the same source_dir as the other variants")
+            if builder._ignore_rules != primary._ignore_rules:  # pylint: disable=protected-access
+                raise ValueError(f"Variant '{name}' must use the same ignore rules as the other variants")
+            if builder.renderer.backend.name != primary.renderer.backend.name:
+                # Variants share one parse per source.
+                raise ValueError(f"Variant '{name}' must use the same markdown_backend as the other variants")
+            if builder.shard is not None:
+                raise ValueError("Sharded builds cannot be combined with variants")
+            output = builder.writer.location.resolve()
+            if output in seen_outputs:
+                raise ValueError(f"Variants '{seen_outputs[output]}' and '{name}' share output {output}")
+            seen_outputs[output] = name
+
+    def build_all(self) -> Dict[str, List[RenderResult]]:
+        builders = list(self.builders.values())
+        primary = builders[0]
+        entries = primary.scan_sources()
+        for name, builder in self.builders.items():
+            logger.info("Building variant '%s' into %s", name, builder.writer.location)
+            builder.prepare_output()
+
+        navigation = primary._build_navigation_structure(entries)  # pylint: disable=protected-access
+        for builder in builders[1:]:
+            builder._adopt_output_paths(primary)  # pylint: disable=protected-access
+
+        results: Dict[str, List[RenderResult]] = {name: [] for name in self.builders}
+        threads, depth = primary._pipeline_settings()  # pylint: disable=protected-access
+        pools = {
+            name: create_writer_pool(builder._writer_threads(threads), depth)  # pylint: disable=protected-access
+            for name, builder in self.builders.items()
+        }
+        sources = prefetch(entries, primary._prefetch_source, threads=threads, depth=depth)  # pylint: disable=protected-access
+        try:
+            for entry, text in sources:
+                if entry.is_markdown:
+                    # Without text each variant reads the source again and writes its error page.
+                    shared = _SharedParse(primary.renderer, text, entry.path) if text is not None else None
+                    for name, builder in self.builders.items():
+                        result = builder._build_single_markdown(  # pylint: disable=protected-access
+                            entry.path, navigation, text=text, parse=shared, submit=pools[name].submit
+                        )
+                        results[name].append(result)
+                        results[name].extend(result.parts)
+                    continue
+                for name, builder in self.builders.items():
+                    if builder.config.copy_static:
+                        pools[name].submit(functools.partial(builder._copy_static_entry, entry))  # pylint: disable=protected-access
+        except BaseException:
+            for pool in pools.values():
+                pool.close(cancel=True)
+            raise
+        finally:
+            sources.close()
+        failure: Optional[BaseException] = None
+        for pool in pools.values():
+            try:
+                pool.close(cancel=failure is not None)
+            except BaseException as exc:  # pylint: disable=broad-except
+                failure = exc
+        if failure is not None:
+            raise failure
+
+        for builder in builders:
+            builder.finish_build()
+        return results
+
+
+class _WatchHandler:
+    """React to filesystem updates by rebuilding the changed target.
+
+    Implements watchdog's ``dispatch`` protocol directly so that importing
+    this module does not pull in watchdog for builds that never watch.
+    """
 
-    def __init__(self, builder: SiteBuilder, *, on_rebuild: Optional[Callable[[Path], None]] = None) -> None:
-        super().__init__()
+    def __init__(
+        self,
+        builder: SiteBuilder,
+        *,
+        on_rebuild: Optional[Callable[[Path], None]] = None,
+        reload_config: Optional[Callable[[], AppConfig]] = None,
+    ) -> None:
         self.builder = builder
         self._lock = threading.Lock()
         self._callback = on_rebuild
+        self._reload_config = reload_config
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        registry = builder.metrics.registry
+        self._rebuilds = registry.counter(
+            "md2html_rebuilds_total",
+            "Rebuilds triggered by watched changes.",
+            labelnames=("trigger", "outcome"),
+        )
+        self._rebuild_seconds = registry.histogram(
+            "md2html_rebuild_duration_seconds",
+            "Time from picking up a watched change to finishing its rebuild.",
+            labelnames=("trigger",),
+        )
+
+    @property
+    def pending(self) -> int:
+        """Events being handled or waiting for the rebuild lock."""
+
+        return self._pending
+
+    def dispatch(self, event) -> None:
+        handler = getattr(self, f"on_{event.event_type}", None)
+        if handler is not None:
+            self._track_pending(1)
+            try:
+                handler(event)
+            finally:
+                self._track_pending(-1)
+
+    def _track_pending(self, delta: int) -> None:
+        with self._pending_lock:
+            self._pending += delta
+
+    @contextmanager
+    def _record(self, trigger: str) -> Iterator[None]:
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            yield
+            outcome = "ok"
+        finally:
+            self._rebuilds.inc(trigger=trigger, outcome=outcome)
+            self._rebuild_seconds.observe(time.perf_counter() - started, trigger=trigger)
 
-    def on_modified(self, event):  # type: ignore[override]
+    def on_modified(self, event):
         self._handle_event(event)
 
-    def on_created(self, event):  # type: ignore[override]
+    def on_created(self, event):
         self._handle_event(event)
 
-    def on_moved(self, event):  # type: ignore[override]
+    def on_moved(self, event):
         self._handle_event(event, destination=Path(event.dest_path))
 
-    def on_deleted(self, event):  # type: ignore[override]
+    def on_deleted(self, event):
         if event.is_directory:
             return
         path = Path(event.src_path)
         with self._lock:
             logger.debug("Detected deletion of %s", path)
             try:
-                self.builder.build_all()
+                with self._record("deletion"):
+                    self.builder.build_all()
             except Exception as exc:  # pylint: disable=broad-except
                 logger.error("Failed to rebuild after deletion %s: %s", path, exc)
             else:
-                if self._callback:
-                    try:
-                        self._callback(path)
-                    except Exception as cb_exc:  # pylint: disable=broad-except
-                        logger.error("Watch callback failed for %s: %s", path, cb_exc)
+                self._notify(path)
+
+    def reload_settings(self, path: Path, *, config_changed: bool) -> None:
+        """Reload the theme (and the configuration, if it changed) and rebuild.
+
+        On failure the previous configuration and theme stay active.
+        """
+
+        self._track_pending(1)
+        try:
+            with self._lock:
+                logger.info("Detected change in %s; reloading %s", path, "configuration" if config_changed else "theme")
+                try:
+                    with self._record("config" if config_changed else "theme"):
+                        config = self.builder.config
+                        if config_changed and self._reload_config is not None:
+                            config = self._reload_config()
+                            self._warn_about_restart(self.builder.config, config)
+                        theme = ThemeManager(config.theme_dirs).load(config.theme)
+                        self.builder.reload_settings(config, theme)
+                        self.builder.build_all()
+                except Exception as exc:  # pylint: disable=broad-except
+                    logger.error("Failed to reload after change to %s: %s", path, exc)
+                else:
+                    self._notify(path)
+        finally:
+            self._track_pending(-1)
+
+    @staticmethod
+    def _warn_about_restart(previous: AppConfig, current: AppConfig) -> None:
+        for key in ("source_dir", "watch_backend", "poll_interval"):
+            if getattr(previous, key, None) != getattr(current, key, None):
+                logger.warning("Changing %s takes effect after a restart", key)
 
     def _handle_event(self, event, *, destination: Optional[Path] = None) -> None:
         if event.is_directory:
@@ -665,18 +1829,27 @@ class _WatchHandler(FileSystemEventHandler):
         with self._lock:
             logger.debug("Detected change in %s", path)
             try:
-                self.builder.rebuild_path(path)
+                with self._record("content" if is_markdown_file(path) else "asset"):
+                    self.builder.rebuild_path(path)
             except Exception as exc:  # pylint: disable=broad-except
                 logger.error("Failed to rebuild %s: %s", path, exc)
             else:
-                if self._callback:
-                    try:
-                        self._callback(path)
-                    except Exception as cb_exc:  # pylint: disable=broad-except
-                        logger.error("Watch callback failed for %s: %s", path, cb_exc)
+                self._notify(path)
+
+    def _notify(self, path: Path) -> None:
+        if self._callback:
+            try:
+                self._callback(path)
+            except Exception as cb_exc:  # pylint: disable=broad-except
+                logger.error("Watch callback failed for %s: %s", path, cb_exc)
 
 
-def convert_docs_directory(config: AppConfig, *, theme_manager: Optional[ThemeManager] = None) -> List[RenderResult]:
+def convert_docs_directory(
+    config: AppConfig,
+    *,
+    theme_manager: Optional[ThemeManager] = None,
+    reload_config: Optional[Callable[[], AppConfig]] = None,
+) -> List[RenderResult]:
     """High level helper used by the CLI."""
 
     theme_manager = theme_manager or ThemeManager(config.theme_dirs)
@@ -684,5 +1857,34 @@ def convert_docs_directory(config: AppConfig, *, theme_manager: Optional[ThemeMa
     builder = SiteBuilder(config, theme)
     results = builder.build_all()
     if config.watch:
-        builder.watch()
+        builder.watch(reload_config=reload_config)
     return results
+
+
+def build_variants(
+    config: AppConfig,
+    names: Optional[Iterable[str]] = None,
+    *,
+    theme_manager: Optional[ThemeManager] = None,
+) -> List[RenderResult]:
+    """Build the configured variants with a single scan and parse pass."""
+
+    theme_manager = theme_manager or ThemeManager(config.theme_dirs)
+    themes: Dict[str, Theme] = {}
+    builders: Dict[str, SiteBuilder] = {}
+    shared_cache: Optional[LRUCache[RenderedFragment]] = None
+    for name, variant in config.resolve_variants(names):
+        if variant.theme not in themes:
+            themes[variant.theme] = theme_manager.load(variant.theme)
+        builder = SiteBuilder(variant, themes[variant.theme])
+        # Fragment keys include the renderer fingerprint, so one cache is safe
+        # to share and lets variants with identical settings reuse fragments.
+        if shared_cache is None:
+            shared_cache = builder.fragment_cache
+        elif builder.fragment_cache is not None:
+            builder.fragment_cache = shared_cache
+            builder.renderer.fragment_cache = shared_cache
+        builders[name] = builder
+
+    results = VariantBuilder(builders).build_all()
+    return [result for variant_results in results.values() for result in variant_results]
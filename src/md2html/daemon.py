@@ -0,0 +1,346 @@
+"""Long-lived build daemon that keeps themes, parsers and caches warm.
+
+The daemon listens on a local Unix socket. ``md2html`` forwards plain builds
+to it when the socket exists and falls back to building in-process when the
+daemon is absent or unreachable.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+LOG_FORMAT = "[%(levelname)s] %(message)s"
+SOCKET_ENV_VAR = "MD2HTML_DAEMON_SOCKET"
+PROTOCOL_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+
+def default_socket_path() -> Path:
+    """Return the socket path shared by the daemon and the CLI client."""
+
+    configured = os.environ.get(SOCKET_ENV_VAR)
+    if configured:
+        return Path(configured)
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    uid = os.getuid() if hasattr(os, "getuid") else 0
+    return Path(runtime_dir) / f"md2html-{uid}.sock"
+
+
+def daemon_supported() -> bool:
+    return hasattr(socket, "AF_UNIX")
+
+
+class _ClientLogHandler(logging.Handler):
+    """Stream log records of the current request back to the client."""
+
+    def __init__(self, stream: Any) -> None:
+        super().__init__()
+        self._stream = stream
+        self.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            _send(self._stream, {"log": self.format(record)})
+        except (BrokenPipeError, ConnectionResetError, OSError):  # pragma: no cover - client went away
+            pass
+
+
+class BuildDaemon:
+    """Serve build requests over a Unix socket, reusing warm builders."""
+
+    def __init__(self, socket_path: Optional[Path] = None) -> None:
+        self.socket_path = Path(socket_path or default_socket_path())
+        self._server: Optional[socketserver.UnixStreamServer] = None
+        self._builders: Dict[str, Tuple[Any, Tuple[Tuple[str, int], ...]]] = {}
+        self._lock = threading.Lock()
+        self.builds = 0
+        self._metrics: Optional[Any] = None
+
+    @property
+    def metrics(self) -> Any:
+        """Build metrics shared by every warm builder, created on first use."""
+
+        if self._metrics is None:
+            from .metrics import BuildMetrics
+
+            self._metrics = BuildMetrics()
+            self._metrics.registry.gauge(
+                "md2html_daemon_warm_builders",
+                "Builders kept warm by the daemon.",
+                callback=lambda: len(self._builders),
+            )
+        return self._metrics
+
+    def serve_forever(self) -> None:
+        self._server = self._create_server()
+        logger.info("md2html daemon listening on %s", self.socket_path)
+        self._run(self._server)
+
+    def start_background(self) -> threading.Thread:
+        """Start serving on a daemon thread; used by tests and embedders."""
+
+        self._server = self._create_server()
+        thread = threading.Thread(target=self._run, args=(self._server,), daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self) -> None:
+        if self._server:
+            self._server.shutdown()
+
+    def _run(self, server: socketserver.UnixStreamServer) -> None:
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            self._server = None
+            try:
+                self.socket_path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _create_server(self) -> socketserver.UnixStreamServer:
+        if not daemon_supported():
+            raise RuntimeError("The build daemon requires Unix domain sockets")
+        if self.socket_path.exists():
+            if _ping(self.socket_path):
+                raise RuntimeError(f"A daemon is already listening on {self.socket_path}")
+            self.socket_path.unlink()
+
+        daemon = self
+
+        class RequestHandler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                line = self.rfile.readline()
+                if not line:
+                    return
+                try:
+                    request = json.loads(line.decode("utf-8"))
+                except ValueError:
+                    _send(self.wfile, {"status": 2, "error": "Malformed request"})
+                    return
+                daemon._dispatch(request, self.wfile)
+
+        # Bound inside a directory only this user can enter and moved into
+        # place once restricted, so other users can never connect to it.
+        staging = Path(tempfile.mkdtemp(prefix=".md2html-", dir=self.socket_path.parent))
+        try:
+            server = socketserver.UnixStreamServer(str(staging / "sock"), RequestHandler)
+            try:
+                os.chmod(staging / "sock", 0o600)
+                os.replace(staging / "sock", self.socket_path)
+            except OSError:
+                server.server_close()
+                raise
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        return server
+
+    def _dispatch(self, request: Dict[str, Any], stream: Any) -> None:
+        command = request.get("command")
+        if request.get("version") != PROTOCOL_VERSION:
+            _send(stream, {"status": 2, "error": "Protocol version mismatch"})
+            return
+        if command == "ping":
+            _send(stream, {"status": 0, "builds": self.builds, "pid": os.getpid()})
+            return
+        if command == "metrics":
+            _send(stream, {"status": 0, "metrics": self.metrics.registry.render()})
+            return
+        if command == "shutdown":
+            _send(stream, {"status": 0})
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return
+        if command == "build":
+            with self._lock:
+                status = self._handle_build(request, stream)
+            _send(stream, {"status": status})
+            return
+        _send(stream, {"status": 2, "error": f"Unknown command {command!r}"})
+
+    def _handle_build(self, request: Dict[str, Any], stream: Any) -> int:
+        from .cli import build_argument_parser, resolve_configuration
+
+        try:
+            args = build_argument_parser().parse_args(request.get("argv") or [])
+        except SystemExit:
+            return 2
+        cwd = Path(request.get("cwd") or os.getcwd())
+
+        root_logger = logging.getLogger()
+        level = logging.DEBUG if args.verbose else logging.INFO
+        client_handler = _ClientLogHandler(stream)
+        client_handler.setLevel(level)
+        previous_level = root_logger.level
+        root_logger.addHandler(client_handler)
+        root_logger.setLevel(level)
+        try:
+            config = resolve_configuration(args, cwd=cwd)
+            if config.watch or args.variants or args.all_variants:
+                # Only plain builds are served; status 2 makes the CLI build locally.
+                logger.debug("Declining a watch or variant build; building in the CLI instead")
+                return 2
+            if not Path(config.theme).is_absolute() and (cwd / config.theme).exists():
+                config.theme = str(cwd / config.theme)
+            builder = self._get_builder(config)
+            results = builder.build_all()
+            self.builds += 1
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.error("md2html failed: %s", exc)
+            return 1
+        finally:
+            root_logger.removeHandler(client_handler)
+            root_logger.setLevel(previous_level)
+        return 1 if any(result.error for result in results) else 0
+
+    def _get_builder(self, config: Any) -> Any:
+        from .converter import SiteBuilder
+        from .theme import ThemeManager
+
+        key = json.dumps(asdict(config), sort_keys=True, default=str)
+        cached = self._builders.get(key)
+        if cached is not None:
+            builder, signature = cached
+            if signature == _theme_signature(builder.theme.root):
+                logger.debug("Reusing warm builder for %s", config.source_dir)
+                return builder
+
+        theme = ThemeManager(config.theme_dirs).load(config.theme)
+        builder = SiteBuilder(config, theme)
+        builder.metrics = self.metrics
+        if cached is not None:
+            # The theme changed on disk: keep the theme independent caches.
+            previous = cached[0]
+            builder.adopt_caches(previous)
+        self._builders[key] = (builder, _theme_signature(theme.root))
+        return builder
+
+
+def _theme_signature(root: Optional[Path]) -> Tuple[Tuple[str, int], ...]:
+    if root is None or not root.is_dir():
+        return ()
+    signature = []
+    for path in sorted(root.rglob("*")):
+        try:
+            signature.append((path.as_posix(), path.stat().st_mtime_ns))
+        except OSError:
+            continue
+    return tuple(signature)
+
+
+def _send(stream: Any, payload: Dict[str, Any]) -> None:
+    stream.write(json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n")
+    stream.flush()
+
+
+def _request(socket_path: Path, payload: Dict[str, Any], *, timeout: Optional[float] = None) -> Iterable[Dict[str, Any]]:
+    payload = dict(payload, version=PROTOCOL_VERSION)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(str(socket_path))
+        client.sendall(json.dumps(payload).encode("utf-8") + b"\n")
+        with client.makefile("rb") as reader:
+            for line in reader:
+                yield json.loads(line.decode("utf-8"))
+
+
+def _ping(socket_path: Path) -> bool:
+    try:
+        for message in _request(socket_path, {"command": "ping"}, timeout=1.0):
+            return message.get("status") == 0
+    except (OSError, ValueError):
+        return False
+    return False
+
+
+def forward_build(argv: list[str], socket_path: Optional[Path] = None) -> Optional[int]:
+    """Run a build on the daemon; return ``None`` when it is unavailable."""
+
+    if not daemon_supported():
+        return None
+    socket_path = Path(socket_path or default_socket_path())
+    if not socket_path.exists():
+        return None
+
+    status: Optional[int] = None
+    try:
+        for message in _request(socket_path, {"command": "build", "argv": argv, "cwd": os.getcwd()}):
+            if "log" in message:
+                print(message["log"], file=sys.stderr)
+            if "status" in message:
+                status = int(message["status"])
+                if message.get("error"):
+                    print(f"[ERROR] {message['error']}", file=sys.stderr)
+    except (OSError, ValueError) as exc:
+        if status is None:
+            logger.debug("Build daemon at %s unavailable: %s", socket_path, exc)
+        return status
+    # Status 2 means the daemon rejected the request; build locally instead.
+    return None if status == 2 else status
+
+
+def build_argument_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="md2html daemon",
+        description="Run a persistent md2html build daemon on a local Unix socket.",
+    )
+    parser.add_argument("--socket", dest="socket", help="Socket path (default: $MD2HTML_DAEMON_SOCKET or a per-user temp path)")
+    parser.add_argument("--stop", dest="stop", action="store_true", help="Stop a running daemon")
+    parser.add_argument("--status", dest="status", action="store_true", help="Report whether a daemon is running")
+    parser.add_argument(
+        "--metrics",
+        dest="metrics",
+        action="store_true",
+        help="Print the running daemon's build metrics in Prometheus text format",
+    )
+    parser.add_argument("--verbose", dest="verbose", action="store_true", help="Enable verbose logging")
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = build_argument_parser()
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format=LOG_FORMAT)
+    socket_path = Path(args.socket) if args.socket else default_socket_path()
+
+    if args.status or args.stop or args.metrics:
+        if not socket_path.exists() or not _ping(socket_path):
+            logger.info("No daemon is running on %s", socket_path)
+            return 1
+        if args.metrics:
+            for message in _request(socket_path, {"command": "metrics"}, timeout=5.0):
+                sys.stdout.write(message.get("metrics", ""))
+        elif args.stop:
+            list(_request(socket_path, {"command": "shutdown"}, timeout=5.0))
+            logger.info("Stopped daemon on %s", socket_path)
+        else:
+            logger.info("Daemon is running on %s", socket_path)
+        return 0
+
+    daemon = BuildDaemon(socket_path)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Stopping md2html daemon")
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.error("md2html daemon failed: %s", exc)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,245 @@
+"""Incremental deployment of a built site to a git branch (e.g. ``gh-pages``).
+
+The deploy never checks out a worktree. It loads the branch tip into a
+temporary index, hashes only the outputs the build manifest reports as
+added or changed, applies the deletions and commits the resulting tree with
+git plumbing, so the work done is proportional to the size of the change.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import subprocess
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Sequence
+
+from .manifest import BUILD_MANIFEST_NAME, BuildChanges, diff_files, load_build_manifest, parse_build_manifest
+
+LOG_FORMAT = "[%(levelname)s] %(message)s"
+NULL_SHA = "0" * 40
+FILE_MODE = "100644"
+
+logger = logging.getLogger(__name__)
+
+
+class DeployError(RuntimeError):
+    """Raised when the site cannot be deployed."""
+
+
+@dataclass
+class DeployResult:
+    commit: Optional[str]
+    incremental: bool
+    changes: BuildChanges = field(default_factory=BuildChanges)
+
+
+class _Git:
+    """Minimal runner for git plumbing commands against one repository."""
+
+    def __init__(self, repo: Path, index_file: Optional[Path] = None) -> None:
+        self.git_dir = self._resolve_git_dir(repo)
+        self.env = dict(os.environ, GIT_DIR=str(self.git_dir))
+        if index_file is not None:
+            self.env["GIT_INDEX_FILE"] = str(index_file)
+
+    @staticmethod
+    def _resolve_git_dir(repo: Path) -> Path:
+        try:
+            output = subprocess.run(
+                ["git", "-C", str(repo), "rev-parse", "--absolute-git-dir"],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+        except FileNotFoundError as exc:
+            raise DeployError("git is required but was not found in PATH") from exc
+        except subprocess.CalledProcessError as exc:
+            raise DeployError(f"{repo} is not a git repository") from exc
+        return Path(output.strip())
+
+    def run(self, *args: str, input: Optional[bytes] = None, check: bool = True) -> bytes:
+        completed = subprocess.run(["git", *args], input=input, env=self.env, capture_output=True)
+        if check and completed.returncode != 0:
+            message = completed.stderr.decode("utf-8", "replace").strip()
+            raise DeployError(f"git {args[0]} failed: {message}")
+        return completed.stdout
+
+    def text(self, *args: str, input: Optional[bytes] = None) -> str:
+        return self.run(*args, input=input).decode("utf-8").strip()
+
+    def resolve(self, rev: str) -> Optional[str]:
+        output = self.run("rev-parse", "--verify", "--quiet", rev, check=False).decode("utf-8").strip()
+        return output or None
+
+
+def _tree_blobs(git: _Git, commit: str) -> Dict[str, str]:
+    output = git.run("ls-tree", "-r", "-z", "--full-tree", commit)
+    blobs: Dict[str, str] = {}
+    for entry in output.split(b"\0"):
+        if not entry:
+            continue
+        meta, _, path = entry.partition(b"\t")
+        _mode, kind, sha = meta.decode("ascii").split()
+        if kind == "blob":
+            blobs[path.decode("utf-8")] = sha
+    return blobs
+
+
+def _deployed_build_id(git: _Git, commit: str) -> Optional[str]:
+    payload = git.run("cat-file", "blob", f"{commit}:{BUILD_MANIFEST_NAME}", check=False)
+    manifest = parse_build_manifest(payload) if payload else None
+    return manifest.get("build_id") if manifest else None
+
+
+def _hash_objects(git: _Git, site_dir: Path, paths: Sequence[str]) -> List[str]:
+    if not paths:
+        return []
+    stdin = "".join(f"{site_dir / relative}\n" for relative in paths).encode("utf-8")
+    return git.text("hash-object", "-w", "--no-filters", "--stdin-paths", input=stdin).splitlines()
+
+
+def deploy_site(
+    site_dir: Path,
+    repo: Path,
+    *,
+    branch: str = "gh-pages",
+    message: str = "Deploy site",
+    cname: Optional[str] = None,
+    nojekyll: bool = True,
+) -> DeployResult:
+    """Commit the built site in ``site_dir`` to ``branch`` of ``repo``.
+
+    When the branch holds the build the manifest was diffed against, only the
+    reported changes are applied. Otherwise the manifest's precomputed blob ids
+    are compared with the branch tree, which still avoids re-hashing the site.
+    """
+
+    site_dir = Path(site_dir)
+    manifest = load_build_manifest(site_dir / BUILD_MANIFEST_NAME)
+    if manifest is None:
+        raise DeployError(f"{site_dir} has no {BUILD_MANIFEST_NAME}; build the site first")
+    files: Mapping[str, Mapping[str, str]] = manifest.get("files") or {}
+    ref = f"refs/heads/{branch}"
+
+    with tempfile.TemporaryDirectory(prefix="md2html-deploy-") as tmp:
+        git = _Git(repo, Path(tmp) / "index")
+        parent = git.resolve(f"{ref}^{{commit}}")
+
+        extras: Dict[str, bytes] = {}
+        if nojekyll:
+            extras[".nojekyll"] = b""
+        if cname:
+            extras["CNAME"] = cname.strip().encode("utf-8") + b"\n"
+
+        if parent is None:
+            incremental = False
+            changes = BuildChanges(added=sorted(files))
+        else:
+            git.run("read-tree", parent)
+            previous_build_id = manifest.get("previous_build_id")
+            incremental = previous_build_id is not None and _deployed_build_id(git, parent) == previous_build_id
+            if incremental:
+                recorded = manifest.get("changes") or {}
+                changes = BuildChanges(
+                    added=list(recorded.get("added", [])),
+                    changed=list(recorded.get("changed", [])),
+                    deleted=list(recorded.get("deleted", [])),
+                )
+            else:
+                logger.info("Branch %s does not hold the previous build; comparing against its tree", branch)
+                deployed = {
+                    relative: {"blob": sha}
+                    for relative, sha in _tree_blobs(git, parent).items()
+                    if relative not in extras and relative != BUILD_MANIFEST_NAME
+                }
+                changes = diff_files(deployed, files)
+
+        updated = changes.added + changes.changed
+        blobs = _hash_objects(git, site_dir, updated)
+        for relative, blob in zip(updated, blobs):
+            if blob != files[relative]["blob"]:
+                raise DeployError(f"{relative} changed on disk since the build; rebuild before deploying")
+
+        extras[BUILD_MANIFEST_NAME] = (site_dir / BUILD_MANIFEST_NAME).read_bytes()
+        records = [f"{FILE_MODE} {blob}\t{relative}" for relative, blob in zip(updated, blobs)]
+        records.extend(f"0 {NULL_SHA}\t{relative}" for relative in changes.deleted)
+        for relative, payload in extras.items():
+            blob = git.text("hash-object", "-w", "--stdin", input=payload)
+            records.append(f"{FILE_MODE} {blob}\t{relative}")
+        git.run("update-index", "-z", "--index-info", input="".join(f"{record}\0" for record in records).encode("utf-8"))
+        tree = git.text("write-tree")
+
+        if parent is not None and git.text("rev-parse", f"{parent}^{{tree}}") == tree:
+            logger.info("No changes to deploy to %s", branch)
+            return DeployResult(commit=None, incremental=incremental, changes=changes)
+
+        commit_args = ["commit-tree", tree, "-m", message]
+        if parent is not None:
+            commit_args[2:2] = ["-p", parent]
+        commit = git.text(*commit_args)
+        git.run("update-ref", "-m", message, ref, commit, parent or NULL_SHA)
+
+    logger.info(
+        "Deployed %s to %s (%d added, %d changed, %d deleted%s)",
+        commit[:12],
+        branch,
+        len(changes.added),
+        len(changes.changed),
+        len(changes.deleted),
+        "" if incremental else ", full comparison",
+    )
+    return DeployResult(commit=commit, incremental=incremental, changes=changes)
+
+
+def build_argument_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="md2html deploy",
+        description="Commit a built site to a git branch, updating only the files that changed.",
+    )
+    parser.add_argument("--site", dest="site_dir", default="build/html", help="Built site directory (default: build/html)")
+    parser.add_argument("--repo", dest="repo", default=".", help="Repository to commit to; may be bare (default: .)")
+    parser.add_argument("--branch", dest="branch", default="gh-pages", help="Branch to update (default: gh-pages)")
+    parser.add_argument("-m", "--message", dest="message", default="Deploy site", help="Commit message")
+    parser.add_argument("--cname", dest="cname", help="Custom domain written to CNAME (default: the repository's CNAME file, if any)")
+    parser.add_argument(
+        "--no-nojekyll",
+        dest="nojekyll",
+        action="store_false",
+        help="Do not add an empty .nojekyll file",
+    )
+    parser.add_argument("--verbose", dest="verbose", action="store_true", help="Enable verbose logging")
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = build_argument_parser()
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format=LOG_FORMAT)
+
+    cname = args.cname
+    cname_file = Path(args.repo) / "CNAME"
+    if cname is None and cname_file.is_file():
+        cname = cname_file.read_text(encoding="utf-8")
+
+    try:
+        deploy_site(
+            Path(args.site_dir),
+            Path(args.repo),
+            branch=args.branch,
+            message=args.message,
+            cname=cname,
+            nojekyll=args.nojekyll,
+        )
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.error("md2html deploy failed: %s", exc)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -3,48 +3,125 @@
 from __future__ import annotations
 
 import argparse
+import hashlib
+import json
 import logging
 import queue
 import threading
 import time
 import webbrowser
+from dataclasses import dataclass
 from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
-from typing import Optional
-from urllib.parse import urlsplit, urlunsplit
-
-from watchdog.observers import Observer  # type: ignore[import]
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import parse_qs, unquote, urlsplit, urlunsplit
 
 from .cli import resolve_configuration
 from .config import AppConfig
 from .converter import SiteBuilder, _WatchHandler
+from .metrics import PROMETHEUS_CONTENT_TYPE
+from .regions import find_element_spans
 from .theme import ThemeManager
+from .utils import is_markdown_file
+from .watcher import WATCH_BACKENDS, SettingsWatcher, create_observer
 
 LOG_FORMAT = "[%(levelname)s] %(message)s"
 LIVE_RELOAD_SNIPPET = (
     "<script>\n"
     "(function () {\n"
-    "  var source = new EventSource('/__livereload__');\n"
-    "  source.addEventListener('reload', function () {\n"
-    "    window.location.reload();\n"
-    "  });\n"
-    "  source.addEventListener('ping', function () {});\n"
-    "  source.onerror = function () {\n"
-    "    source.close();\n"
-    "    setTimeout(function () { window.location.reload(); }, 2000);\n"
-    "  };\n"
+    "  var source = null;\n"
+    "  function connect() {\n"
+    "    if (source) { source.close(); }\n"
+    "    var page = encodeURIComponent(window.location.pathname);\n"
+    "    var stream = source = new EventSource('/__livereload__?page=' + page);\n"
+    "    stream.addEventListener('reload', function () {\n"
+    "      window.location.reload();\n"
+    "    });\n"
+    "    stream.addEventListener('patch', function (event) {\n"
+    "      try {\n"
+    "        var data = JSON.parse(event.data);\n"
+    "        var content = document.querySelector('[data-md2html-live=\"content\"]');\n"
+    "        if (!content) { throw new Error('missing content region'); }\n"
+    "        content.innerHTML = data.content;\n"
+    "        var tocs = document.querySelectorAll('[data-md2html-live=\"toc\"]');\n"
+    "        for (var i = 0; i < tocs.length; i++) { tocs[i].innerHTML = data.toc || ''; }\n"
+    "        document.dispatchEvent(new CustomEvent('md2html:content-updated'));\n"
+    "      } catch (err) {\n"
+    "        window.location.reload();\n"
+    "      }\n"
+    "    });\n"
+    "    stream.addEventListener('ping', function () {});\n"
+    "    stream.onerror = function () {\n"
+    "      stream.close();\n"
+    "      setTimeout(function () { window.location.reload(); }, 2000);\n"
+    "    };\n"
+    "  }\n"
+    "  // Instant navigation swaps pages without a load; follow the new page.\n"
+    "  document.addEventListener('md2html:navigated', connect);\n"
+    "  connect();\n"
     "})();\n"
     "</script>"
 )
+LIVE_REGIONS = ("content", "toc")
 
 logger = logging.getLogger(__name__)
 
 
+def _classify_live_region(tag: str, attrs: Dict[str, Optional[str]]) -> Optional[str]:
+    name = attrs.get("data-md2html-live")
+    return name if name in LIVE_REGIONS else None
+
+
+def split_live_regions(html: str) -> Optional[tuple[str, Dict[str, str]]]:
+    """Split a rendered page into a layout fingerprint and its live regions.
+
+    The fingerprint hashes everything outside the ``data-md2html-live``
+    elements, so two renders with equal fingerprints differ only in content
+    the dev server can patch in place. Returns ``None`` when the page has no
+    content region (e.g. a theme without the markers).
+    """
+
+    try:
+        spans = find_element_spans(html, _classify_live_region)
+    except Exception:  # pylint: disable=broad-except
+        return None
+    regions: Dict[str, str] = {}
+    layout = hashlib.sha1()
+    position = 0
+    for span in spans:
+        # Repeated regions (the TOC sits in both the drawer and the sidebar) share content.
+        regions.setdefault(span.name, html[span.inner_start:span.inner_end])
+        layout.update(html[position:span.inner_start].encode("utf-8"))
+        position = span.inner_end
+    layout.update(html[position:].encode("utf-8"))
+    if "content" not in regions:
+        return None
+    return layout.hexdigest(), regions
+
+
+@dataclass(eq=False)
+class _LiveClient:
+    """An open ``/__livereload__`` stream and the page it is showing."""
+
+    stream: queue.Queue[Optional[str]]
+    page: Optional[str] = None
+    layout: Optional[str] = None
+
+
 class DevServer:
     """Coordinate static builds, file watching, and live reload HTTP serving."""
 
-    def __init__(self, config: AppConfig, *, host: str, port: int, open_browser: bool) -> None:
+    def __init__(
+        self,
+        config: AppConfig,
+        *,
+        host: str,
+        port: int,
+        open_browser: bool,
+        reload_config: Optional[Callable[[], AppConfig]] = None,
+    ) -> None:
         self.config = config
+        self._reload_config = reload_config
         self.host = host
         self.port = port
         self.open_browser = open_browser
@@ -59,11 +136,23 @@ class DevServer:
         self.builder = SiteBuilder(config, theme)
 
         self._server: Optional[ThreadingHTTPServer] = None
-        self._observer: Optional[Observer] = None
-        self._clients: list[queue.Queue[Optional[str]]] = []
+        self._observer: Optional[Any] = None
+        self._settings_watcher: Optional[SettingsWatcher] = None
+        self._clients: list[_LiveClient] = []
         self._clients_lock = threading.Lock()
+        self._watch_handler: Optional[_WatchHandler] = None
         self._running = False
 
+        registry = self.builder.metrics.registry
+        registry.gauge("md2html_livereload_clients", "Connected live reload clients.", callback=lambda: len(self._clients))
+        registry.gauge("md2html_watch_queue_depth", "Watch events not yet handled.", callback=self._watch_queue_depth)
+        self._http_seconds = registry.histogram(
+            "md2html_http_request_duration_seconds",
+            "Time to answer HTTP requests, excluding live reload streams.",
+            buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+        )
+        self._http_requests = registry.counter("md2html_http_requests_total", "HTTP requests by status code.", labelnames=("code",))
+
     def serve(self) -> None:
         self.builder.build_all()
         self._server = self._create_server()
@@ -83,10 +172,12 @@ class DevServer:
 
     def shutdown(self) -> None:
         self._running = False
-        if self._observer:
-            self._observer.stop()
-            self._observer.join()
-            self._observer = None
+        for watcher in (self._observer, self._settings_watcher):
+            if watcher:
+                watcher.stop()
+                watcher.join()
+        self._observer = None
+        self._settings_watcher = None
         self._close_clients()
         if self._server:
             self._server.shutdown()
@@ -106,6 +197,9 @@ class DevServer:
         base_prefix = dev_server.base_url_prefix
 
         class LiveReloadRequestHandler(SimpleHTTPRequestHandler):
+            # Start of the request being served; live reload streams are not measured.
+            _started: Optional[float] = None
+
             def __init__(self, *args, **kwargs):
                 super().__init__(*args, directory=str(output_dir), **kwargs)
 
@@ -115,10 +209,31 @@ class DevServer:
                 except ConnectionResetError:  # pragma: no cover - platform specific
                     logger.debug("Client connection reset during request handling")
 
+            def send_response(self, code: int, message: Optional[str] = None) -> None:  # type: ignore[override]
+                self.status_code = code
+                super().send_response(code, message)
+
             def do_GET(self):  # type: ignore[override]
-                if self.path == "/__livereload__":
+                request_path = urlsplit(self.path).path
+                if request_path == "/__livereload__":
                     dev_server._handle_livereload(self)
                     return
+                self._started = time.perf_counter()
+                try:
+                    if request_path == "/__metrics__":
+                        dev_server._handle_metrics(self)
+                    else:
+                        self._serve_file()
+                finally:
+                    # Requests that fail before sending headers are still counted.
+                    self._observe()
+
+            def _observe(self) -> None:
+                if self._started is not None:
+                    dev_server._observe_request(getattr(self, "status_code", 0), time.perf_counter() - self._started)
+                    self._started = None
+
+            def _serve_file(self) -> None:
                 if base_prefix:
                     parsed = urlsplit(self.path)
                     path = parsed.path
@@ -136,6 +251,8 @@ class DevServer:
             def end_headers(self) -> None:  # type: ignore[override]
                 if self.path.endswith(".html"):
                     self.send_header("Cache-Control", "no-cache")
+                # Count the request before the client can see the response.
+                self._observe()
                 super().end_headers()
 
             def log_message(self, format: str, *args) -> None:  # type: ignore[override]
@@ -150,12 +267,13 @@ class DevServer:
         handler.send_header("Connection", "keep-alive")
         handler.end_headers()
 
-        client_queue = self._register_client()
-        client_queue.put(self._format_event("ping", str(time.time())))
+        pages = parse_qs(urlsplit(handler.path).query).get("page")
+        client = self._register_client(pages[0] if pages else None)
+        client.stream.put(self._format_event("ping", str(time.time())))
 
         try:
             while True:
-                payload = client_queue.get()
+                payload = client.stream.get()
                 if payload is None:
                     break
                 handler.wfile.write(payload.encode("utf-8"))
@@ -163,39 +281,141 @@ class DevServer:
         except (BrokenPipeError, ConnectionResetError, ConnectionAbortedError):  # pragma: no cover - platform specific
             logger.debug("Live reload client disconnected")
         finally:
-            self._unregister_client(client_queue)
+            self._unregister_client(client)
 
-    def _register_client(self) -> queue.Queue[Optional[str]]:
-        client_queue: queue.Queue[Optional[str]] = queue.Queue()
+    def _handle_metrics(self, handler: SimpleHTTPRequestHandler) -> None:
+        body = self.builder.metrics.registry.render().encode("utf-8")
+        handler.send_response(200)
+        handler.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.send_header("Cache-Control", "no-cache")
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _observe_request(self, status: int, seconds: float) -> None:
+        self._http_requests.inc(code=str(status))
+        self._http_seconds.observe(seconds)
+
+    def _watch_queue_depth(self) -> int:
+        depth = self._watch_handler.pending if self._watch_handler is not None else 0
+        # watchdog observers buffer events in a queue ahead of the handler.
+        event_queue = getattr(self._observer, "event_queue", None)
+        if event_queue is not None:
+            depth += event_queue.qsize()
+        return depth
+
+    def _register_client(self, location: Optional[str] = None) -> _LiveClient:
+        client = _LiveClient(queue.Queue())
+        page = self._page_for_location(location) if location else None
+        if page is not None:
+            split = self._read_live_regions(page)
+            client.page = page
+            client.layout = split[0] if split else None
         with self._clients_lock:
-            self._clients.append(client_queue)
-        return client_queue
+            self._clients.append(client)
+        return client
 
-    def _unregister_client(self, client_queue: queue.Queue[Optional[str]]) -> None:
+    def _unregister_client(self, client: _LiveClient) -> None:
         with self._clients_lock:
-            if client_queue in self._clients:
-                self._clients.remove(client_queue)
+            if client in self._clients:
+                self._clients.remove(client)
 
     def _close_clients(self) -> None:
         with self._clients_lock:
             for client in self._clients:
-                client.put(None)
+                client.stream.put(None)
             self._clients.clear()
 
+    def _page_for_location(self, location: str) -> Optional[str]:
+        """Map a browser ``location.pathname`` to its output file, relative to output_dir."""
+
+        path = unquote(location)
+        prefix = self.base_url_prefix
+        if prefix:
+            if path != prefix and not path.startswith(prefix + "/"):
+                return None
+            path = path[len(prefix):]
+        output_dir = self.config.output_dir.resolve()
+        target = (output_dir / path.lstrip("/")).resolve()
+        if target.is_dir():
+            target = target / "index.html"
+        try:
+            return target.relative_to(output_dir).as_posix()
+        except ValueError:
+            return None
+
+    def _read_live_regions(self, page: str) -> Optional[tuple[str, Dict[str, str]]]:
+        try:
+            html = (self.config.output_dir / page).read_text(encoding="utf-8")
+        except (OSError, UnicodeDecodeError):
+            return None
+        return split_live_regions(html)
+
     def _start_watchdog(self) -> None:
-        handler = _WatchHandler(self.builder, on_rebuild=self._on_rebuild)
-        observer = Observer()
-        observer.schedule(handler, str(self.config.source_dir), recursive=True)
+        reload_config = self._reload_dev_config if self._reload_config else None
+        handler = _WatchHandler(self.builder, on_rebuild=self._on_rebuild, reload_config=reload_config)
+        self._watch_handler = handler
+        observer = create_observer(self.builder, handler)
         observer.start()
+        self._settings_watcher = SettingsWatcher(
+            self.builder,
+            handler,
+            config_path=self.config.config_path,
+            interval=self.config.poll_interval,
+        )
+        self._settings_watcher.start()
         self._observer = observer
 
+    def _reload_dev_config(self) -> AppConfig:
+        assert self._reload_config is not None
+        config = self._reload_config()
+        if config.output_dir != self.config.output_dir:
+            # The HTTP handler keeps serving the directory it was started with.
+            logger.warning("Changing output_dir takes effect after a restart")
+            config.output_dir = self.config.output_dir
+        return config
+
     def _on_rebuild(self, path: Path) -> None:
         try:
             relative = path.relative_to(self.config.source_dir)
         except ValueError:
-            relative = path
-        logger.info("Reload triggered by %s", relative)
-        self._broadcast("reload", str(time.time()))
+            relative = None
+        logger.info("Reload triggered by %s", relative or path)
+        changes = self.builder.last_changes
+        if changes is None or relative is None or not is_markdown_file(path):
+            # Static assets, theme and configuration edits may affect any page.
+            self._broadcast("reload", str(time.time()))
+            return
+        self._patch_clients(set(changes.changed), set(changes.deleted))
+
+    def _patch_clients(self, changed: set[str], deleted: set[str]) -> None:
+        """Send each client a patch for its page, or a reload if the layout changed.
+
+        Clients whose page was not rewritten by the build are left alone.
+        """
+
+        with self._clients_lock:
+            targets = list(self._clients)
+        reload_event = self._format_event("reload", str(time.time()))
+        rendered: Dict[str, Optional[tuple[str, Dict[str, str]]]] = {}
+        for client in targets:
+            page = client.page
+            if page is not None and page not in changed and page not in deleted:
+                continue
+            if page is None or page in deleted or client.layout is None:
+                client.stream.put(reload_event)
+                continue
+            if page not in rendered:
+                rendered[page] = self._read_live_regions(page)
+            split = rendered[page]
+            if split is None or split[0] != client.layout:
+                logger.debug("Layout of %s changed; reloading", page)
+                client.stream.put(reload_event)
+                continue
+            regions = split[1]
+            payload = json.dumps({"page": page, "content": regions["content"], "toc": regions.get("toc", "")})
+            client.stream.put(self._format_event("patch", payload))
+            logger.debug("Patched %s in place", page)
 
     def _start_heartbeat(self) -> None:
         def heartbeat_loop() -> None:
@@ -211,7 +431,7 @@ class DevServer:
         with self._clients_lock:
             targets = list(self._clients)
         for client in targets:
-            client.put(payload)
+            client.stream.put(payload)
 
     @staticmethod
     def _format_event(event: str, data: str) -> str:
@@ -269,6 +489,14 @@ def build_argument_parser() -> argparse.ArgumentParser:
     )
     parser.add_argument("--site-title", dest="site_title", help="Override site title metadata for templates")
     parser.add_argument("--site-description", dest="site_description", help="Override site description metadata for templates")
+    parser.add_argument(
+        "--watch-backend",
+        dest="watch_backend",
+        choices=WATCH_BACKENDS,
+        help="File watching backend: native OS events or stat polling for NFS/container mounts",
+    )
+    parser.add_argument("--poll-interval", dest="poll_interval", type=float, help="Seconds between polling scans")
+    parser.add_argument("--metrics-file", dest="metrics_file", help="Also write metrics as JSON to this file after every build")
     parser.add_argument("--host", dest="host", default="127.0.0.1", help="Host interface to bind the development server")
     parser.add_argument("--port", dest="port", type=int, default=8000, help="Port to bind the development server")
     parser.add_argument("--open", dest="open_browser", action="store_true", help="Open the default web browser once the server starts")
@@ -277,6 +505,18 @@ def build_argument_parser() -> argparse.ArgumentParser:
     return parser
 
 
+def resolve_dev_configuration(args: argparse.Namespace) -> AppConfig:
+    config = resolve_configuration(args)
+    config.watch = False
+    # A service worker would keep serving cached pages over live edits.
+    config.service_worker = False
+    config.source_dir = config.source_dir.resolve()
+    config.output_dir = config.output_dir.resolve()
+    if "live_reload_snippet" not in config.extra:
+        config.extra["live_reload_snippet"] = LIVE_RELOAD_SNIPPET
+    return config
+
+
 def main(argv: Optional[list[str]] = None) -> int:
     parser = build_argument_parser()
     args = parser.parse_args(argv)
@@ -284,14 +524,14 @@ def main(argv: Optional[list[str]] = None) -> int:
     logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format=LOG_FORMAT)
 
     try:
-        config = resolve_configuration(args)
-        config.watch = False
-        config.source_dir = config.source_dir.resolve()
-        config.output_dir = config.output_dir.resolve()
-        if "live_reload_snippet" not in config.extra:
-            config.extra["live_reload_snippet"] = LIVE_RELOAD_SNIPPET
-
-        server = DevServer(config, host=args.host, port=args.port, open_browser=args.open_browser)
+        config = resolve_dev_configuration(args)
+        server = DevServer(
+            config,
+            host=args.host,
+            port=args.port,
+            open_browser=args.open_browser,
+            reload_config=lambda: resolve_dev_configuration(args),
+        )
         try:
             server.serve()
         except KeyboardInterrupt:
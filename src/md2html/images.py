@@ -0,0 +1,268 @@
+"""Intrinsic image sizes and lazy-loading attributes for rendered pages.
+
+:class:`ImageSizer` gives every ``<img>`` of a page ``loading="lazy"`` and
+``decoding="async"``, plus ``width``/``height`` when the image is a local
+asset, so the browser reserves its box before the file arrives and only
+fetches images near the viewport. Sizes come from the headers of PNG, JPEG,
+GIF, WebP and SVG files without decoding any pixels.
+
+Sizes are stored by content hash in a small JSON file, next to the file
+stat they were read for, so a later build only stats unchanged assets and
+a renamed or copied image is never parsed twice.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import struct
+import threading
+from html import unescape
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple
+from urllib.parse import unquote, urlsplit
+
+logger = logging.getLogger(__name__)
+
+IMAGE_CACHE_NAME = ".md2html-images.json"
+IMAGE_CACHE_VERSION = 1
+
+Size = Tuple[int, int]
+
+_IMG_TAG = re.compile(r"""<img\b[^>"']*(?:(?:"[^"]*"|'[^']*')[^>"']*)*>""", re.IGNORECASE)
+_TAG_ATTRIBUTE = re.compile(r"""\s([^\s"'>/=]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+)))?""")
+_SVG_ROOT = re.compile(rb"<svg\b[^>]*>", re.IGNORECASE)
+_SVG_LENGTH = r"""(?<![\w-])%s\s*=\s*["']\s*([0-9]*\.?[0-9]+)\s*(?:px)?\s*["']"""
+_SVG_VIEWBOX = re.compile(rb"""(?<![\w-])viewBox\s*=\s*["']([^"']*)["']""", re.IGNORECASE)
+# JPEG start-of-frame markers; C4, C8 and CC share the range but are not frames.
+_JPEG_FRAMES = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Only this much of an SVG is searched for its root element.
+_SVG_HEAD = 64 * 1024
+
+
+def image_size(data: bytes) -> Optional[Size]:
+    """Return ``(width, height)`` from the header of a PNG, JPEG, GIF, WebP or SVG image."""
+
+    try:
+        if data.startswith(b"\x89PNG\r\n\x1a\n") and data[12:16] == b"IHDR":
+            return struct.unpack(">II", data[16:24])  # type: ignore[return-value]
+        if data[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", data[6:10])  # type: ignore[return-value]
+        if data.startswith(b"\xff\xd8"):
+            return _jpeg_size(data)
+        if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+            return _webp_size(data)
+    except struct.error:
+        return None
+    return _svg_size(data[:_SVG_HEAD])
+
+
+def _jpeg_size(data: bytes) -> Optional[Size]:
+    index = 2
+    swap = False
+    while index + 4 <= len(data):
+        if data[index] != 0xFF:
+            return None
+        marker = data[index + 1]
+        if marker == 0xFF:
+            # Fill byte before a marker.
+            index += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            index += 2
+            continue
+        (length,) = struct.unpack(">H", data[index + 2:index + 4])
+        if marker == 0xE1 and data[index + 4:index + 10] == b"Exif\0\0":
+            # Browsers apply the EXIF orientation; 5-8 turn the image sideways.
+            swap = _exif_orientation(data[index + 10:index + 2 + length]) in (5, 6, 7, 8)
+        elif marker in _JPEG_FRAMES:
+            height, width = struct.unpack(">HH", data[index + 5:index + 9])
+            return (height, width) if swap else (width, height)
+        index += 2 + length
+    return None
+
+
+def _exif_orientation(tiff: bytes) -> Optional[int]:
+    order = {b"II": "<", b"MM": ">"}.get(tiff[:2])
+    if order is None:
+        return None
+    (offset,) = struct.unpack(f"{order}I", tiff[4:8])
+    (count,) = struct.unpack(f"{order}H", tiff[offset:offset + 2])
+    for entry in range(count):
+        start = offset + 2 + entry * 12
+        tag, _, _, value = struct.unpack(f"{order}HHIH", tiff[start:start + 10])
+        if tag == 0x0112:
+            return value
+    return None
+
+
+def _webp_size(data: bytes) -> Optional[Size]:
+    chunk = data[12:16]
+    if chunk == b"VP8 ":
+        width, height = struct.unpack("<HH", data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L":
+        (bits,) = struct.unpack("<I", data[21:25])
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X":
+        width = int.from_bytes(data[24:27], "little") + 1
+        height = int.from_bytes(data[27:30], "little") + 1
+        return width, height
+    return None
+
+
+def _svg_size(head: bytes) -> Optional[Size]:
+    root = _SVG_ROOT.search(head)
+    if root is None:
+        return None
+    tag = root.group(0)
+    width = re.search(_SVG_LENGTH.encode() % b"width", tag, re.IGNORECASE)
+    height = re.search(_SVG_LENGTH.encode() % b"height", tag, re.IGNORECASE)
+    if width and height:
+        size = float(width.group(1)), float(height.group(1))
+    else:
+        # Percentages, ems and missing lengths: fall back to the aspect of the view box.
+        view_box = _SVG_VIEWBOX.search(tag)
+        numbers = view_box.group(1).replace(b",", b" ").split() if view_box else []
+        if len(numbers) != 4:
+            return None
+        try:
+            size = float(numbers[2]), float(numbers[3])
+        except ValueError:
+            return None
+    if size[0] <= 0 or size[1] <= 0:
+        return None
+    return round(size[0]), round(size[1])
+
+
+class ImageSizer:
+    """Add size and loading attributes to the ``<img>`` tags of rendered pages.
+
+    Only images below ``root`` are measured; remote images and tags that
+    already state a width or height just get the loading attributes.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = Path(os.path.normpath(root))
+        # Images whose headers were hashed and parsed, as opposed to found in the cache.
+        self.reads = 0
+        self._lock = threading.Lock()
+        # Path relative to ``root`` -> (mtime_ns, size, content hash).
+        self._files: Dict[str, Tuple[int, int, str]] = {}
+        self._sizes: Dict[str, Optional[Size]] = {}
+        self._used: Set[str] = set()
+        self._loaded_from: Optional[Path] = None
+        self._dirty = False
+
+    def decorate(self, html: str, page: Path, measured: Optional[Set[Path]] = None) -> str:
+        """Return ``html`` with the attributes added; ``page`` is the source it was rendered from.
+
+        The local images whose size was looked up are added to ``measured``,
+        whether or not they exist yet.
+        """
+
+        if "<img" not in html:
+            return html
+        directory = page.parent
+        return _IMG_TAG.sub(lambda match: self._decorate_tag(match.group(0), directory, measured), html)
+
+    def size_of(self, path: Path) -> Optional[Size]:
+        try:
+            stat = path.stat()
+            key = path.relative_to(self.root).as_posix()
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self._used.add(key)
+            known = self._files.get(key)
+            if known is not None and known[:2] == (stat.st_mtime_ns, stat.st_size) and known[2] in self._sizes:
+                return self._sizes[known[2]]
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if digest not in self._sizes:
+                self._sizes[digest] = image_size(data)
+                self.reads += 1
+            self._files[key] = (stat.st_mtime_ns, stat.st_size, digest)
+            self._dirty = True
+            return self._sizes[digest]
+
+    def load(self, path: Path) -> None:
+        """Read sizes saved by a previous build; each file is only read once."""
+
+        if self._loaded_from == path:
+            return
+        self._loaded_from = path
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if not isinstance(payload, dict) or payload.get("version") != IMAGE_CACHE_VERSION:
+            logger.debug("Ignoring incompatible image size cache %s", path)
+            return
+        try:
+            files = {key: (int(mtime), int(size), str(digest)) for key, (mtime, size, digest) in payload["files"].items()}
+            sizes = {key: (tuple(value) if value else None) for key, value in payload["sizes"].items()}
+        except (KeyError, TypeError, ValueError):
+            logger.debug("Ignoring malformed image size cache %s", path)
+            return
+        with self._lock:
+            self._files.update(files)
+            self._sizes.update(sizes)  # type: ignore[arg-type]
+
+    def save(self, path: Path) -> None:
+        """Write the sizes of the images used since the last save."""
+
+        with self._lock:
+            files = {key: self._files[key] for key in self._used if key in self._files}
+            sizes = {entry[2]: self._sizes.get(entry[2]) for entry in files.values()}
+            dirty = self._dirty
+            self._used.clear()
+            self._dirty = False
+        # A cleaned output directory loses the file even when nothing changed.
+        if not files or (not dirty and path.exists()):
+            return
+        payload = {"version": IMAGE_CACHE_VERSION, "files": files, "sizes": sizes}
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(payload, sort_keys=True), encoding="utf-8")
+        except OSError as exc:
+            logger.warning("Unable to write image size cache %s: %s", path, exc)
+
+    def _decorate_tag(self, tag: str, directory: Path, measured: Optional[Set[Path]]) -> str:
+        attributes = {
+            match.group(1).lower(): next((value for value in match.group(2, 3, 4) if value is not None), "")
+            for match in _TAG_ATTRIBUTE.finditer(tag, 4)
+        }
+        added = []
+        if "width" not in attributes and "height" not in attributes:
+            path = self._resolve(attributes.get("src", ""), directory)
+            size = self.size_of(path) if path is not None else None
+            if path is not None and measured is not None:
+                measured.add(path)
+            if size is not None:
+                added.append(f'width="{size[0]}" height="{size[1]}"')
+        if "loading" not in attributes:
+            added.append('loading="lazy"')
+        if "decoding" not in attributes:
+            added.append('decoding="async"')
+        if not added:
+            return tag
+        closing = "/>" if tag.endswith("/>") else ">"
+        head = tag[: -len(closing)].rstrip()
+        return f"{head} {' '.join(added)}{' ' if closing == '/>' else ''}{closing}"
+
+    def _resolve(self, src: str, directory: Path) -> Optional[Path]:
+        parts = urlsplit(unescape(src))
+        if parts.scheme or parts.netloc or not parts.path:
+            return None
+        target = unquote(parts.path)
+        base = self.root if target.startswith("/") else directory
+        path = Path(os.path.normpath(base / target.lstrip("/")))
+        return path if path.is_relative_to(self.root) else None
@@ -0,0 +1,208 @@
+"""``!include`` directives: splice another Markdown file, or one of its sections, into a page.
+
+A line ``!include path.md`` is replaced by the blocks of ``path.md`` and
+``!include path.md#section`` by the section under the heading whose text or
+id is ``section``, down to the next heading of the same or a higher level.
+Paths are relative to the including file, or to the source directory when
+they start with ``/``. Files named ``_*.md`` are partials: they can be
+included but are not rendered as pages of their own.
+
+Included files are parsed once per content hash by
+:class:`~md2html.converter.MarkdownRenderer`; :class:`IncludeGraph` remembers
+which pages include which files so an edited snippet re-renders exactly the
+pages that use it.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, FrozenSet, Iterable, Iterator, List, Mapping, Optional, Set, Tuple
+
+from .cache import content_hash
+from .utils import slugify
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from markdown_it.rules_block import StateBlock  # type: ignore[import]
+    from markdown_it.token import Token  # type: ignore[import]
+
+INCLUDE_TOKEN = "md2html_include"
+# Matched against a block's first line, after its indentation.
+INCLUDE_LINE = re.compile(r"!include[ \t]+(\S.*?)[ \t]*$")
+# Any line that may hold a directive, including ones inside quotes and lists.
+_INCLUDE_ANYWHERE = re.compile(r"^[ \t>]*(?:(?:[*+-]|\d{1,9}[.)])[ \t]+)*!include[ \t]+(\S.*?)[ \t]*$", re.MULTILINE)
+MAX_INCLUDE_DEPTH = 16
+DEFAULT_INCLUDE_CACHE_SIZE = 256
+
+# Path -> text of every file a document includes; ``None`` when unreadable.
+IncludeSources = Dict[Path, Optional[str]]
+
+
+class IncludeError(ValueError):
+    """Raised when an ``!include`` directive cannot be resolved."""
+
+
+def is_partial(path: Path) -> bool:
+    return path.name.startswith("_")
+
+
+def resolve_include(argument: str, including: Optional[Path], root: Optional[Path]) -> Tuple[Path, Optional[str]]:
+    """Return the file and optional section named by an ``!include`` argument."""
+
+    target, _, section = argument.partition("#")
+    target = target.strip()
+    if not target:
+        raise IncludeError(f"!include {argument}: missing file name")
+    if target.startswith("/"):
+        if root is None:
+            raise IncludeError(f"!include {target}: absolute includes need a source directory")
+        base = root
+        target = target.lstrip("/")
+    elif including is not None:
+        base = including.parent
+    else:
+        raise IncludeError(f"!include {target}: relative includes need the path of the including file")
+    path = Path(os.path.normpath(base / target))
+    if root is not None and not path.is_relative_to(os.path.normpath(root)):
+        raise IncludeError(f"!include {target}: outside the source directory")
+    return path, section.strip() or None
+
+
+def collect_includes(text: str, source_path: Optional[Path], root: Optional[Path]) -> IncludeSources:
+    """Read every file ``text`` includes, directly or through other includes.
+
+    Directives are found with a line scan that does not know about code
+    blocks, so the result may list a few files that are never spliced in;
+    it is used for cache keys and dependency tracking, where that is harmless.
+    Unresolvable directives are skipped here and reported by the parse.
+    """
+
+    sources: IncludeSources = {}
+    pending: List[Tuple[str, Optional[Path]]] = [(text, source_path)]
+    while pending:
+        current, including = pending.pop()
+        if "!include" not in current:
+            continue
+        for match in _INCLUDE_ANYWHERE.finditer(current):
+            try:
+                path, _ = resolve_include(match.group(1), including, root)
+            except IncludeError:
+                continue
+            if path in sources:
+                continue
+            try:
+                included: Optional[str] = path.read_text(encoding="utf-8")
+            except (OSError, UnicodeDecodeError):
+                included = None
+            sources[path] = included
+            if included is not None:
+                pending.append((included, path))
+    return sources
+
+
+def include_digest(sources: Mapping[Path, Optional[str]]) -> str:
+    """Digest the included files' paths and contents for fragment cache keys."""
+
+    parts = (f"{path}\0{'-' if text is None else content_hash(text)}" for path, text in sorted(sources.items()))
+    return content_hash("\n".join(parts))
+
+
+def include_block_rule(state: "StateBlock", start_line: int, end_line: int, silent: bool) -> bool:
+    """markdown-it block rule turning an ``!include`` line into an include token."""
+
+    if state.sCount[start_line] - state.blkIndent >= 4:
+        return False
+    start = state.bMarks[start_line] + state.tShift[start_line]
+    match = INCLUDE_LINE.match(state.src, start, state.eMarks[start_line])
+    if match is None:
+        return False
+    if silent:
+        return True
+    token = state.push(INCLUDE_TOKEN, "", 0)
+    token.markup = "!include"
+    token.info = match.group(1)
+    token.map = [start_line, start_line + 1]
+    state.line = start_line + 1
+    return True
+
+
+def select_section(tokens: List["Token"], section: str, path: Path) -> List["Token"]:
+    """Return the tokens of the section under the heading named ``section``."""
+
+    wanted = slugify(section)
+    for index, token in enumerate(tokens):
+        if token.type != "heading_open":
+            continue
+        title = tokens[index + 1].content.strip()
+        if title != section and slugify(title) != wanted:
+            continue
+        depth = int(token.tag[1])
+        end = index + 1
+        while end < len(tokens):
+            following = tokens[end]
+            if following.level < token.level:
+                break
+            if following.type == "heading_open" and following.level == token.level and int(following.tag[1]) <= depth:
+                break
+            end += 1
+        return tokens[index:end]
+    raise IncludeError(f"{path.name} has no section {section!r}")
+
+
+def shift_tokens(tokens: Iterable["Token"], level: int) -> Iterator["Token"]:
+    """Copy ``tokens`` so the first sits at ``level``.
+
+    Copies keep cached parses intact: heading ids are set on the copies.
+    """
+
+    offset: Optional[int] = None
+    for token in tokens:
+        if offset is None:
+            offset = level - token.level
+        yield token.copy(level=token.level + offset, attrs=dict(token.attrs))
+
+
+class IncludeGraph:
+    """Which files every page includes, and which pages include every file."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._dependencies: Dict[Path, FrozenSet[Path]] = {}
+        self._dependents: Dict[Path, Set[Path]] = {}
+
+    def record(self, page: Path, dependencies: Iterable[Path]) -> None:
+        current = frozenset(dependencies)
+        with self._lock:
+            previous = self._dependencies.pop(page, frozenset())
+            for path in previous - current:
+                self._unlink(path, page)
+            for path in current:
+                self._dependents.setdefault(path, set()).add(page)
+            if current:
+                self._dependencies[page] = current
+
+    def retain(self, pages: Iterable[Path]) -> None:
+        """Forget pages that are no longer part of the site."""
+
+        keep = set(pages)
+        with self._lock:
+            for page in [page for page in self._dependencies if page not in keep]:
+                for path in self._dependencies.pop(page):
+                    self._unlink(path, page)
+
+    def dependencies(self, page: Path) -> FrozenSet[Path]:
+        with self._lock:
+            return self._dependencies.get(page, frozenset())
+
+    def dependents(self, path: Path) -> Set[Path]:
+        with self._lock:
+            return set(self._dependents.get(Path(os.path.normpath(path)), ()))
+
+    def _unlink(self, path: Path, page: Path) -> None:
+        pages = self._dependents.get(path)
+        if pages is not None:
+            pages.discard(page)
+            if not pages:
+                del self._dependents[path]
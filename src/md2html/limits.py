@@ -0,0 +1,144 @@
+"""Per-document resource limits and isolated rendering of suspect documents."""
+
+from __future__ import annotations
+
+import functools
+import logging
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Optional, TypeVar
+
+from .utils import format_size
+
+DEFAULT_MAX_DOCUMENT_SIZE = 16 * 1024 * 1024
+DEFAULT_MAX_NESTING = 20
+DEFAULT_RENDER_TIMEOUT = 30.0
+# Documents above these marks are parsed in a worker that can be killed.
+SUSPECT_SIZE = 256 * 1024
+SUSPECT_LINE_LENGTH = 16 * 1024
+_SUSPECT_RUN = re.compile(r"([*_\[\]<>`~|&#!(){}])\1{255}")
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class DocumentLimitError(ValueError):
+    """Raised when a document exceeds one of its :class:`DocumentLimits`."""
+
+
+@dataclass(frozen=True)
+class DocumentLimits:
+    """Bounds applied to every Markdown document of a build.
+
+    ``max_size`` is in bytes, ``max_nesting`` the deepest block nesting the
+    parser accepts and ``timeout`` the seconds a suspect document may spend in
+    its isolated worker; ``None`` disables the size check or the isolation.
+    """
+
+    max_size: Optional[int] = DEFAULT_MAX_DOCUMENT_SIZE
+    max_nesting: int = DEFAULT_MAX_NESTING
+    timeout: Optional[float] = DEFAULT_RENDER_TIMEOUT
+
+    @classmethod
+    def from_config(cls, config: Any) -> "DocumentLimits":
+        # A size or timeout of 0 switches that limit off.
+        return cls(
+            max_size=getattr(config, "max_document_size", DEFAULT_MAX_DOCUMENT_SIZE) or None,
+            max_nesting=getattr(config, "max_nesting_depth", DEFAULT_MAX_NESTING),
+            timeout=getattr(config, "render_timeout", DEFAULT_RENDER_TIMEOUT) or None,
+        )
+
+    def check_size(self, size: int, label: str) -> None:
+        if self.max_size is not None and size > self.max_size:
+            raise DocumentLimitError(
+                f"{label} is {format_size(size)}, over the document size limit of {format_size(self.max_size)}"
+            )
+
+
+def check_nesting(levels: Iterable[int], max_nesting: int) -> None:
+    """Reject token streams that reached the parser's nesting cap.
+
+    markdown-it silently drops everything nested deeper than ``maxNesting``,
+    so a token at the last allowed level means content was probably lost.
+    """
+
+    deepest = max(levels, default=0)
+    if deepest >= max_nesting - 1:
+        raise DocumentLimitError(f"Markdown nesting reaches the limit of {max_nesting} levels")
+
+
+def suspect_reason(text: str) -> Optional[str]:
+    """Return why ``text`` should be rendered in an isolated worker, if at all."""
+
+    if len(text) > SUSPECT_SIZE:
+        return f"{format_size(len(text))} of text"
+    longest = max(map(len, text.splitlines()), default=0)
+    if longest > SUSPECT_LINE_LENGTH:
+        return f"a {format_size(longest)} line"
+    match = _SUSPECT_RUN.search(text)
+    if match:
+        return f"a long run of {match.group(1)!r}"
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def _isolation_context() -> Any:
+    import multiprocessing
+
+    # Forking the build itself would copy the locks held by its reader, writer,
+    # HTTP and watcher threads into the worker. A fork server is forked once,
+    # from a fresh single threaded process, and workers are forked from it.
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["md2html.converter"])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def _isolated_main(function: Callable[[], Any], sender: Any) -> None:
+    try:
+        sender.send((True, function()))
+    except BaseException as exc:  # pylint: disable=broad-except
+        try:
+            sender.send((False, exc))
+        except Exception:  # pylint: disable=broad-except
+            sender.send((False, RuntimeError(f"{type(exc).__name__}: {exc}")))
+    finally:
+        sender.close()
+
+
+def run_isolated(function: Callable[[], T], timeout: float, *, label: str) -> T:
+    """Run ``function`` in a worker process and return its (picklable) result.
+
+    ``function`` is pickled into a worker started by a fork server, or by
+    ``spawn`` where there is none (e.g. on Windows), so it must be picklable
+    and must not rely on state of the calling process. The worker is killed
+    after ``timeout`` seconds and a crash or timeout is reported as
+    :class:`DocumentLimitError`; exceptions raised by ``function`` are
+    re-raised here.
+    """
+
+    context = _isolation_context()
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_isolated_main, args=(function, sender), daemon=True)
+    process.start()
+    sender.close()
+    try:
+        if not receiver.poll(timeout):
+            raise DocumentLimitError(f"{label} took longer than {timeout:g}s to render")
+        try:
+            succeeded, payload = receiver.recv()
+        except EOFError:
+            process.join()
+            raise DocumentLimitError(
+                f"The worker rendering {label} exited unexpectedly (exit code {process.exitcode})"
+            ) from None
+    finally:
+        receiver.close()
+        if process.is_alive():
+            process.kill()
+        process.join()
+    if not succeeded:
+        raise payload
+    return payload
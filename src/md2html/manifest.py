@@ -0,0 +1,98 @@
+"""Build manifest listing every output and what changed since the last build."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional
+
+BUILD_MANIFEST_NAME = ".md2html-manifest.json"
+BUILD_MANIFEST_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BuildChanges:
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.deleted)
+
+    def as_dict(self) -> Dict[str, List[str]]:
+        return {"added": self.added, "changed": self.changed, "deleted": self.deleted}
+
+
+def diff_files(previous: Mapping[str, Mapping[str, Any]], current: Mapping[str, Mapping[str, Any]]) -> BuildChanges:
+    """Compare two ``{relative: {"blob": ..., "size": ...}}`` listings."""
+
+    changes = BuildChanges()
+    for relative, info in sorted(current.items()):
+        before = previous.get(relative)
+        if before is None:
+            changes.added.append(relative)
+        elif before.get("blob") != info.get("blob"):
+            changes.changed.append(relative)
+    changes.deleted = sorted(relative for relative in previous if relative not in current)
+    return changes
+
+
+def parse_build_manifest(payload: str | bytes) -> Optional[Dict[str, Any]]:
+    """Decode a manifest, returning ``None`` when it is unusable."""
+
+    try:
+        manifest = json.loads(payload)
+    except ValueError:
+        return None
+    if not isinstance(manifest, dict) or manifest.get("version") != BUILD_MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def load_build_manifest(path: Path) -> Optional[Dict[str, Any]]:
+    """Read a manifest, returning ``None`` when it is missing or unusable."""
+
+    try:
+        payload = path.read_bytes()
+    except OSError:
+        return None
+    manifest = parse_build_manifest(payload)
+    if manifest is None:
+        logger.debug("Ignoring incompatible build manifest %s", path)
+    return manifest
+
+
+def render_build_manifest(records: Mapping[str, Any], previous: Optional[Mapping[str, Any]]) -> tuple[str, BuildChanges]:
+    """Serialise the manifest for ``records`` (objects with ``blob`` and ``size``).
+
+    The build id is derived from the file listing alone, so identical outputs
+    always share an id and deploys can tell which build a branch holds.
+    """
+
+    files = {
+        relative: {"blob": record.blob, "size": record.size}
+        for relative, record in sorted(records.items())
+        if relative != BUILD_MANIFEST_NAME
+    }
+    previous_files = (previous or {}).get("files") or {}
+    changes = diff_files(previous_files, files)
+    listing = json.dumps(files, ensure_ascii=False, sort_keys=True)
+    manifest = {
+        "version": BUILD_MANIFEST_VERSION,
+        "build_id": hashlib.sha256(listing.encode("utf-8")).hexdigest(),
+        "previous_build_id": (previous or {}).get("build_id"),
+        "files": files,
+        "changes": changes.as_dict(),
+    }
+    logger.info(
+        "Build changes: %d added, %d changed, %d deleted",
+        len(changes.added),
+        len(changes.changed),
+        len(changes.deleted),
+    )
+    return json.dumps(manifest, ensure_ascii=False, indent=2), changes
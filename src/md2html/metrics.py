@@ -0,0 +1,283 @@
+"""Dependency free counters, gauges and histograms with Prometheus text output.
+
+Metrics live in a :class:`MetricsRegistry`; :meth:`MetricsRegistry.render`
+produces the Prometheus text exposition format for ``/__metrics__`` style
+endpoints and :meth:`MetricsRegistry.as_dict` the same values as JSON.
+"""
+
+from __future__ import annotations
+
+import abc
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric(abc.ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, key))
+        if extra is not None:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape_label(value)}"' for name, value in pairs) + "}"
+
+    @abc.abstractmethod
+    def samples(self) -> List[Tuple[str, float]]:
+        """Return ``(name{labels}, value)`` pairs for the text exposition format."""
+
+    @abc.abstractmethod
+    def snapshot(self) -> Any:
+        """Return the current values in a JSON friendly form."""
+
+    def _snapshot_by_label(self, values: Dict[LabelValues, Any]) -> Any:
+        if not self.labelnames:
+            return values.get((), 0)
+        return {",".join(key): value for key, value in sorted(values.items())}
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[Tuple[str, float]]:
+        with self._lock:
+            items = sorted(self._values.items())
+        if not items and not self.labelnames:
+            items = [((), 0)]
+        return [(f"{self.name}{self._labels(key)}", value) for key, value in items]
+
+    def snapshot(self) -> Any:
+        with self._lock:
+            return self._snapshot_by_label(dict(self._values))
+
+
+class Gauge(_Metric):
+    """A value that is set directly or read from ``callback`` at collection time."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        callback: Optional[Callable[[], float]] = None,
+    ) -> None:
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self.callback = callback
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _collect(self) -> Dict[LabelValues, float]:
+        if self.callback is not None:
+            return {(): float(self.callback())}
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self) -> List[Tuple[str, float]]:
+        return [(f"{self.name}{self._labels(key)}", value) for key, value in sorted(self._collect().items())]
+
+    def snapshot(self) -> Any:
+        return self._snapshot_by_label(self._collect())
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # Per label set: non-cumulative bucket counts, then the sum.
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = next(position for position, bound in enumerate(self.buckets) if value <= bound)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * len(self.buckets), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _collect(self) -> List[Tuple[LabelValues, List[int], float]]:
+        with self._lock:
+            items = [(key, list(counts), total[0]) for key, (counts, total) in sorted(self._values.items())]
+        if not items and not self.labelnames:
+            items = [((), [0] * len(self.buckets), 0.0)]
+        return items
+
+    def samples(self) -> List[Tuple[str, float]]:
+        samples: List[Tuple[str, float]] = []
+        for key, counts, total in self._collect():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                samples.append((f"{self.name}_bucket{self._labels(key, ('le', _format_value(bound)))}", cumulative))
+            samples.append((f"{self.name}_sum{self._labels(key)}", total))
+            samples.append((f"{self.name}_count{self._labels(key)}", cumulative))
+        return samples
+
+    def snapshot(self) -> Any:
+        values = {
+            key: {"count": sum(counts), "sum": total, "buckets": dict(zip(map(_format_value, self.buckets), counts))}
+            for key, counts, total in self._collect()
+        }
+        return self._snapshot_by_label(values)
+
+
+class MetricsRegistry:
+    """Named metrics rendered together."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric {metric.name} is already registered differently")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        callback: Optional[Callable[[], float]] = None,
+    ) -> Gauge:
+        gauge = self._register(Gauge(name, help_text, labelnames, callback))
+        if callback is not None:
+            gauge.callback = callback
+        return gauge
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text exposition format."""
+
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines: List[str] = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{sample} {_format_value(value)}" for sample, value in metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def dump_json(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.as_dict(), indent=2, sort_keys=True), encoding="utf-8")
+
+
+class BuildMetrics:
+    """Standard build metrics recorded by :class:`~md2html.converter.SiteBuilder`."""
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None) -> None:
+        self.registry = registry or MetricsRegistry()
+        registry = self.registry
+        self.builds = registry.counter("md2html_builds_total", "Completed site builds.")
+        self.failures = registry.counter("md2html_build_failures_total", "Site builds that raised an error.")
+        self.duration = registry.histogram("md2html_build_duration_seconds", "Wall time of complete site builds.")
+        self.phases = registry.histogram(
+            "md2html_build_phase_seconds",
+            "Time spent in each build phase.",
+            labelnames=("phase",),
+        )
+        self.pages = registry.counter(
+            "md2html_pages_total",
+            "Markdown pages built; 'skipped' pages reused a cached fragment and were only re-templated.",
+            labelnames=("result",),
+        )
+        self.minify_saved_bytes = registry.counter(
+            "md2html_minify_saved_bytes_total",
+            "UTF-8 bytes removed from themed pages by HTML minification.",
+        )
+        self.document_errors = registry.counter(
+            "md2html_document_errors_total",
+            "Markdown pages replaced by an error page because they failed or exceeded a limit.",
+        )
+
+    def phase(self, name: str) -> Any:
+        return self.phases.time(phase=name)
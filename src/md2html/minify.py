@@ -0,0 +1,160 @@
+"""Single pass HTML minification for themed pages.
+
+Templates and container renderers indent for readability; in a large site
+that indentation is a sizeable share of every page. :func:`minify_html`
+removes comments and collapsible whitespace, compacts inline ``<style>`` and
+``<script>`` blocks and leaves ``<pre>``, ``<code>`` and ``<textarea>``
+content byte for byte. It only relies on HTML whitespace rules, so pages
+render the same; whitespace between inline elements is kept as one space.
+"""
+
+from __future__ import annotations
+
+import functools
+import re
+from typing import Iterator, List, Optional
+
+# Whitespace next to these tags never renders, so it can be dropped entirely.
+# Tags that may sit inside a line of text, such as script, style, template
+# and br, are not listed: the space next to them can separate two words.
+_BLOCK_TAGS = frozenset(
+    """
+    address article aside base blockquote body caption col colgroup dd details dialog div dl dt
+    fieldset figcaption figure footer form h1 h2 h3 h4 h5 h6 head header hgroup hr html li link main
+    menu meta nav noscript ol optgroup option p section summary table tbody td
+    tfoot th thead title tr ul circle defs g line path polygon polyline rect symbol use
+    """.split()
+)
+_PRESERVED_TAGS = frozenset(("pre", "code", "textarea"))
+_SCRIPT_TYPES = ("javascript", "module", "json")
+_ATTRIBUTES = r"""[^>"']*(?:(?:"[^"]*"|'[^']*')[^>"']*)*"""
+_TOKEN = re.compile(
+    r"<!--.*?(?:-->|\Z)"
+    rf"|<(?P<raw>pre|code|textarea|script|style)\b{_ATTRIBUTES}>.*?(?:</(?P=raw)\s*>|\Z)"
+    rf"|</?(?P<tag>[A-Za-z][^\s/>]*){_ATTRIBUTES}>"
+    r"|<![^>]*>",
+    re.IGNORECASE | re.DOTALL,
+)
+_OPEN_TAG = re.compile(rf"<[A-Za-z]{_ATTRIBUTES}>")
+# HTML whitespace; a no-break space is content.
+_SPACE = re.compile(r"[ \t\n\f\r]+")
+_SPACE_CHARS = " \t\n\f\r"
+_TAG_SPACE = re.compile(r"""("[^"]*"|'[^']*')|[ \t\n\f\r]+""")
+_CSS_TOKEN = re.compile(
+    r"""("(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')"""
+    # The last semicolon of a block is redundant.
+    r"|(?:\s|/\*.*?\*/)*(;)(?:\s|/\*.*?\*/)*(?=})"
+    r"|(?:\s|/\*.*?\*/)*([{};,>])(?:\s|/\*.*?\*/)*"
+    r"|(?:\s|/\*.*?\*/)+",
+    re.DOTALL,
+)
+
+
+def minify_html(html: str) -> str:
+    """Return ``html`` without comments and collapsible whitespace."""
+
+    return "".join(iter_minified(html))
+
+
+def iter_minified(html: str) -> Iterator[str]:
+    """Yield the minified ``html`` piece by piece, in one pass over the input."""
+
+    pending: List[str] = []
+    previous = ""
+    position = 0
+    for match in _TOKEN.finditer(html):
+        pending.append(html[position:match.start()])
+        position = match.end()
+        token = match.group(0)
+        if token.startswith("<!--") and not token.startswith("<!--[if"):
+            # Text on both sides of a dropped comment is collapsed as one run.
+            continue
+        name = (match.group("raw") or match.group("tag") or "").lower()
+        text = _collapse_text("".join(pending), previous, name)
+        pending.clear()
+        if text:
+            yield text
+        yield _minify_token(token, match.group("raw"))
+        previous = name
+    pending.append(html[position:])
+    text = _collapse_text("".join(pending), previous, "")
+    if text:
+        yield text
+
+
+# Theme styles and scripts repeat on every page; so do their minified forms.
+@functools.lru_cache(maxsize=64)
+def minify_css(css: str) -> str:
+    """Drop comments and the whitespace around CSS punctuation; strings are kept."""
+
+    def _replace(match: "re.Match[str]") -> str:
+        if match.group(2):
+            return ""
+        return match.group(1) or match.group(3) or " "
+
+    return _CSS_TOKEN.sub(_replace, css).strip()
+
+
+@functools.lru_cache(maxsize=64)
+def minify_js(script: str) -> str:
+    """Strip indentation, blank lines and whole-line ``//`` comments.
+
+    Line breaks are kept so automatic semicolon insertion is unaffected.
+    Scripts with template literals spanning lines are returned unchanged.
+    """
+
+    lines = script.splitlines()
+    if any(line.count("`") % 2 for line in lines):
+        return script
+    kept = [stripped for stripped in (line.strip() for line in lines) if stripped and not stripped.startswith("//")]
+    return "\n".join(kept)
+
+
+def _collapse_text(text: str, previous: str, following: str) -> str:
+    if not text:
+        return text
+    drop_before = not previous or previous in _BLOCK_TAGS
+    drop_after = not following or following in _BLOCK_TAGS
+    if not text.strip(_SPACE_CHARS):
+        return "" if drop_before or drop_after else " "
+    text = _SPACE.sub(" ", text)
+    if drop_before:
+        text = text.lstrip(_SPACE_CHARS)
+    if drop_after:
+        text = text.rstrip(_SPACE_CHARS)
+    return text
+
+
+def _minify_token(token: str, raw: Optional[str]) -> str:
+    if raw is None:
+        if token.startswith("<!"):
+            return token
+        return _minify_tag(token)
+    name = raw.lower()
+    opening = _OPEN_TAG.match(token)
+    closing = token.rfind("</")
+    if name in _PRESERVED_TAGS or opening is None or closing < opening.end():
+        return token
+    open_tag = _minify_tag(opening.group(0))
+    body = token[opening.end():closing]
+    if name == "style":
+        body = minify_css(body)
+    elif _is_script(open_tag):
+        body = minify_js(body)
+    return f"{open_tag}{body}{token[closing:]}"
+
+
+def _minify_tag(tag: str) -> str:
+    """Collapse whitespace between attributes; attribute values are kept."""
+
+    if "\n" not in tag and "  " not in tag and "\t" not in tag and not tag.endswith(" >"):
+        return tag
+    collapsed = _TAG_SPACE.sub(lambda match: match.group(1) or " ", tag)
+    if collapsed.endswith(" >"):
+        collapsed = collapsed[:-2] + ">"
+    return collapsed
+
+
+def _is_script(open_tag: str) -> bool:
+    match = re.search(r"""\stype\s*=\s*["']?([^"'\s>]+)""", open_tag, re.IGNORECASE)
+    return match is None or any(kind in match.group(1).lower() for kind in _SCRIPT_TYPES)
@@ -0,0 +1,260 @@
+"""Immutable navigation tree shared read-only by every rendered page."""
+
+from __future__ import annotations
+
+import logging
+import math
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+Segments = Tuple[str, ...]
+NAV_SORT_KEYS = ("name", "mtime", "order", "git")
+NAV_SORT_ORDERS = ("asc", "desc")
+
+logger = logging.getLogger(__name__)
+
+
+def format_segment_title(segment: str) -> str:
+    """Convert a path segment into a human friendly title."""
+
+    cleaned = segment.replace("_", " ").replace("-", " ").strip()
+    return cleaned or segment
+
+
+class NavNode:
+    """One entry of the navigation tree.
+
+    Nodes are immutable and their ``segments`` tuples are interned, so a tree
+    built once can be handed to every page render without copying. Mapping
+    style access (``node["title"]``, ``"name" in node``) is kept for templates
+    written against the previous dict based structure.
+    """
+
+    __slots__ = ("name", "title", "url", "segments", "children", "mtime", "is_leaf", "sorts_last")
+
+    name: str
+    title: str
+    url: Optional[str]
+    segments: Segments
+    children: Tuple["NavNode", ...]
+    mtime: float
+    is_leaf: bool
+    # Without a sort key: kept after the keyed siblings in both orders.
+    sorts_last: bool
+
+    def __init__(
+        self,
+        name: str,
+        title: str,
+        url: Optional[str],
+        segments: Segments,
+        children: Tuple["NavNode", ...] = (),
+        mtime: float = 0,
+        is_leaf: bool = False,
+        sorts_last: bool = False,
+    ) -> None:
+        for slot, value in zip(self.__slots__, (name, title, url, segments, children, mtime, is_leaf, sorts_last)):
+            object.__setattr__(self, slot, value)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.__slots__
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def __repr__(self) -> str:
+        return f"NavNode({'/'.join(self.segments)!r}, title={self.title!r}, children={len(self.children)})"
+
+
+class Navigation:
+    """Sequence of top-level :class:`NavNode` objects plus a segment index."""
+
+    __slots__ = ("roots", "_index", "_positions", "_pages")
+
+    def __init__(self, roots: Iterable[NavNode]) -> None:
+        self.roots: Tuple[NavNode, ...] = tuple(roots)
+        index: Dict[Segments, NavNode] = {}
+        stack = list(self.roots)
+        while stack:
+            node = stack.pop()
+            index[node.segments] = node
+            stack.extend(node.children)
+        self._index = index
+        self._pages: Optional[Tuple[NavNode, ...]] = None
+        self._positions: Dict[Segments, int] = {}
+
+    def __iter__(self) -> Iterator[NavNode]:
+        return iter(self.roots)
+
+    def __len__(self) -> int:
+        return len(self.roots)
+
+    def __bool__(self) -> bool:
+        return bool(self.roots)
+
+    def __getitem__(self, item: Union[int, slice]) -> Any:
+        return self.roots[item]
+
+    def find(self, segments: Sequence[str]) -> Optional[NavNode]:
+        return self._index.get(tuple(segments))
+
+    def trail(self, segments: Sequence[str]) -> Tuple[NavNode, ...]:
+        """Return the nodes from the root down to ``segments`` in O(depth) lookups."""
+
+        segments = tuple(segments)
+        nodes = (self._index.get(segments[:depth]) for depth in range(1, len(segments) + 1))
+        return tuple(node for node in nodes if node is not None)
+
+    def neighbours(self, segments: Sequence[str]) -> Tuple[Optional[NavNode], Optional[NavNode]]:
+        """Return the pages before and after ``segments`` in sidebar (depth-first) order."""
+
+        if self._pages is None:
+            pages: List[NavNode] = []
+            stack = list(reversed(self.roots))
+            while stack:
+                node = stack.pop()
+                if node.url:
+                    pages.append(node)
+                stack.extend(reversed(node.children))
+            self._pages = tuple(pages)
+            self._positions = {node.segments: position for position, node in enumerate(pages)}
+        position = self._positions.get(tuple(segments))
+        if position is None:
+            return None, None
+        previous = self._pages[position - 1] if position > 0 else None
+        following = self._pages[position + 1] if position + 1 < len(self._pages) else None
+        return previous, following
+
+
+def _sort_key(sort_by: str, reverse: bool = False) -> Callable[[Dict[str, Any]], Any]:
+    if sort_by == "name":
+        return lambda item: item["name"].lower()
+    # Entries without a key (e.g. no front matter weight) sort after the rest in either order.
+    missing = -math.inf if reverse else math.inf
+
+    def _key(item: Dict[str, Any]) -> Tuple[float, str]:
+        value = item.get("sort_key")
+        return (missing if value is None else float(value), item["name"].lower())
+
+    return _key
+
+
+def build_navigation(documents: Iterable[Dict[str, Any]], sort_by: str = "name", order: str = "asc") -> Navigation:
+    """Build the navigation tree from ``documents``.
+
+    Each document provides ``segments``, ``title``, ``url``, ``mtime`` and,
+    unless sorting by name, a numeric ``sort_key``. Directories take the key of
+    the first document below them. The tree is fully sorted here, so templates
+    and browsers render it in order without sorting again.
+
+    sort_by: one of :data:`NAV_SORT_KEYS`; order: 'asc' or 'desc'.
+    """
+
+    if sort_by not in NAV_SORT_KEYS:
+        raise ValueError(f"Unknown navigation sort key {sort_by!r}")
+
+    reverse = order == "desc"
+    ordered = [dict(doc, name="/".join(doc["segments"])) for doc in documents]
+    if sort_by == "mtime":
+        for doc in ordered:
+            doc.setdefault("sort_key", doc["mtime"])
+    ordered.sort(key=_sort_key(sort_by, reverse), reverse=reverse)
+
+    tree: Dict[str, Any] = {}
+    for doc in ordered:
+        current = tree
+        prefix: Segments = ()
+        segments = doc["segments"]
+        for index, segment in enumerate(segments):
+            node = current.get(segment)
+            if node is None:
+                # Every node owns the single tuple for its path; pages and the
+                # index below reference it instead of building their own copies.
+                node = current[segment] = {
+                    "title": format_segment_title(segment),
+                    "segments": prefix + (sys.intern(segment),),
+                    "children": {},
+                    "url": None,
+                    "is_leaf": False,
+                    "mtime": doc["mtime"],
+                    "sort_key": doc.get("sort_key"),
+                }
+            if index == len(segments) - 1:
+                node["title"] = doc["title"]
+                node["url"] = doc["url"]
+                node["is_leaf"] = True
+                node["mtime"] = doc["mtime"]
+                node["sort_key"] = doc.get("sort_key")
+            prefix = node["segments"]
+            current = node["children"]
+
+    return Navigation(_freeze(tree, sort_by, reverse))
+
+
+def _freeze(tree: Dict[str, Any], sort_by: str, reverse: bool) -> Tuple[NavNode, ...]:
+    items: List[Dict[str, Any]] = [dict(data, name=sys.intern(name)) for name, data in tree.items()]
+    items.sort(key=_sort_key(sort_by, reverse), reverse=reverse)
+    return tuple(
+        NavNode(
+            name=item["name"],
+            title=item["title"],
+            url=item["url"],
+            segments=item["segments"],
+            children=_freeze(item["children"], sort_by, reverse),
+            mtime=item["mtime"],
+            is_leaf=item["is_leaf"],
+            sorts_last=sort_by != "name" and item["sort_key"] is None,
+        )
+        for item in items
+    )
+
+
+def git_commit_times(root: Path) -> Dict[str, float]:
+    """Map POSIX paths relative to ``root`` to the time of their last commit.
+
+    Runs a single ``git log`` over the whole history; returns an empty mapping
+    when ``root`` is not inside a git work tree.
+    """
+
+    try:
+        completed = subprocess.run(
+            ["git", "-c", "core.quotepath=off", "log", "--format=%x00%ct", "--name-only", "--no-renames", "--relative", "--", "."],
+            cwd=root,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError) as exc:
+        logger.warning("Unable to read git history of %s: %s", root, exc)
+        return {}
+
+    times: Dict[str, float] = {}
+    current = 0.0
+    for line in completed.stdout.splitlines():
+        if line.startswith("\0"):
+            current = float(line[1:] or 0)
+        elif line:
+            # Newest commits come first, so the first sighting wins.
+            times.setdefault(line, current)
+    return times
+
+
+def git_head(root: Path) -> Optional[str]:
+    try:
+        completed = subprocess.run(["git", "rev-parse", "HEAD"], cwd=root, capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.strip() or None
@@ -0,0 +1,306 @@
+"""Output backends that receive rendered pages and static assets."""
+
+from __future__ import annotations
+
+import abc
+import gzip
+import hashlib
+import io
+import logging
+import os
+import shutil
+import tarfile
+import time
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Any, Dict, Optional
+
+from .config import AppConfig
+
+logger = logging.getLogger(__name__)
+
+_COPY_CHUNK_SIZE = 1024 * 1024
+_ZIP_EPOCH = 315532800  # 1980-01-01, the earliest timestamp zip can store
+ARCHIVE_SUFFIXES = {
+    ".tar": ("tar", None),
+    ".tar.gz": ("tar", "gz"),
+    ".tgz": ("tar", "gz"),
+    ".tar.zst": ("tar", "zst"),
+    ".tzst": ("tar", "zst"),
+    ".zip": ("zip", None),
+}
+
+
+@dataclass(frozen=True)
+class OutputRecord:
+    """Size and git blob id of one written output."""
+
+    size: int
+    blob: str
+
+
+def git_blob_id(payload: bytes) -> str:
+    """Return the id git assigns to ``payload``, so deploys can skip re-hashing."""
+
+    digest = hashlib.sha1(b"blob %d\0" % len(payload))  # noqa: S324 - git object id, not security
+    digest.update(payload)
+    return digest.hexdigest()
+
+
+def deterministic_mtime() -> int:
+    """Timestamp stamped on archive members (honours ``SOURCE_DATE_EPOCH``)."""
+
+    value = os.environ.get("SOURCE_DATE_EPOCH")
+    if value and value.isdigit():
+        return int(value)
+    return _ZIP_EPOCH
+
+
+class _HashingReader:
+    """File wrapper that computes the git blob id of everything read through it."""
+
+    def __init__(self, handle: IO[bytes], expected_size: int) -> None:
+        self._handle = handle
+        self._expected_size = expected_size
+        self._digest = hashlib.sha1(b"blob %d\0" % expected_size)  # noqa: S324 - git object id
+        self.size = 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._handle.read(size)
+        self._digest.update(chunk)
+        self.size += len(chunk)
+        return chunk
+
+    def blob_id(self, source: Path) -> str:
+        if self.size != self._expected_size:
+            raise OSError(f"{source} changed while it was being copied")
+        return self._digest.hexdigest()
+
+
+class OutputWriter(abc.ABC):
+    """Destination for build outputs addressed by POSIX relative paths.
+
+    Writers are reusable: :meth:`open` starts a fresh build and resets the
+    recorded outputs, :meth:`close` finalises it.
+    """
+
+    location: Path
+
+    def __init__(self) -> None:
+        self.records: Dict[str, OutputRecord] = {}
+
+    def open(self, *, clean: bool) -> None:
+        self.records = {}
+
+    def write_text(self, relative: str, text: str) -> None:
+        self.write_bytes(relative, text.encode("utf-8"))
+
+    @abc.abstractmethod
+    def write_bytes(self, relative: str, payload: bytes) -> None:
+        """Store ``payload`` at ``relative`` and record its size and blob id."""
+
+    @abc.abstractmethod
+    def copy_file(self, source: Path, relative: str) -> None:
+        """Copy the file ``source`` to ``relative`` and record its size and blob id."""
+
+    def close(self) -> None:
+        """Finish the current build."""
+
+    def abort(self) -> None:
+        """Discard a build that failed part way through."""
+
+    def _record(self, relative: str, size: int, blob: str) -> None:
+        self.records[relative] = OutputRecord(size=size, blob=blob)
+
+
+class DirectoryWriter(OutputWriter):
+    """Write outputs as individual files below a directory."""
+
+    def __init__(self, root: Path) -> None:
+        super().__init__()
+        self.location = root
+        self._known_dirs: set[Path] = set()
+
+    def open(self, *, clean: bool) -> None:
+        super().open(clean=clean)
+        self._known_dirs.clear()
+        if clean and self.location.exists():
+            logger.debug("Cleaning output directory %s", self.location)
+            shutil.rmtree(self.location)
+        self.location.mkdir(parents=True, exist_ok=True)
+
+    def write_bytes(self, relative: str, payload: bytes) -> None:
+        target = self._target(relative)
+        target.write_bytes(payload)
+        self._record(relative, len(payload), git_blob_id(payload))
+
+    def copy_file(self, source: Path, relative: str) -> None:
+        target = self._target(relative)
+        with source.open("rb") as handle, target.open("wb") as output:
+            reader = _HashingReader(handle, os.fstat(handle.fileno()).st_size)
+            shutil.copyfileobj(reader, output, _COPY_CHUNK_SIZE)  # type: ignore[arg-type]
+        shutil.copystat(source, target)
+        self._record(relative, reader.size, reader.blob_id(source))
+
+    def _target(self, relative: str) -> Path:
+        target = self.location / relative
+        parent = target.parent
+        if parent not in self._known_dirs:
+            parent.mkdir(parents=True, exist_ok=True)
+            self._known_dirs.add(parent)
+        return target
+
+
+class _ArchiveWriter(OutputWriter):
+    """Shared temp-file handling: archives only appear once complete."""
+
+    def __init__(self, path: Path) -> None:
+        super().__init__()
+        self.location = path
+        self._temp_path: Optional[Path] = None
+        self._mtime = deterministic_mtime()
+
+    def open(self, *, clean: bool) -> None:
+        super().open(clean=clean)
+        self.location.parent.mkdir(parents=True, exist_ok=True)
+        self._temp_path = self.location.with_name(f".{self.location.name}.tmp")
+        self._open_archive(self._temp_path)
+
+    def close(self) -> None:
+        if self._temp_path is None:
+            return
+        self._close_archive()
+        os.replace(self._temp_path, self.location)
+        self._temp_path = None
+        logger.info("Wrote %d entries to %s", len(self.records), self.location)
+
+    def abort(self) -> None:
+        if self._temp_path is None:
+            return
+        try:
+            self._close_archive()
+        finally:
+            self._temp_path.unlink(missing_ok=True)
+            self._temp_path = None
+
+    @abc.abstractmethod
+    def _open_archive(self, path: Path) -> None:
+        """Start a new archive at the temporary ``path``."""
+
+    @abc.abstractmethod
+    def _close_archive(self) -> None:
+        """Flush and close the archive opened by :meth:`_open_archive`."""
+
+
+class TarWriter(_ArchiveWriter):
+    """Stream outputs into a tar archive, optionally gzip or zstd compressed."""
+
+    def __init__(self, path: Path, compression: Optional[str] = None) -> None:
+        super().__init__(path)
+        if compression not in (None, "gz", "zst"):
+            raise ValueError(f"Unsupported tar compression {compression!r}")
+        self.compression = compression
+        self._raw: Optional[IO[bytes]] = None
+        self._stream: Optional[Any] = None
+        self._tar: Optional[tarfile.TarFile] = None
+
+    def _open_archive(self, path: Path) -> None:
+        self._raw = path.open("wb")
+        if self.compression == "gz":
+            self._stream = gzip.GzipFile(filename="", fileobj=self._raw, mode="wb", mtime=self._mtime)
+        elif self.compression == "zst":
+            try:
+                import zstandard  # type: ignore[import]
+            except ImportError as exc:
+                self._raw.close()
+                raise RuntimeError("zstd archives require the optional 'zstandard' package") from exc
+            self._stream = zstandard.ZstdCompressor().stream_writer(self._raw, closefd=False)
+        else:
+            self._stream = self._raw
+        self._tar = tarfile.open(fileobj=self._stream, mode="w|", format=tarfile.PAX_FORMAT)
+
+    def _close_archive(self) -> None:
+        if self._tar is not None:
+            self._tar.close()
+        if self._stream is not None and self._stream is not self._raw:
+            self._stream.close()
+        if self._raw is not None:
+            self._raw.close()
+        self._tar = self._stream = self._raw = None
+
+    def _member(self, relative: str, size: int) -> tarfile.TarInfo:
+        info = tarfile.TarInfo(relative)
+        info.size = size
+        info.mtime = self._mtime
+        info.mode = 0o644
+        info.uid = info.gid = 0
+        info.uname = info.gname = ""
+        return info
+
+    def write_bytes(self, relative: str, payload: bytes) -> None:
+        assert self._tar is not None, "writer is not open"
+        self._tar.addfile(self._member(relative, len(payload)), io.BytesIO(payload))
+        self._record(relative, len(payload), git_blob_id(payload))
+
+    def copy_file(self, source: Path, relative: str) -> None:
+        assert self._tar is not None, "writer is not open"
+        with source.open("rb") as handle:
+            size = os.fstat(handle.fileno()).st_size
+            reader = _HashingReader(handle, size)
+            self._tar.addfile(self._member(relative, size), reader)  # type: ignore[arg-type]
+        self._record(relative, reader.size, reader.blob_id(source))
+
+
+class ZipWriter(_ArchiveWriter):
+    """Stream outputs into a deflate-compressed zip archive."""
+
+    def __init__(self, path: Path) -> None:
+        super().__init__(path)
+        self._zip: Optional[zipfile.ZipFile] = None
+        self._date_time = time.gmtime(max(self._mtime, _ZIP_EPOCH))[:6]
+
+    def _open_archive(self, path: Path) -> None:
+        self._zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED)
+
+    def _close_archive(self) -> None:
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+
+    def _member(self, relative: str) -> zipfile.ZipInfo:
+        info = zipfile.ZipInfo(relative, date_time=self._date_time)
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.external_attr = 0o644 << 16
+        return info
+
+    def write_bytes(self, relative: str, payload: bytes) -> None:
+        assert self._zip is not None, "writer is not open"
+        self._zip.writestr(self._member(relative), payload)
+        self._record(relative, len(payload), git_blob_id(payload))
+
+    def copy_file(self, source: Path, relative: str) -> None:
+        assert self._zip is not None, "writer is not open"
+        with source.open("rb") as handle, self._zip.open(self._member(relative), "w", force_zip64=True) as output:
+            reader = _HashingReader(handle, os.fstat(handle.fileno()).st_size)
+            shutil.copyfileobj(reader, output, _COPY_CHUNK_SIZE)  # type: ignore[arg-type]
+        self._record(relative, reader.size, reader.blob_id(source))
+
+
+def archive_format(path: Path) -> tuple[str, Optional[str]]:
+    name = path.name.lower()
+    for suffix in sorted(ARCHIVE_SUFFIXES, key=len, reverse=True):
+        if name.endswith(suffix):
+            return ARCHIVE_SUFFIXES[suffix]
+    supported = ", ".join(sorted(ARCHIVE_SUFFIXES))
+    raise ValueError(f"Cannot infer archive format of {path}; use one of {supported}")
+
+
+def create_output_writer(config: AppConfig) -> OutputWriter:
+    archive = getattr(config, "archive", None)
+    if not archive:
+        return DirectoryWriter(config.output_dir)
+    kind, compression = archive_format(Path(archive))
+    if kind == "zip":
+        return ZipWriter(Path(archive))
+    return TarWriter(Path(archive), compression)
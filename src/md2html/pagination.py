@@ -0,0 +1,96 @@
+"""Split long documents into several pages at a chosen heading level.
+
+Pagination is opt-in: ``paginate_level`` in the configuration, optionally
+limited to sources of at least ``paginate_threshold`` bytes, or
+``paginate: <level>`` / ``paginate: false`` in a document's front matter.
+A document is parsed and its headings decorated once; every page renders a
+slice of the same block tokens, so heading ids stay unique across pages and
+the table of contents can link each heading on whichever page holds it.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from typing import TYPE_CHECKING, Any, List, Mapping
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from markdown_it.token import Token  # type: ignore[import]
+
+logger = logging.getLogger(__name__)
+
+PAGINATE_KEY = "paginate"
+# Used by ``paginate: true`` when the configuration does not name a level.
+DEFAULT_PAGINATE_LEVEL = 2
+
+_ANCHOR_REDIRECT_SNIPPET = (
+    "<script>\n"
+    "(function () {\n"
+    "  var pages = %s;\n"
+    "  function follow() {\n"
+    "    var id = decodeURIComponent(location.hash.slice(1));\n"
+    "    if (id && !document.getElementById(id) && Object.prototype.hasOwnProperty.call(pages, id)) {\n"
+    "      location.replace(%s + pages[id] + location.hash);\n"
+    "    }\n"
+    "  }\n"
+    "  follow();\n"
+    "  window.addEventListener('hashchange', follow);\n"
+    "})();\n"
+    "</script>"
+)
+
+
+def pagination_level(front_matter: Mapping[str, Any], size: int, level: int, threshold: int) -> int:
+    """Heading level a document is split at, or 0 to keep it on one page.
+
+    ``size`` is the source size in bytes; ``level`` and ``threshold`` are
+    the configured defaults, which front matter ``paginate`` overrides.
+    """
+
+    value = front_matter.get(PAGINATE_KEY)
+    if value is None:
+        chosen = level if size >= threshold else 0
+    elif isinstance(value, bool):
+        chosen = (level or DEFAULT_PAGINATE_LEVEL) if value else 0
+    else:
+        try:
+            chosen = int(value)
+        except (TypeError, ValueError):
+            logger.warning("front matter %s expects a heading level or false, got %r", PAGINATE_KEY, value)
+            return 0
+    return chosen if 1 <= chosen <= 6 else 0
+
+
+def page_starts(tokens: List["Token"], level: int) -> List[int]:
+    """Token indices where each page starts.
+
+    Pages start at top level headings of ``level`` or higher; headings inside
+    quotes, lists and containers never split a page. Whatever precedes the
+    first heading of exactly ``level``, such as an introduction under the
+    document title, stays on the first page with that heading's section.
+    """
+
+    headings = [
+        index
+        for index, token in enumerate(tokens)
+        if token.type == "heading_open" and token.level == 0 and int(token.tag[1]) <= level
+    ]
+    if not headings:
+        return [0]
+    tag = f"h{level}"
+    first = next((index for index in headings if tokens[index].tag == tag), headings[0])
+    return [0] + [index for index in headings if index > first]
+
+
+def anchor_redirect_snippet(targets: Mapping[str, str], base_url: str = "") -> str:
+    """Return the ``<script>`` sending ``#slug`` links to the page now holding that heading.
+
+    ``targets`` maps the heading ids found on the document's other pages to
+    their output URLs, relative to the site root.
+    """
+
+    base = str(base_url or "").strip().rstrip("/")
+    if base and not base.startswith("/"):
+        base = "/" + base
+    pages = json.dumps(dict(sorted(targets.items())), ensure_ascii=False).replace("</", "<\\/")
+    return _ANCHOR_REDIRECT_SNIPPET % (pages, json.dumps(f"{base}/"))
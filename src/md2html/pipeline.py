@@ -0,0 +1,134 @@
+"""Overlap source reads, rendering and output writes during a build.
+
+Rendering stays on the calling thread (renderers and navigation are not
+thread-safe); a reader pool prefetches sources ahead of it and a writer
+pool drains finished outputs behind it. Both sides are bounded, so at most
+``depth`` sources and ``depth`` outputs are held in memory at any time.
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+DEFAULT_IO_THREADS = 4
+DEFAULT_PIPELINE_DEPTH = 16
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def prefetch(
+    items: Iterable[T],
+    read: Callable[[T], R],
+    *,
+    threads: int,
+    depth: int,
+) -> Iterator[Tuple[T, R]]:
+    """Yield ``(item, read(item))`` in order while later items are read ahead.
+
+    At most ``depth`` reads are in flight or waiting to be consumed. With no
+    threads the items are read inline. ``read`` should not raise: a failed
+    read is best reported as a value the consumer can fall back from.
+    """
+
+    if threads <= 0:
+        for item in items:
+            yield item, read(item)
+        return
+
+    window: Deque[Tuple[T, Future]] = deque()
+    iterator = iter(items)
+    executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="md2html-read")
+    try:
+        for item in iterator:
+            window.append((item, executor.submit(read, item)))
+            if len(window) >= max(depth, 1):
+                break
+        while window:
+            item, future = window.popleft()
+            for following in iterator:
+                window.append((following, executor.submit(read, following)))
+                break
+            yield item, future.result()
+    finally:
+        for _, future in window:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+class WriterPool:
+    """Run write jobs on background threads behind a bounded queue.
+
+    :meth:`submit` blocks while ``depth`` jobs are waiting, which throttles
+    rendering to the speed of the disk. The first failing job stops the pool;
+    its exception is re-raised by the next :meth:`submit` or by :meth:`close`.
+    Jobs run in submission order when the pool has a single thread.
+    """
+
+    _STOP = None
+
+    def __init__(self, threads: int, depth: int) -> None:
+        self._queue: "queue.Queue[Optional[Callable[[], None]]]" = queue.Queue(maxsize=max(depth, 1))
+        self._error: Optional[BaseException] = None
+        self._cancelled = False
+        self._threads: List[threading.Thread] = []
+        for index in range(max(threads, 1)):
+            thread = threading.Thread(target=self._work, name=f"md2html-write-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            try:
+                if job is self._STOP:
+                    return
+                if self._error is None and not self._cancelled:
+                    job()
+            except BaseException as exc:  # pylint: disable=broad-except
+                if self._error is None:
+                    self._error = exc
+            finally:
+                self._queue.task_done()
+
+    def submit(self, job: Callable[[], None]) -> None:
+        self._raise_error()
+        self._queue.put(job)
+
+    def close(self, *, cancel: bool = False) -> None:
+        """Wait for every submitted job and stop the threads.
+
+        With ``cancel`` the jobs still queued are dropped and job errors are
+        not raised, for builds that already failed.
+        """
+
+        self._cancelled = cancel
+        for _ in self._threads:
+            self._queue.put(self._STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if not cancel:
+            self._raise_error()
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+
+class InlineWriter:
+    """:class:`WriterPool` stand-in that runs each job immediately."""
+
+    def submit(self, job: Callable[[], None]) -> None:
+        job()
+
+    def close(self, *, cancel: bool = False) -> None:
+        pass
+
+
+def create_writer_pool(threads: int, depth: int) -> "WriterPool | InlineWriter":
+    return WriterPool(threads, depth) if threads > 0 else InlineWriter()
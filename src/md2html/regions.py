@@ -0,0 +1,76 @@
+"""Locate classified elements in rendered pages by character offset."""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Optional, Tuple
+
+_NEWLINE = re.compile("\n")
+
+Classifier = Callable[[str, Dict[str, Optional[str]]], Optional[str]]
+
+
+@dataclass(frozen=True)
+class ElementSpan:
+    """Offsets of one element: ``html[start:end]`` is the whole element and
+    ``html[inner_start:inner_end]`` its content."""
+
+    name: str
+    start: int
+    inner_start: int
+    inner_end: int
+    end: int
+
+
+class _SpanParser(HTMLParser):
+    def __init__(self, html: str, classify: Classifier) -> None:
+        super().__init__(convert_charrefs=False)
+        self._html = html
+        self._classify = classify
+        # getpos() counts "\n" only; splitlines() would also break at "\r", "\f", U+2028 and others.
+        self._line_offsets = [0] + [match.end() for match in _NEWLINE.finditer(html)]
+        self.spans: List[ElementSpan] = []
+        self._open: Optional[Tuple[str, str, int, int]] = None
+        self._depth = 0
+
+    def _offset(self) -> int:
+        line, column = self.getpos()
+        return self._line_offsets[line - 1] + column
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if self._open is not None:
+            # Classified elements do not nest; only track depth to find the end tag.
+            if tag == self._open[1]:
+                self._depth += 1
+            return
+        name = self._classify(tag, dict(attrs))
+        if name is not None:
+            start = self._offset()
+            self._open = (name, tag, start, start + len(self.get_starttag_text() or ""))
+            self._depth = 1
+
+    def handle_endtag(self, tag: str) -> None:
+        if self._open is None or tag != self._open[1]:
+            return
+        self._depth -= 1
+        if self._depth == 0:
+            name, _, start, inner_start = self._open
+            inner_end = self._offset()
+            end = self._html.find(">", inner_end) + 1 or len(self._html)
+            self.spans.append(ElementSpan(name, start, inner_start, inner_end, end))
+            self._open = None
+
+
+def find_element_spans(html: str, classify: Classifier) -> List[ElementSpan]:
+    """Return the outermost elements for which ``classify(tag, attrs)`` names a region.
+
+    Elements nested inside an already classified element are attributed to it.
+    Raises whatever :class:`html.parser.HTMLParser` raises on broken markup.
+    """
+
+    parser = _SpanParser(html, classify)
+    parser.feed(html)
+    parser.close()
+    return parser.spans
@@ -0,0 +1,251 @@
+"""Generated service worker with a content-hashed precache manifest.
+
+Every output is listed with the git blob id the writer recorded for it, so
+a redeploy changes ``sw.js`` exactly when some output changed and browsers
+only refetch entries whose revision differs. Pages are served
+stale-while-revalidate, other outputs cache-first under their revision.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from typing import Any, List, Mapping, Tuple
+
+from .utils import format_size
+
+SERVICE_WORKER_NAME = "sw.js"
+DEFAULT_PRECACHE_SIZE = 50 * 1024 * 1024
+RUNTIME_CACHE_ENTRIES = 200
+
+logger = logging.getLogger(__name__)
+
+_REGISTRATION_SNIPPET = (
+    "<script>\n"
+    "if ('serviceWorker' in navigator) {\n"
+    "  window.addEventListener('load', function () {\n"
+    "    navigator.serviceWorker.register(%s).catch(function (err) {\n"
+    "      console.debug('Service worker registration failed', err);\n"
+    "    });\n"
+    "  });\n"
+    "}\n"
+    "</script>"
+)
+
+_SERVICE_WORKER_TEMPLATE = """\
+/* Generated by md2html; do not edit. */
+'use strict';
+
+const VERSION = __VERSION__;
+// Relative output path -> git blob id of every file in the build.
+const REVISIONS = __REVISIONS__;
+// Paths fetched on install, chosen to fit the precache size cap.
+const PRECACHE = __PRECACHE__;
+const RUNTIME_ENTRIES = __RUNTIME_ENTRIES__;
+const REVISION_PARAM = '__md2html_rev';
+const PREFIX = 'md2html:' + self.registration.scope + ':';
+const PRECACHE_NAME = PREFIX + 'precache';
+const RUNTIME_NAME = PREFIX + 'runtime';
+const PRECACHE_SET = new Set(PRECACHE);
+
+function absoluteUrl(path) {
+  return new URL(path, self.registration.scope).href;
+}
+
+function revisionKey(path) {
+  const url = new URL(path, self.registration.scope);
+  url.searchParams.set(REVISION_PARAM, REVISIONS[path]);
+  return url.href;
+}
+
+function relativePath(href) {
+  const scope = self.registration.scope;
+  const url = new URL(href);
+  const base = url.origin + url.pathname;
+  if (!base.startsWith(scope)) {
+    return null;
+  }
+  let path;
+  try {
+    path = decodeURIComponent(base.slice(scope.length));
+  } catch (err) {
+    return null;
+  }
+  if (path === '' || path.endsWith('/')) {
+    path += 'index.html';
+  }
+  return path;
+}
+
+async function trim(cache) {
+  // Cache keys come back in insertion order, so this evicts the oldest entries.
+  const keys = await cache.keys();
+  for (let index = 0; index < keys.length - RUNTIME_ENTRIES; index += 1) {
+    await cache.delete(keys[index]);
+  }
+}
+
+async function precacheEntry(precache, runtime, path) {
+  const key = revisionKey(path);
+  if (await precache.match(key)) {
+    return;
+  }
+  const lazily = await runtime.match(key);
+  if (lazily) {
+    await precache.put(key, lazily);
+    return;
+  }
+  try {
+    const response = await fetch(absoluteUrl(path), { cache: 'no-cache' });
+    if (response.ok && !response.redirected) {
+      await precache.put(key, response);
+    }
+  } catch (err) {
+    console.debug('md2html: unable to precache', path, err);
+  }
+}
+
+self.addEventListener('install', (event) => {
+  event.waitUntil((async () => {
+    const precache = await caches.open(PRECACHE_NAME);
+    const runtime = await caches.open(RUNTIME_NAME);
+    for (let index = 0; index < PRECACHE.length; index += 6) {
+      await Promise.all(PRECACHE.slice(index, index + 6).map((path) => precacheEntry(precache, runtime, path)));
+    }
+    await self.skipWaiting();
+  })());
+});
+
+self.addEventListener('activate', (event) => {
+  event.waitUntil((async () => {
+    const current = new Set(Object.keys(REVISIONS).map(revisionKey));
+    for (const name of [PRECACHE_NAME, RUNTIME_NAME]) {
+      const cache = await caches.open(name);
+      for (const request of await cache.keys()) {
+        const url = new URL(request.url);
+        let stale;
+        if (url.searchParams.has(REVISION_PARAM)) {
+          stale = !current.has(request.url);
+        } else {
+          // Revalidated page copies of precached pages are superseded by the new revision.
+          stale = PRECACHE_SET.has(relativePath(request.url));
+        }
+        if (stale) {
+          await cache.delete(request);
+        }
+      }
+    }
+    await self.clients.claim();
+  })());
+});
+
+async function cacheFirst(request, key) {
+  const cached = await caches.match(key);
+  if (cached) {
+    return cached;
+  }
+  const response = await fetch(request);
+  if (response.ok || response.type === 'opaque') {
+    const runtime = await caches.open(RUNTIME_NAME);
+    await runtime.put(key, response.clone());
+    await trim(runtime);
+  }
+  return response;
+}
+
+async function staleWhileRevalidate(event, path) {
+  const pageUrl = absoluteUrl(path);
+  const runtime = await caches.open(RUNTIME_NAME);
+  const cached = (await runtime.match(pageUrl)) || (await caches.match(revisionKey(path)));
+  const network = fetch(event.request)
+    .then(async (response) => {
+      if (response.ok && !response.redirected) {
+        await runtime.put(pageUrl, response.clone());
+        await trim(runtime);
+      }
+      return response;
+    })
+    .catch(() => undefined);
+  event.waitUntil(network);
+  return cached || (await network) || Response.error();
+}
+
+self.addEventListener('fetch', (event) => {
+  const request = event.request;
+  if (request.method !== 'GET') {
+    return;
+  }
+  const url = new URL(request.url);
+  if (url.origin !== self.location.origin) {
+    // Version pinned CDN files such as fuse.js@6.6.2 never change.
+    if (/@\\d/.test(url.pathname)) {
+      event.respondWith(cacheFirst(request, request.url));
+    }
+    return;
+  }
+  const path = relativePath(request.url);
+  if (path === null || !(path in REVISIONS)) {
+    return;
+  }
+  if (path.endsWith('.html')) {
+    event.respondWith(staleWhileRevalidate(event, path));
+  } else {
+    event.respondWith(cacheFirst(request, revisionKey(path)));
+  }
+});
+"""
+
+
+def registration_snippet(base_url: str = "") -> str:
+    """Return the ``<script>`` that registers ``sw.js`` from the site root."""
+
+    base = str(base_url or "").strip().rstrip("/")
+    if base and not base.startswith("/"):
+        base = "/" + base
+    return _REGISTRATION_SNIPPET % json.dumps(f"{base}/{SERVICE_WORKER_NAME}")
+
+
+def _cacheable(relative: str) -> bool:
+    # Build bookkeeping such as .md2html-manifest.json is never fetched by readers.
+    return relative != SERVICE_WORKER_NAME and not any(part.startswith(".") for part in relative.split("/"))
+
+
+def select_precache(records: Mapping[str, Any], max_bytes: int) -> Tuple[List[str], int]:
+    """Pick the outputs fetched on install: pages first, then the smallest assets."""
+
+    entries = [(relative, record.size) for relative, record in records.items() if _cacheable(relative)]
+    entries.sort(key=lambda item: (not item[0].endswith(".html"), item[1], item[0]))
+    selected: List[str] = []
+    total = 0
+    for relative, size in entries:
+        if total + size > max_bytes:
+            continue
+        selected.append(relative)
+        total += size
+    return sorted(selected), total
+
+
+def render_service_worker(records: Mapping[str, Any], *, max_bytes: int = DEFAULT_PRECACHE_SIZE) -> str:
+    """Render ``sw.js`` for ``records`` (objects with ``size`` and ``blob``)."""
+
+    revisions = {relative: record.blob for relative, record in sorted(records.items()) if _cacheable(relative)}
+    precache, precache_bytes = select_precache(records, max_bytes)
+    revisions_json = json.dumps(revisions, ensure_ascii=False, indent=2)
+    version = hashlib.sha256(revisions_json.encode("utf-8")).hexdigest()[:16]
+    logger.info(
+        "Service worker precaches %d of %d files (%s)",
+        len(precache),
+        len(revisions),
+        format_size(precache_bytes),
+    )
+    replacements = {
+        "__VERSION__": json.dumps(version),
+        "__REVISIONS__": revisions_json,
+        "__PRECACHE__": json.dumps(precache, ensure_ascii=False, indent=2),
+        "__RUNTIME_ENTRIES__": str(RUNTIME_CACHE_ENTRIES),
+    }
+    script = _SERVICE_WORKER_TEMPLATE
+    for placeholder, value in replacements.items():
+        script = script.replace(placeholder, value)
+    return script
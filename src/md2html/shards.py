@@ -0,0 +1,238 @@
+"""Deterministic sharding of a site build across machines."""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import heapq
+import json
+import logging
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, TypeVar
+
+from .manifest import BUILD_MANIFEST_NAME, load_build_manifest, render_build_manifest
+from .output import OutputRecord, git_blob_id
+from .utils import ensure_directory
+
+LOG_FORMAT = "[%(levelname)s] %(message)s"
+SHARD_MANIFEST_NAME = ".md2html-shard.json"
+SHARD_MANIFEST_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+E = TypeVar("E")
+
+
+class ShardMergeError(ValueError):
+    """Raised when shard outputs cannot be combined safely."""
+
+
+@dataclass(frozen=True)
+class ShardSpec:
+    """One shard out of ``count``; ``index`` is 1-based as in ``--shard 2/4``."""
+
+    index: int
+    count: int
+
+    def __post_init__(self) -> None:
+        if self.count < 1 or not 1 <= self.index <= self.count:
+            raise ValueError(f"Invalid shard {self.index}/{self.count}")
+
+    @classmethod
+    def parse(cls, value: str) -> "ShardSpec":
+        index, sep, count = str(value).partition("/")
+        if not sep:
+            raise ValueError(f"Shard must look like 'i/n', got {value!r}")
+        try:
+            return cls(int(index), int(count))
+        except ValueError as exc:
+            raise ValueError(f"Invalid shard {value!r}: {exc}") from exc
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+    def select(self, entries: Sequence[E]) -> List[E]:
+        """Return the entries owned by this shard, preserving their order."""
+
+        assignment = assign_shards(entries, self.count)
+        return [entry for entry in entries if assignment[_entry_key(entry)] == self.index]
+
+
+def _entry_key(entry: Any) -> str:
+    return entry.relative.as_posix()
+
+
+def assign_shards(entries: Iterable[Any], count: int) -> Dict[str, int]:
+    """Assign source entries to shards, balancing total source size.
+
+    Uses longest-processing-time-first scheduling with ties broken by path,
+    so every machine derives the same assignment from the same source tree.
+    """
+
+    ordered = sorted(entries, key=lambda entry: (-entry.size, _entry_key(entry)))
+    loads = [(0, index) for index in range(1, count + 1)]
+    heapq.heapify(loads)
+    assignment: Dict[str, int] = {}
+    for entry in ordered:
+        load, index = heapq.heappop(loads)
+        assignment[_entry_key(entry)] = index
+        # Weight empty files too so they still spread across shards.
+        heapq.heappush(loads, (load + max(entry.size, 1), index))
+    return assignment
+
+
+def navigation_fingerprint(navigation: Any) -> str:
+    """Digest the navigation structure, ignoring machine dependent mtimes."""
+
+    def _strip(nodes: Iterable[Dict[str, Any]]) -> List[Any]:
+        return [
+            [node.get("segments"), node.get("title"), node.get("url"), _strip(node.get("children") or [])]
+            for node in nodes
+        ]
+
+    payload = json.dumps(_strip(navigation), ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def render_shard_manifest(
+    shard: ShardSpec,
+    navigation_digest: str,
+    records: Mapping[str, Any],
+    *,
+    service_worker: Optional[Dict[str, Any]] = None,
+) -> str:
+    """Serialise the manifest describing the outputs written by ``shard``.
+
+    ``service_worker`` carries the settings for the ``sw.js`` that
+    :func:`merge_shards` generates once every shard's outputs are known.
+    """
+
+    files = {
+        relative: {"blob": record.blob, "size": record.size}
+        for relative, record in sorted(records.items())
+    }
+    manifest = {
+        "version": SHARD_MANIFEST_VERSION,
+        "shard": {"index": shard.index, "count": shard.count},
+        "navigation": navigation_digest,
+        "files": files,
+    }
+    if service_worker is not None:
+        manifest["service_worker"] = service_worker
+    logger.info("Shard %s produced %d files", shard, len(files))
+    return json.dumps(manifest, ensure_ascii=False, indent=2)
+
+
+def read_shard_manifest(shard_dir: Path) -> Dict[str, Any]:
+    path = shard_dir / SHARD_MANIFEST_NAME
+    try:
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError as exc:
+        raise ShardMergeError(f"{shard_dir} has no {SHARD_MANIFEST_NAME}") from exc
+    except ValueError as exc:
+        raise ShardMergeError(f"Invalid shard manifest {path}: {exc}") from exc
+    if manifest.get("version") != SHARD_MANIFEST_VERSION:
+        raise ShardMergeError(f"Unsupported shard manifest version in {path}")
+    return manifest
+
+
+def merge_shards(shard_dirs: Sequence[Path], destination: Path, *, clean: bool = True) -> Dict[str, str]:
+    """Combine shard outputs into ``destination``.
+
+    Validates that all shards come from the same build (same shard count and
+    navigation) and that no output path was produced by more than one shard.
+    Returns a mapping of merged relative paths to their shard directory.
+    """
+
+    manifests = [(Path(shard_dir), read_shard_manifest(Path(shard_dir))) for shard_dir in shard_dirs]
+    if not manifests:
+        raise ShardMergeError("No shard directories given")
+
+    counts = {manifest["shard"]["count"] for _, manifest in manifests}
+    if len(counts) != 1:
+        raise ShardMergeError(f"Shards disagree on the shard count: {sorted(counts)}")
+    count = counts.pop()
+    indices = sorted(manifest["shard"]["index"] for _, manifest in manifests)
+    if indices != list(range(1, count + 1)):
+        raise ShardMergeError(f"Expected shards 1..{count}, got {indices}")
+    digests = {manifest["navigation"] for _, manifest in manifests}
+    if len(digests) != 1:
+        raise ShardMergeError("Shards were built from different navigation structures")
+    service_workers = {json.dumps(manifest.get("service_worker"), sort_keys=True) for _, manifest in manifests}
+    if len(service_workers) != 1:
+        raise ShardMergeError("Shards disagree on the service worker settings")
+    service_worker = manifests[0][1].get("service_worker")
+
+    owners: Dict[str, str] = {}
+    for shard_dir, manifest in manifests:
+        for relative in manifest["files"]:
+            if relative in owners:
+                raise ShardMergeError(f"Output {relative} produced by both {owners[relative]} and {shard_dir}")
+            owners[relative] = str(shard_dir)
+
+    previous = load_build_manifest(destination / BUILD_MANIFEST_NAME)
+    if clean and destination.exists():
+        shutil.rmtree(destination)
+    ensure_directory(destination)
+    records: Dict[str, OutputRecord] = {}
+    for shard_dir, manifest in manifests:
+        for relative, info in manifest["files"].items():
+            source = shard_dir / relative
+            if not source.is_file():
+                raise ShardMergeError(f"{source} is listed in the manifest but missing")
+            if source.stat().st_size != info.get("size"):
+                raise ShardMergeError(f"{source} does not match its manifest entry")
+            target = destination / relative
+            ensure_directory(target.parent)
+            shutil.copy2(source, target)
+            records[relative] = OutputRecord(size=info["size"], blob=info["blob"])
+
+    if service_worker is not None:
+        from .serviceworker import SERVICE_WORKER_NAME, render_service_worker
+
+        payload = render_service_worker(records, max_bytes=int(service_worker["cache_size"])).encode("utf-8")
+        (destination / SERVICE_WORKER_NAME).write_bytes(payload)
+        records[SERVICE_WORKER_NAME] = OutputRecord(size=len(payload), blob=git_blob_id(payload))
+
+    build_manifest, _ = render_build_manifest(records, previous)
+    (destination / BUILD_MANIFEST_NAME).write_text(build_manifest, encoding="utf-8")
+
+    logger.info("Merged %d shards (%d files) into %s", count, len(owners), destination)
+    return owners
+
+
+def build_argument_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="md2html merge-shards",
+        description="Combine the outputs of a sharded md2html build.",
+    )
+    parser.add_argument("shard_dirs", nargs="+", help="Output directories of the individual shards")
+    parser.add_argument("--dst", dest="output_dir", required=True, help="Destination directory for the merged site")
+    parser.add_argument(
+        "--no-clean",
+        dest="clean_output",
+        action="store_false",
+        help="Do not clean the destination directory before merging",
+    )
+    parser.add_argument("--verbose", dest="verbose", action="store_true", help="Enable verbose logging")
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = build_argument_parser()
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format=LOG_FORMAT)
+
+    try:
+        merge_shards([Path(item) for item in args.shard_dirs], Path(args.output_dir), clean=args.clean_output)
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.error("md2html merge-shards failed: %s", exc)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -6,16 +6,16 @@ import logging
 from dataclasses import dataclass
 from importlib import resources
 from pathlib import Path
-from typing import Any, Dict, Iterable, Optional
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Optional
 
-import yaml  # type: ignore[import]
-from jinja2 import Environment, Template
-from jinja2.loaders import DictLoader
-from pygments.formatters.html import HtmlFormatter
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from jinja2 import Template
 
 logger = logging.getLogger(__name__)
 
 THEME_PACKAGE = "md2html.themes"
+# Site metadata keys whose markup is injected right before ``</body>``.
+BODY_SNIPPET_KEYS = ("service_worker_snippet", "live_reload_snippet", "pagination_snippet")
 
 
 class ThemeNotFoundError(RuntimeError):
@@ -29,6 +29,7 @@ class Theme:
     config: Dict[str, Any]
     inline_styles: str
     syntax_styles: str
+    root: Optional[Path] = None
 
     def render(
         self,
@@ -52,7 +53,10 @@ class Theme:
             "toc": list(toc),
         }
         rendered_html = self.template.render(context)
-        snippet = site_metadata.get("live_reload_snippet") if isinstance(site_metadata, dict) else None
+        if not isinstance(site_metadata, dict):
+            return rendered_html
+        snippets = [site_metadata.get(key) for key in BODY_SNIPPET_KEYS]
+        snippet = "\n".join(str(item) for item in snippets if item)
         if snippet:
             closing_tag = "</body>"
             if closing_tag in rendered_html:
@@ -103,11 +107,14 @@ class ThemeManager:
         return None
 
     def _load_from_builtin(self, theme_name: str) -> Optional[Theme]:
-        package = f"{THEME_PACKAGE}.{theme_name}"
+        # Resolve through the regular ``themes`` package: the theme folders are
+        # namespace packages, which ``as_file`` cannot materialise before 3.12.
         try:
-            traversable = resources.files(package)
+            traversable = resources.files(THEME_PACKAGE).joinpath(theme_name)
         except ModuleNotFoundError:
             return None
+        if not traversable.is_dir():
+            return None
 
         with resources.as_file(traversable) as temp_path:
             return self._build_theme(Path(temp_path), theme_name)
@@ -125,6 +132,9 @@ class ThemeManager:
         pygments_style_name = config.get("pygments_style", "friendly")
         syntax_styles = self._resolve_syntax_styles(root, pygments_style_name)
 
+        from jinja2 import Environment
+        from jinja2.loaders import DictLoader
+
         env = Environment(loader=DictLoader({template_name: template_content}))
         template = env.get_template(template_name)
 
@@ -134,12 +144,15 @@ class ThemeManager:
             config=config,
             inline_styles=inline_styles,
             syntax_styles=syntax_styles,
+            root=root,
         )
 
     @staticmethod
     def _load_yaml(path: Path) -> Dict[str, Any]:
         if not path.exists():
             return {}
+        import yaml  # type: ignore[import]
+
         try:
             with path.open("r", encoding="utf-8") as handle:
                 data = yaml.safe_load(handle) or {}
@@ -158,6 +171,9 @@ class ThemeManager:
         if syntax_css_path.exists():
             return syntax_css_path.read_text(encoding="utf-8")
 
+        # Pygments is only needed when a theme does not ship its own syntax.css.
+        from pygments.formatters.html import HtmlFormatter
+
         formatter = HtmlFormatter(style=pygments_style_name)  # type: ignore[arg-type]
         return formatter.get_style_defs(".md2html-code")
 
@@ -7,10 +7,11 @@ import shutil
 from pathlib import Path
 from typing import Any, Dict, Tuple
 
-import yaml  # type: ignore[import]
-
 FRONT_MATTER_BOUNDARY = "---"
+MAX_FRONT_MATTER_SIZE = 64 * 1024
 MARKDOWN_EXTENSIONS = {".md", ".markdown", ".mdown", ".mkd"}
+_SIZE_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([kmg]?)(?:i?b)?\s*$", re.IGNORECASE)
+_SIZE_UNITS = {"": 1, "k": 1024, "m": 1024**2, "g": 1024**3}
 
 
 def ensure_directory(path: Path) -> None:
@@ -30,6 +31,28 @@ def copy_static_resource(source: Path, destination: Path) -> None:
     shutil.copy2(source, destination)
 
 
+def parse_size(value: Any) -> int:
+    """Parse a byte size such as ``4096``, ``"300KB"`` or ``"1.5 MiB"`` (binary units)."""
+
+    if isinstance(value, bool):
+        raise ValueError(f"Invalid size {value!r}")
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = _SIZE_PATTERN.match(str(value))
+    if match is None:
+        raise ValueError(f"Invalid size {value!r}")
+    number, unit = match.groups()
+    return int(float(number) * _SIZE_UNITS[unit.lower()])
+
+
+def format_size(size: int) -> str:
+    if size < 1024:
+        return f"{size} B"
+    if size < 1024**2:
+        return f"{size / 1024:.1f} KB"
+    return f"{size / 1024**2:.1f} MB"
+
+
 def slugify(value: str) -> str:
     """Generate URL friendly slug from a heading."""
 
@@ -45,12 +68,17 @@ def parse_front_matter(text: str) -> Tuple[Dict[str, Any], str]:
     if not text.startswith(FRONT_MATTER_BOUNDARY):
         return {}, text
 
-    lines = text.splitlines()
-    if len(lines) < 2:
+    # Only the head of the file may hold front matter, so an unclosed fence
+    # does not make every document scan (and split) its whole body.
+    lines = text[:MAX_FRONT_MATTER_SIZE].splitlines(keepends=True)
+    if len(text) > MAX_FRONT_MATTER_SIZE:
+        lines.pop()  # possibly cut in half
+    if not lines:
         return {}, text
-
     closing_index = None
+    offset = len(lines[0])
     for index, line in enumerate(lines[1:], start=1):
+        offset += len(line)
         if line.strip() == FRONT_MATTER_BOUNDARY:
             closing_index = index
             break
@@ -58,11 +86,12 @@ def parse_front_matter(text: str) -> Tuple[Dict[str, Any], str]:
     if closing_index is None:
         return {}, text
 
-    raw_front_matter = "\n".join(lines[1:closing_index])
-    body_lines = lines[closing_index + 1 :]
-    body = "\n".join(body_lines)
+    raw_front_matter = "\n".join("".join(lines[1:closing_index]).splitlines())
+    body = "\n".join(text[offset:].splitlines())
 
     if raw_front_matter.strip():
+        import yaml  # type: ignore[import]
+
         try:
             data = yaml.safe_load(raw_front_matter) or {}
         except yaml.YAMLError as exc:  # type: ignore[attr-defined]
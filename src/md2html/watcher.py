@@ -0,0 +1,297 @@
+"""File watching backends feeding :class:`~md2html.converter.SiteBuilder` rebuilds.
+
+The native backend uses watchdog's platform observer. The polling backend
+diffs periodic ``os.scandir`` stat snapshots instead, for filesystems that do
+not deliver change notifications (NFS, Docker bind mounts from macOS hosts).
+"""
+
+from __future__ import annotations
+
+import abc
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .includes import is_partial
+from .utils import is_markdown_file
+
+WATCH_BACKENDS = ("native", "polling")
+DEFAULT_POLL_INTERVAL = 1.0
+
+logger = logging.getLogger(__name__)
+
+# (inode, size, mtime_ns) per file; compact enough for very large trees.
+StatKey = Tuple[int, int, int]
+Snapshot = Dict[str, StatKey]
+
+
+@dataclass(frozen=True)
+class FileEvent:
+    """Minimal stand-in for watchdog's ``FileSystemEvent``."""
+
+    event_type: str
+    src_path: str
+    dest_path: str = ""
+    is_directory: bool = False
+
+
+def take_snapshot(root: Path, should_ignore: Optional[Callable[[str], bool]] = None) -> Snapshot:
+    """Stat every file below ``root``, pruning ignored subtrees.
+
+    ``should_ignore`` receives plain path strings so a large tree can be
+    polled without building a ``Path`` per entry.
+    """
+
+    snapshot: Snapshot = {}
+    pending = [str(root)]
+    while pending:
+        directory = pending.pop()
+        try:
+            iterator = os.scandir(directory)
+        except OSError:
+            continue
+        with iterator:
+            for item in iterator:
+                if should_ignore is not None and should_ignore(item.path):
+                    continue
+                try:
+                    if item.is_dir():
+                        pending.append(item.path)
+                        continue
+                    stat = item.stat()
+                except OSError:
+                    continue
+                snapshot[item.path] = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+def diff_snapshots(before: Snapshot, after: Snapshot) -> List[FileEvent]:
+    """Translate two snapshots into watchdog style events.
+
+    A path that vanished while a new path appeared with the same inode is
+    reported as a move.
+    """
+
+    created = [path for path in after if path not in before]
+    deleted = [path for path in before if path not in after]
+    modified = [path for path, key in after.items() if path in before and before[path] != key]
+
+    new_by_inode = {after[path][0]: path for path in created}
+    events: List[FileEvent] = []
+    moved_targets = set()
+    for path in deleted:
+        target = new_by_inode.get(before[path][0])
+        if target is not None and target not in moved_targets:
+            moved_targets.add(target)
+            events.append(FileEvent("moved", path, dest_path=target))
+        else:
+            events.append(FileEvent("deleted", path))
+    events.extend(FileEvent("created", path) for path in created if path not in moved_targets)
+    events.extend(FileEvent("modified", path) for path in modified)
+    return events
+
+
+class _Poller(abc.ABC):
+    """Background thread calling :meth:`poll`; mimics watchdog's ``Observer`` API."""
+
+    thread_name = "md2html-poller"
+
+    def __init__(self, interval: float) -> None:
+        self.interval = max(float(interval), 0.05)
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._prime()
+        self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @abc.abstractmethod
+    def poll(self) -> Any:
+        """Check for changes once and dispatch them."""
+
+    def _prime(self) -> None:
+        """Record the initial state so the first poll only reports changes."""
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.error("%s failed: %s", self.thread_name, exc)
+
+
+class PollingWatcher(_Poller):
+    """Poll a source tree and dispatch changes to a watchdog style handler.
+
+    Deletions and Markdown changes found in one poll all lead to the same full
+    rebuild, so only the first of them is dispatched; static asset and partial
+    changes are dispatched individually.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        handler: Any,
+        *,
+        interval: float = DEFAULT_POLL_INTERVAL,
+        should_ignore: Optional[Callable[[Path], bool]] = None,
+        ignore_key: Optional[Callable[[], Any]] = None,
+    ) -> None:
+        super().__init__(interval)
+        self.root = Path(root)
+        self.handler = handler
+        self._should_ignore = should_ignore
+        # Returns a value that changes whenever ``should_ignore``'s rules do.
+        self._ignore_key = ignore_key
+        # Answers for the paths of the last walk only, under the rules of ``_ignore_cache_key``.
+        self._ignore_cache: Dict[str, bool] = {}
+        self._ignore_cache_key: Any = None
+        self._snapshot: Snapshot = {}
+
+    def _prime(self) -> None:
+        self._snapshot = self._take_snapshot()
+        logger.debug("Polling %d files below %s every %.2fs", len(self._snapshot), self.root, self.interval)
+
+    def poll(self) -> List[FileEvent]:
+        """Take a new snapshot, dispatch the differences and return them."""
+
+        snapshot = self._take_snapshot()
+        events = diff_snapshots(self._snapshot, snapshot)
+        self._snapshot = snapshot
+        full_rebuild_sent = False
+        for event in events:
+            if self._needs_full_rebuild(event):
+                if full_rebuild_sent:
+                    continue
+                full_rebuild_sent = True
+            self.handler.dispatch(event)
+        return events
+
+    def _take_snapshot(self) -> Snapshot:
+        should_ignore = self._should_ignore
+        if should_ignore is None:
+            return take_snapshot(self.root)
+        key = self._ignore_key() if self._ignore_key is not None else None
+        # Hot-reloaded ignore rules invalidate every answer; otherwise only the
+        # paths seen again are carried over, so churn does not accumulate.
+        previous = self._ignore_cache if key == self._ignore_cache_key else {}
+        current: Dict[str, bool] = {}
+
+        def is_ignored(path: str) -> bool:
+            ignored = previous.get(path)
+            if ignored is None:
+                ignored = should_ignore(Path(path))
+            current[path] = ignored
+            return ignored
+
+        snapshot = take_snapshot(self.root, is_ignored)
+        self._ignore_cache, self._ignore_cache_key = current, key
+        return snapshot
+
+    @staticmethod
+    def _needs_full_rebuild(event: FileEvent) -> bool:
+        # Mirrors _WatchHandler: deletions and Markdown changes rebuild the site,
+        # except for partials that no page includes.
+        if event.event_type == "deleted":
+            return True
+        path = Path(event.dest_path or event.src_path)
+        return is_markdown_file(path) and not is_partial(path)
+
+
+class SettingsWatcher(_Poller):
+    """Poll the configuration file and the active theme directory.
+
+    Both are a handful of files, so polling works on every filesystem without
+    watching the (possibly large) directory that holds the config file. Edits
+    are passed to ``handler.reload_settings``.
+    """
+
+    thread_name = "md2html-settings-poller"
+
+    def __init__(
+        self,
+        builder: Any,
+        handler: Any,
+        *,
+        config_path: Optional[Path] = None,
+        interval: float = DEFAULT_POLL_INTERVAL,
+    ) -> None:
+        super().__init__(interval)
+        self.builder = builder
+        self.handler = handler
+        self.config_path = Path(config_path) if config_path else None
+        self._config_key: Optional[StatKey] = None
+        self._theme_snapshot: Snapshot = {}
+
+    def _prime(self) -> None:
+        self._config_key = self._stat_config()
+        self._theme_snapshot = self._snapshot_theme()
+
+    def poll(self) -> Optional[Path]:
+        """Reload if anything changed; return the path that triggered it."""
+
+        config_key = self._stat_config()
+        theme_snapshot = self._snapshot_theme()
+        config_changed = config_key != self._config_key
+        changed: Optional[Path] = None
+        if config_changed:
+            changed = self.config_path
+        elif theme_snapshot != self._theme_snapshot:
+            events = diff_snapshots(self._theme_snapshot, theme_snapshot)
+            changed = Path(events[0].dest_path or events[0].src_path) if events else self.builder.theme.root
+        self._config_key = config_key
+        self._theme_snapshot = theme_snapshot
+        if changed is not None:
+            self.handler.reload_settings(changed, config_changed=config_changed)
+            # The reload may have switched themes; start from the new one.
+            self._theme_snapshot = self._snapshot_theme()
+        return changed
+
+    def _stat_config(self) -> Optional[StatKey]:
+        if self.config_path is None:
+            return None
+        try:
+            stat = self.config_path.stat()
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def _snapshot_theme(self) -> Snapshot:
+        root = getattr(self.builder.theme, "root", None)
+        return take_snapshot(root) if root is not None else {}
+
+
+def create_observer(builder: Any, handler: Any) -> Any:
+    """Return an unstarted observer for ``builder``'s source tree.
+
+    The backend comes from ``config.watch_backend``; both kinds dispatch the
+    same events to ``handler`` and so share one rebuild path.
+    """
+
+    config = builder.config
+    backend = getattr(config, "watch_backend", "native")
+    if backend == "polling":
+        return PollingWatcher(
+            config.source_dir,
+            handler,
+            interval=getattr(config, "poll_interval", DEFAULT_POLL_INTERVAL),
+            should_ignore=builder._should_ignore,  # pylint: disable=protected-access
+            ignore_key=lambda: builder._ignore_rules,  # pylint: disable=protected-access
+        )
+
+    from watchdog.observers import Observer  # type: ignore[import]
+
+    observer = Observer()
+    observer.schedule(handler, str(config.source_dir), recursive=True)
+    return observer
@@ -0,0 +1,128 @@
+"""Page weight report: per-page output size by part, site totals and budgets."""
+
+from __future__ import annotations
+
+import json
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from .regions import find_element_spans
+from .utils import format_size
+
+WEIGHT_REPORT_VERSION = 1
+WEIGHT_PARTS = ("content", "navigation", "toc", "css", "js", "other")
+
+logger = logging.getLogger(__name__)
+
+
+class BudgetExceededError(RuntimeError):
+    """Raised after a build whose pages or total size exceed the configured budgets."""
+
+
+def _classify(tag: str, attrs: Dict[str, Optional[str]]) -> Optional[str]:
+    if tag == "style":
+        return "css"
+    if tag == "script":
+        return None if attrs.get("src") else "js"
+    if tag == "article" or attrs.get("data-md2html-live") == "content":
+        return "content"
+    if "data-md2html-toc" in attrs or attrs.get("data-md2html-live") == "toc":
+        return "toc"
+    if tag == "nav":
+        return "navigation"
+    return None
+
+
+@dataclass
+class PageWeight:
+    url: str
+    total: int
+    parts: Dict[str, int]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"url": self.url, "total": self.total, **self.parts}
+
+
+def measure_page(url: str, html: str) -> PageWeight:
+    """Split the UTF-8 size of a rendered page into :data:`WEIGHT_PARTS`.
+
+    Inline ``<style>`` and ``<script>`` count as css/js, ``<article>`` as
+    content, ``<nav>`` as navigation and ``data-md2html-toc`` elements as the
+    TOC; everything else (layout, header, external references) is ``other``.
+    """
+
+    parts = dict.fromkeys(WEIGHT_PARTS, 0)
+    total = len(html.encode("utf-8"))
+    try:
+        spans = find_element_spans(html, _classify)
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.debug("Unable to split %s into parts: %s", url, exc)
+        spans = []
+    for span in spans:
+        parts[span.name] += len(html[span.start:span.end].encode("utf-8"))
+    parts["other"] = total - sum(parts.values())
+    return PageWeight(url, total, parts)
+
+
+def build_weight_report(
+    pages: Iterable[PageWeight],
+    records: Mapping[str, Any],
+    *,
+    page_budget: Optional[int] = None,
+    site_budget: Optional[int] = None,
+) -> Tuple[Dict[str, Any], List[str]]:
+    """Summarise ``pages`` and every output in ``records`` (objects with ``size``).
+
+    Returns the JSON serialisable report and the budget violations, if any.
+    """
+
+    pages = sorted(pages, key=lambda page: (-page.total, page.url))
+    page_urls = {page.url for page in pages}
+    html_total = sum(page.total for page in pages)
+    site_total = sum(record.size for record in records.values())
+    parts = {part: sum(page.parts[part] for page in pages) for part in WEIGHT_PARTS}
+
+    violations: List[str] = []
+    if page_budget is not None:
+        violations.extend(
+            f"{page.url} is {format_size(page.total)}, over the page budget of {format_size(page_budget)}"
+            for page in pages
+            if page.total > page_budget
+        )
+    if site_budget is not None and site_total > site_budget:
+        violations.append(f"The site is {format_size(site_total)}, over the site budget of {format_size(site_budget)}")
+
+    report = {
+        "version": WEIGHT_REPORT_VERSION,
+        "totals": {
+            "pages": len(pages),
+            "html": html_total,
+            "assets": sum(record.size for relative, record in records.items() if relative not in page_urls),
+            "site": site_total,
+            "parts": parts,
+        },
+        "budgets": {"page": page_budget, "site": site_budget},
+        "violations": violations,
+        "pages": [page.as_dict() for page in pages],
+    }
+    return report, violations
+
+
+def log_weight_summary(report: Mapping[str, Any], limit: int = 5) -> None:
+    totals = report["totals"]
+    logger.info(
+        "Page weight: %d pages, %s HTML, %s other outputs",
+        totals["pages"],
+        format_size(totals["html"]),
+        format_size(totals["assets"]),
+    )
+    for page in report["pages"][:limit]:
+        breakdown = ", ".join(f"{part} {format_size(page[part])}" for part in WEIGHT_PARTS if page[part])
+        logger.info("  %s: %s (%s)", page["url"], format_size(page["total"]), breakdown)
+
+
+def write_weight_report(report: Mapping[str, Any], path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
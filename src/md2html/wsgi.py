@@ -0,0 +1,303 @@
+"""WSGI application that renders the docs tree on demand.
+
+Pages are rendered on first request through the same output path mapping as
+a static build and kept in a memory bounded LRU cache validated against the
+mtime and size of the source file and of the files it includes. Static assets are streamed from the source
+tree. Any WSGI server can host :func:`create_app`::
+
+    gunicorn 'md2html.wsgi:create_app("md2html.config.yaml")'
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .cache import LRUCache
+from .config import AppConfig, load_config
+from .converter import SiteBuilder
+from .navigation import Navigation
+from .shards import navigation_fingerprint
+from .theme import Theme, ThemeManager
+
+StartResponse = Callable[..., Any]
+SourceKey = Tuple[int, ...]
+_STREAM_BLOCK_SIZE = 64 * 1024
+# Later pages of a paginated document: ``guide-2.html`` belongs to ``guide.html``.
+_PAGE_PART_URL = re.compile(r"(.+)-\d+\.html")
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CachedPage:
+    source_key: SourceKey
+    body: bytes
+    etag: str
+
+
+class SiteApplication:
+    """Serve a source tree as a site without writing any files.
+
+    The source tree is rescanned at most every ``config.poll_interval``
+    seconds. Pages are only invalidated individually when their source
+    changes; a change to the navigation (added, removed or retitled pages)
+    drops every cached page since each one embeds the sidebar.
+    """
+
+    def __init__(self, config: AppConfig, theme: Optional[Theme] = None) -> None:
+        if theme is None:
+            theme = ThemeManager(config.theme_dirs).load(config.theme)
+        self.config = config
+        self.builder = SiteBuilder(config, theme)
+        self.cache: LRUCache[CachedPage] = LRUCache(
+            max(config.page_cache_size, 1),
+            max_weight=config.page_cache_bytes,
+            weigher=lambda page: len(page.body),
+        )
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.renders = 0
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._scanned_at: Optional[float] = None
+        self._navigation: Optional[Navigation] = None
+        self._navigation_digest: Optional[str] = None
+        self._pages: Dict[str, Path] = {}
+        self._assets: Dict[str, Path] = {}
+        # Page URLs each source rendered to, for the source key they were rendered at.
+        self._page_urls: Dict[Path, Tuple[SourceKey, FrozenSet[str]]] = {}
+
+    def __call__(self, environ: Dict[str, Any], start_response: StartResponse) -> Iterable[bytes]:
+        method = environ.get("REQUEST_METHOD", "GET")
+        if method not in ("GET", "HEAD"):
+            return self._respond(start_response, "405 Method Not Allowed", b"Method not allowed\n", [("Allow", "GET, HEAD")])
+
+        # PEP 3333 hands over the raw path bytes decoded as latin-1.
+        path = environ.get("PATH_INFO", "").encode("latin-1").decode("utf-8", "replace")
+        relative = path.lstrip("/")
+        if not relative or relative.endswith("/"):
+            relative += "index.html"
+
+        try:
+            self.refresh()
+            response = self._serve(relative, environ, start_response, head=method == "HEAD")
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.error("Failed to serve %s: %s", path, exc)
+            return self._respond(start_response, "500 Internal Server Error", b"Internal server error\n")
+        if response is not None:
+            return response
+
+        if f"{relative}/index.html" in self._pages:
+            location = f"{environ.get('SCRIPT_NAME', '')}/{relative}/"
+            return self._respond(start_response, "301 Moved Permanently", b"", [("Location", location)])
+        return self._respond(start_response, "404 Not Found", b"Not found\n")
+
+    def stats(self) -> Dict[str, int]:
+        """Return page cache counters; ``misses`` includes ``stale`` entries."""
+
+        with self._stats_lock:
+            counters = {"hits": self.hits, "misses": self.misses, "stale": self.stale, "renders": self.renders}
+        counters.update(
+            evictions=self.cache.stats.evictions,
+            entries=len(self.cache),
+            bytes=self.cache.weight,
+        )
+        return counters
+
+    def refresh(self, *, force: bool = False) -> None:
+        """Rescan the source tree if ``poll_interval`` elapsed since the last scan."""
+
+        if not force and not self._scan_due():
+            return
+        with self._lock:
+            if not force and not self._scan_due():
+                return
+            entries = self.builder.scan_sources()
+            navigation = self.builder.plan_navigation(entries)
+            pages: Dict[str, Path] = {}
+            assets: Dict[str, Path] = {}
+            for entry in entries:
+                if entry.is_markdown:
+                    url = self.builder.page_url(entry.path)
+                    if url is not None:
+                        pages[url] = entry.path
+                elif self.config.copy_static:
+                    assets[entry.relative.as_posix()] = entry.path
+            digest = navigation_fingerprint(navigation)
+            if self._navigation_digest is not None and digest != self._navigation_digest:
+                logger.info("Navigation changed; dropping %d cached pages", len(self.cache))
+                self.cache.clear()
+                self._page_urls.clear()
+            self._navigation = navigation
+            self._navigation_digest = digest
+            self._pages = pages
+            self._assets = assets
+            self._scanned_at = time.monotonic()
+
+    def _scan_due(self) -> bool:
+        return self._scanned_at is None or time.monotonic() - self._scanned_at >= self.config.poll_interval
+
+    def _serve(
+        self,
+        relative: str,
+        environ: Dict[str, Any],
+        start_response: StartResponse,
+        *,
+        head: bool,
+    ) -> Optional[Iterable[bytes]]:
+        source = self._pages.get(relative) or self._part_source(relative)
+        if source is not None:
+            served = self._page(relative, source)
+            if served is None:
+                return None
+            page, hit = served
+            headers = [
+                ("Content-Type", "text/html; charset=utf-8"),
+                ("ETag", page.etag),
+                ("X-Md2html-Cache", "hit" if hit else "miss"),
+            ]
+            if environ.get("HTTP_IF_NONE_MATCH") == page.etag:
+                return self._respond(start_response, "304 Not Modified", b"", headers)
+            return self._respond(start_response, "200 OK", page.body, headers, head=head)
+
+        asset = self._assets.get(relative)
+        if asset is not None:
+            return self._asset(asset, environ, start_response, head=head)
+        return None
+
+    def _part_source(self, url: str) -> Optional[Path]:
+        # Page parts are only known once their document rendered; this
+        # finds them after a rescan forgot them, or before the first render.
+        match = _PAGE_PART_URL.fullmatch(url)
+        return self._pages.get(f"{match.group(1)}.html") if match else None
+
+    def _page(self, url: str, source: Path) -> Optional[Tuple[CachedPage, bool]]:
+        try:
+            stat = source.stat()
+        except OSError:
+            # Deleted since the last scan.
+            self.refresh(force=True)
+            return None
+        source_key = (stat.st_mtime_ns, stat.st_size, *self._include_key(source))
+        cached = self.cache.get(url)
+        if cached is not None and cached.source_key == source_key:
+            self._count(hits=1)
+            return cached, True
+        known = self._page_urls.get(source)
+        if known is not None and known[0] == source_key and url not in known[1]:
+            # A page number past the end of an unchanged document.
+            return None
+
+        page: Optional[CachedPage] = None
+        # Caching under the same lock as the render keeps a concurrent refresh()
+        # from clearing the cache for a new navigation in between, which would
+        # let this page come back with the old sidebar.
+        with self._lock:
+            navigation = self._navigation
+            assert navigation is not None
+            result = self.builder.render_page(source, navigation)
+            # The render may have discovered (new) includes of this page.
+            source_key = (stat.st_mtime_ns, stat.st_size, *self._include_key(source))
+            # Every page of a paginated document comes out of the same render.
+            for rendered in (result, *result.parts):
+                body = rendered.html.encode("utf-8")
+                entry = CachedPage(source_key, body, f'"{hashlib.sha1(body).hexdigest()}"')
+                self.cache.put(rendered.url, entry)
+                self._pages.setdefault(rendered.url, source)
+                if rendered.url == url:
+                    page = entry
+            self._page_urls[source] = (source_key, frozenset(rendered.url for rendered in (result, *result.parts)))
+        self._count(misses=1, stale=int(cached is not None), renders=1)
+        if page is None:
+            return None
+        logger.debug("Rendered %s on demand (%d bytes)", url, len(page.body))
+        return page, False
+
+    def _include_key(self, source: Path) -> Iterator[int]:
+        # Pages are also stale when a file they include or an image they show changed.
+        builder = self.builder
+        for path in sorted(builder.include_graph.dependencies(source) | builder.image_graph.dependencies(source)):
+            try:
+                stat = path.stat()
+            except OSError:
+                yield from (0, -1)
+                continue
+            yield from (stat.st_mtime_ns, stat.st_size)
+
+    def _count(self, **counters: int) -> None:
+        with self._stats_lock:
+            for name, value in counters.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def _asset(
+        self,
+        path: Path,
+        environ: Dict[str, Any],
+        start_response: StartResponse,
+        *,
+        head: bool,
+    ) -> Optional[Iterable[bytes]]:
+        try:
+            handle = path.open("rb")
+        except OSError:
+            return None
+        size = os.fstat(handle.fileno()).st_size
+        content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        start_response("200 OK", [("Content-Type", content_type), ("Content-Length", str(size))])
+        if head:
+            handle.close()
+            return [b""]
+        file_wrapper = environ.get("wsgi.file_wrapper")
+        if file_wrapper is not None:
+            return file_wrapper(handle, _STREAM_BLOCK_SIZE)
+        return _iter_file(handle)
+
+    @staticmethod
+    def _respond(
+        start_response: StartResponse,
+        status: str,
+        body: bytes,
+        headers: Optional[List[Tuple[str, str]]] = None,
+        *,
+        head: bool = False,
+    ) -> List[bytes]:
+        headers = list(headers or [])
+        if not any(name == "Content-Type" for name, _ in headers):
+            headers.append(("Content-Type", "text/plain; charset=utf-8"))
+        headers.append(("Content-Length", str(len(body))))
+        start_response(status, headers)
+        return [b"" if head else body]
+
+
+def _iter_file(handle: Any) -> Iterable[bytes]:
+    with handle:
+        while True:
+            block = handle.read(_STREAM_BLOCK_SIZE)
+            if not block:
+                break
+            yield block
+
+
+def create_app(config_path: Union[str, os.PathLike[str], None] = None, **settings: Any) -> SiteApplication:
+    """Build a :class:`SiteApplication` from a configuration file and overrides.
+
+    ``settings`` use the configuration file keys, e.g. ``source_dir="docs"``.
+    """
+
+    config = AppConfig()
+    if config_path is not None:
+        path = Path(config_path).resolve()
+        config.apply_updates(load_config(path), base_path=path.parent)
+        config.config_path = path
+    config.apply_updates(settings)
+    return SiteApplication(config)
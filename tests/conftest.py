@@ -0,0 +1,17 @@
+import pytest  # type: ignore[import]
+
+from md2html.config import AppConfig
+from md2html.converter import SiteBuilder
+from md2html.theme import ThemeManager
+
+
+@pytest.fixture
+def make_builder():
+    """Return a factory for github themed site builders; keyword arguments are configuration keys."""
+
+    def _make_builder(**settings):
+        config = AppConfig()
+        config.apply_updates(settings)
+        return SiteBuilder(config, ThemeManager().load("github"))
+
+    return _make_builder
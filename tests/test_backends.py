@@ -0,0 +1,87 @@
+from pathlib import Path
+
+import pytest  # type: ignore[import]
+
+from md2html.backends import BackendUnavailableError, compare_backends, main, split_containers
+from md2html.converter import MarkdownRenderer
+from md2html.includes import is_partial
+from md2html.limits import DocumentLimitError
+from md2html.theme import ThemeManager
+
+CORPUS = Path(__file__).parent / "backend_corpus"
+
+
+def _corpus():
+    return {
+        path.name: path.read_text(encoding="utf-8") for path in sorted(CORPUS.glob("*.md")) if not is_partial(path)
+    }
+
+
+def test_container_splitting_follows_the_container_rule():
+    lines = "Intro\n::: note\nbody\n:::\n```\n::: note\n```\n::: unknown\n".splitlines(keepends=True)
+    segments = split_containers(lines, {"note": lambda params, markup: params.strip() == "note"})
+    assert [type(segment).__name__ for segment in segments] == ["_Text", "_Container", "_Text"]
+    container = segments[1]
+    assert (container.name, container.line) == ("note", 1)
+    assert container.children[0].lines == ["body\n"]
+    # Markers inside a top-level fence and unknown keywords stay plain text.
+    assert segments[2].lines == lines[4:] and segments[2].first_line == 4
+
+
+def test_cmark_gfm_matches_markdown_it_on_the_corpus():
+    pytest.importorskip("cmarkgfm")
+    corpus = _corpus()
+    comparison = compare_backends(corpus, ["markdown-it", "cmark-gfm"], theme=ThemeManager().load("github"), root=CORPUS)
+    assert comparison.documents == len(corpus)
+    assert comparison.differences == {}, "".join(
+        line for diff in comparison.differences.get("cmark-gfm", {}).values() for line in diff
+    )
+
+
+@pytest.mark.parametrize("options", [{}, {"exclude_hide": True}, {"defer_hide_threshold": 1}])
+def test_cmark_gfm_keeps_toc_metadata_and_hide_options(options):
+    pytest.importorskip("cmarkgfm")
+    theme = ThemeManager().load("github")
+    for name, text in _corpus().items():
+        expected = MarkdownRenderer(theme, include_root=CORPUS, **options).render_fragment(text, source_path=CORPUS / name)
+        actual = MarkdownRenderer(theme, markdown_backend="cmark-gfm", include_root=CORPUS, **options).render_fragment(
+            text, source_path=CORPUS / name
+        )
+        assert actual == expected, name
+
+
+def test_cmark_gfm_enforces_the_nesting_limit():
+    pytest.importorskip("cmarkgfm")
+    renderer = MarkdownRenderer(ThemeManager().load("github"), markdown_backend="cmark-gfm", max_nesting=8)
+    with pytest.raises(DocumentLimitError):
+        renderer.render_fragment("> " * 12 + "deep\n", source_path=Path("deep.md"))
+
+
+def test_emphasis_after_full_width_punctuation_is_a_known_difference():
+    # cmark-gfm treats `**` between full-width brackets and CJK text as
+    # flanking differently from markdown-it; the README documents this.
+    pytest.importorskip("cmarkgfm")
+    theme = ThemeManager().load("github")
+    text = "分为**新生代（Young）**和**老年代（Old）**，后文\n"
+    comparison = compare_backends({"cjk.md": text}, ["markdown-it", "cmark-gfm"], theme=theme)
+    assert list(comparison.differences["cmark-gfm"]) == ["cjk.md"]
+    assert "<strong>新生代（Young）和老年代（Old）</strong>" in "".join(comparison.differences["cmark-gfm"]["cjk.md"])
+
+
+def test_unknown_or_missing_backend_is_reported():
+    theme = ThemeManager().load("github")
+    with pytest.raises(ValueError, match="Unknown Markdown backend"):
+        MarkdownRenderer(theme, markdown_backend="pandoc")
+    try:
+        import cmarkgfm  # noqa: F401  # type: ignore[import]
+    except ImportError:
+        with pytest.raises(BackendUnavailableError, match="optional 'cmarkgfm' package"):
+            MarkdownRenderer(theme, markdown_backend="cmark-gfm")
+
+
+def test_compare_backends_command(tmp_path, capsys):
+    source_dir = tmp_path / "docs"
+    source_dir.mkdir()
+    (source_dir / "index.md").write_text("# Home\n\n- [x] done\n", encoding="utf-8")
+    assert main(["--src", str(source_dir), "--backend", "markdown-it", "--backend", "markdown-it"]) == 0
+    assert "markdown-it" in capsys.readouterr().out
@@ -0,0 +1,61 @@
+import socket
+import stat
+
+import pytest  # type: ignore[import]
+
+from md2html.daemon import BuildDaemon, _request, forward_build
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="requires Unix domain sockets")
+
+
+def test_forward_build_returns_none_without_daemon(tmp_path):
+    assert forward_build(["--src", "docs"], tmp_path / "missing.sock") is None
+
+
+def test_daemon_builds_and_reuses_warm_builder(tmp_path, monkeypatch, capsys):
+    source_dir = tmp_path / "docs"
+    source_dir.mkdir()
+    (source_dir / "page.md").write_text("# Page\n\n正文\n", encoding="utf-8")
+    output_dir = tmp_path / "site"
+    socket_path = tmp_path / "d.sock"
+    monkeypatch.chdir(tmp_path)
+
+    daemon = BuildDaemon(socket_path)
+    thread = daemon.start_background()
+    try:
+        assert stat.S_IMODE(socket_path.stat().st_mode) == 0o600
+        assert [path.name for path in tmp_path.iterdir() if path.name.startswith(".md2html-")] == []
+        argv = ["--src", "docs", "--dst", "site", "--config", "missing.yaml"]
+        assert forward_build(argv, socket_path) == 0
+        assert (output_dir / "page.html").exists()
+
+        assert forward_build(argv, socket_path) == 0
+        assert daemon.builds == 2
+        (builder, _), = daemon._builders.values()
+        assert builder.fragment_cache.stats.hits == 1
+        assert "Generated" in capsys.readouterr().err
+        (reply,) = _request(socket_path, {"command": "metrics"})
+        assert "md2html_builds_total 2" in reply["metrics"]
+        assert 'md2html_pages_total{result="skipped"} 1' in reply["metrics"]
+    finally:
+        daemon.shutdown()
+        thread.join(timeout=5)
+
+    assert not socket_path.exists()
+
+
+def test_daemon_declines_builds_that_watch(tmp_path, monkeypatch):
+    (tmp_path / "docs").mkdir()
+    (tmp_path / "md2html.config.yaml").write_text("watch: true\n", encoding="utf-8")
+    socket_path = tmp_path / "d.sock"
+    monkeypatch.chdir(tmp_path)
+
+    daemon = BuildDaemon(socket_path)
+    thread = daemon.start_background()
+    try:
+        # None makes the CLI build, and watch, in-process.
+        assert forward_build(["--config", "md2html.config.yaml"], socket_path) is None
+        assert daemon.builds == 0
+    finally:
+        daemon.shutdown()
+        thread.join(timeout=5)
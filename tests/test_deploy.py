@@ -0,0 +1,77 @@
+import json
+import subprocess
+
+import pytest  # type: ignore[import]
+
+from md2html.deploy import deploy_site
+from md2html.manifest import BUILD_MANIFEST_NAME
+
+
+@pytest.fixture
+def git_env(monkeypatch):
+    for key, value in {
+        "GIT_AUTHOR_NAME": "md2html",
+        "GIT_AUTHOR_EMAIL": "md2html@example.com",
+        "GIT_COMMITTER_NAME": "md2html",
+        "GIT_COMMITTER_EMAIL": "md2html@example.com",
+    }.items():
+        monkeypatch.setenv(key, value)
+
+
+def _git(repo, *args):
+    return subprocess.run(["git", "--git-dir", str(repo), *args], check=True, capture_output=True, text=True).stdout
+
+
+def test_build_manifest_reports_changes(tmp_path, make_builder):
+    source_dir = tmp_path / "docs"
+    source_dir.mkdir()
+    (source_dir / "a.md").write_text("# A\n", encoding="utf-8")
+    (source_dir / "b.md").write_text("# B\n", encoding="utf-8")
+    output_dir = tmp_path / "site"
+
+    first = make_builder(source_dir=source_dir, output_dir=output_dir)
+    first.build_all()
+    assert first.last_changes.added == ["a.html", "b.html"]
+
+    (source_dir / "b.md").unlink()
+    (source_dir / "c.md").write_text("# C\n", encoding="utf-8")
+    (source_dir / "a.md").write_text("# A\n\nEdited.\n", encoding="utf-8")
+    second = make_builder(source_dir=source_dir, output_dir=output_dir)
+    second.build_all()
+    manifest = json.loads((output_dir / BUILD_MANIFEST_NAME).read_text("utf-8"))
+    assert manifest["changes"]["added"] == ["c.html"]
+    assert manifest["changes"]["deleted"] == ["b.html"]
+    assert second.last_changes.changed == ["a.html"]
+
+
+def test_deploy_to_bare_repo_is_incremental(tmp_path, git_env, make_builder):
+    repo = tmp_path / "pages.git"
+    subprocess.run(["git", "init", "--bare", "-q", str(repo)], check=True)
+    source_dir = tmp_path / "docs"
+    (source_dir / "img").mkdir(parents=True)
+    (source_dir / "index.md").write_text("# Home\n", encoding="utf-8")
+    (source_dir / "img" / "logo.png").write_bytes(b"\x89PNG")
+    output_dir = tmp_path / "site"
+
+    make_builder(source_dir=source_dir, output_dir=output_dir).build_all()
+    first = deploy_site(output_dir, repo, cname="docs.example.com")
+    assert first.commit and not first.incremental
+    assert set(_git(repo, "ls-tree", "-r", "--name-only", "gh-pages").split()) == {
+        ".nojekyll",
+        "CNAME",
+        BUILD_MANIFEST_NAME,
+        "img/logo.png",
+        "index.html",
+    }
+
+    (source_dir / "img" / "logo.png").unlink()
+    (source_dir / "index.md").write_text("# Home\n\nUpdated.\n", encoding="utf-8")
+    make_builder(source_dir=source_dir, output_dir=output_dir).build_all()
+    second = deploy_site(output_dir, repo, cname="docs.example.com")
+    assert second.incremental
+    assert second.changes.changed == ["index.html"] and second.changes.deleted == ["img/logo.png"]
+    assert _git(repo, "rev-parse", "gh-pages^").strip() == first.commit
+    assert "Updated." in _git(repo, "show", "gh-pages:index.html")
+    assert "img/logo.png" not in _git(repo, "ls-tree", "-r", "--name-only", "gh-pages")
+
+    assert deploy_site(output_dir, repo, cname="docs.example.com").commit is None
@@ -0,0 +1,52 @@
+import json
+
+from md2html.config import AppConfig
+from md2html.converter import _WatchHandler
+from md2html.devserver import DevServer, split_live_regions
+
+
+def _events(client):
+    events = []
+    while not client.stream.empty():
+        lines = client.stream.get().strip().splitlines()
+        name = lines[0].split(": ", 1)[1]
+        events.append((name, "\n".join(line[6:] for line in lines[1:])))
+    return events
+
+
+def test_split_live_regions_ignores_content_changes():
+    page = '<main><article data-md2html-live="content"><div>{}</div></article><div data-md2html-live="toc">{}</div></main>'
+    first = split_live_regions(page.format("one", "a"))
+    second = split_live_regions(page.format("two <div>nested</div>", "b"))
+    assert first[0] == second[0]
+    assert second[1] == {"content": "<div>two <div>nested</div></div>", "toc": "b"}
+    assert split_live_regions("<article>no markers</article>") is None
+
+
+def test_content_edit_is_patched_and_title_edit_reloads(tmp_path):
+    source_dir = tmp_path / "docs"
+    (source_dir / "guide").mkdir(parents=True)
+    page = source_dir / "guide" / "page.md"
+    page.write_text("# Page\n\n## Intro\n\nFirst draft.\n", encoding="utf-8")
+    (source_dir / "guide" / "other.md").write_text("# Other\n", encoding="utf-8")
+    config = AppConfig()
+    config.apply_updates({"source_dir": source_dir, "output_dir": tmp_path / "build"})
+    server = DevServer(config, host="127.0.0.1", port=0, open_browser=False)
+    server.builder.build_all()
+    viewer = server._register_client("/guide/page.html")
+    bystander = server._register_client("/guide/other.html")
+    handler = _WatchHandler(server.builder, on_rebuild=server._on_rebuild)
+
+    page.write_text("# Page\n\n## Intro\n\nSecond draft.\n\n## Details\n", encoding="utf-8")
+    handler._handle_event(type("Event", (), {"is_directory": False, "src_path": str(page)})())
+    (event, data), = _events(viewer)
+    assert event == "patch"
+    patch = json.loads(data)
+    assert "Second draft." in patch["content"] and 'data-toc-slug="details"' in patch["toc"]
+    assert _events(bystander) == []
+
+    # A new title changes the navigation of every page in the section, so both reload.
+    page.write_text("# Renamed\n\nSecond draft.\n", encoding="utf-8")
+    handler._handle_event(type("Event", (), {"is_directory": False, "src_path": str(page)})())
+    assert [event for event, _ in _events(viewer)] == ["reload"]
+    assert [event for event, _ in _events(bystander)] == ["reload"]
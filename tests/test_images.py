@@ -0,0 +1,124 @@
+import os
+import struct
+import zlib
+from wsgiref.util import setup_testing_defaults
+
+from md2html.images import IMAGE_CACHE_NAME, image_size
+from md2html.wsgi import create_app
+
+
+def _png(width, height):
+    header = struct.pack(">II5B", width, height, 8, 6, 0, 0, 0)
+    chunk = b"IHDR" + header
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I", len(header)) + chunk + struct.pack(">I", zlib.crc32(chunk))
+
+
+def _jpeg(width, height, orientation=None):
+    data = b"\xff\xd8"
+    if orientation is not None:
+        tiff = b"MM\x00\x2a" + struct.pack(">I", 8) + struct.pack(">H", 1)
+        tiff += struct.pack(">HHIHH", 0x0112, 3, 1, orientation, 0) + b"\0\0\0\0"
+        app1 = b"Exif\0\0" + tiff
+        data += b"\xff\xe1" + struct.pack(">H", len(app1) + 2) + app1
+    frame = struct.pack(">BHHB", 8, height, width, 3) + b"\x01\x11\x00" * 3
+    return data + b"\xff\xc0" + struct.pack(">H", len(frame) + 2) + frame + b"\xff\xd9"
+
+
+def test_image_size_reads_common_headers():
+    assert image_size(_png(640, 480)) == (640, 480)
+    assert image_size(b"GIF89a" + struct.pack("<HH", 12, 34) + b"\0" * 8) == (12, 34)
+    assert image_size(_jpeg(300, 200)) == (300, 200)
+    assert image_size(_jpeg(300, 200, orientation=6)) == (200, 300)
+    vp8l = b"RIFF\0\0\0\0WEBPVP8L\0\0\0\0\x2f" + struct.pack("<I", (99 << 14) | 49)
+    assert image_size(vp8l) == (50, 100)
+    assert image_size(b'<?xml version="1.0"?><svg width="24px" height="16" viewBox="0 0 48 32">') == (24, 16)
+    assert image_size(b'<svg width="100%" viewBox="0 0 48 32"></svg>') == (48, 32)
+    assert image_size(b"not an image") is None
+
+
+def test_pages_get_sizes_and_lazy_loading(tmp_path, make_builder):
+    source_dir = tmp_path / "docs"
+    (source_dir / "guide" / "img").mkdir(parents=True)
+    (source_dir / "guide" / "img" / "chart.png").write_bytes(_png(320, 240))
+    (source_dir / "logo.gif").write_bytes(b"GIF87a" + struct.pack("<HH", 16, 16) + b"\0" * 8)
+    (source_dir / "guide" / "page.md").write_text(
+        "# Page\n\n![chart](img/chart.png) ![logo](/logo.gif) ![remote](https://example.com/a.png)\n\n"
+        '<img src="img/chart.png" width="10" loading="eager">\n\n![escape](../../outside.png)\n',
+        encoding="utf-8",
+    )
+    html = make_builder(source_dir=source_dir, output_dir=tmp_path / "site").build_all()[0].html
+    assert 'alt="chart" width="320" height="240" loading="lazy" decoding="async"' in html
+    assert 'alt="logo" width="16" height="16" loading="lazy"' in html
+    assert 'alt="remote" loading="lazy" decoding="async"' in html
+    assert '<img src="img/chart.png" width="10" loading="eager" decoding="async">' in html
+    assert 'alt="escape" loading="lazy"' in html
+
+    plain = make_builder(source_dir=source_dir, output_dir=tmp_path / "plain", lazy_images=False)
+    assert 'loading="lazy"' not in plain.build_all()[0].html
+
+
+def test_sizes_persist_between_builds_until_an_image_changes(tmp_path, make_builder):
+    source_dir = tmp_path / "docs"
+    source_dir.mkdir()
+    image = source_dir / "a.png"
+    image.write_bytes(_png(10, 20))
+    (source_dir / "copy.png").write_bytes(_png(10, 20))
+    (source_dir / "index.md").write_text("# Index\n\n![a](a.png) ![b](copy.png)\n", encoding="utf-8")
+
+    def build():
+        builder = make_builder(source_dir=source_dir, output_dir=tmp_path / "site")
+        return builder, builder.build_all()[0].html
+
+    builder, html = build()
+    # Identical content is parsed once.
+    assert builder.image_sizer.reads == 1 and 'width="10" height="20"' in html
+    assert (tmp_path / "site" / IMAGE_CACHE_NAME).is_file()
+
+    builder, html = build()
+    assert builder.image_sizer.reads == 0 and 'alt="b" width="10" height="20"' in html
+
+    image.write_bytes(_png(30, 40))
+    os.utime(image, ns=(1, 1))
+    builder, html = build()
+    assert builder.image_sizer.reads == 1 and 'alt="a" width="30" height="40"' in html
+
+
+def test_changed_images_re_render_the_pages_that_show_them(tmp_path, make_builder):
+    source_dir = tmp_path / "docs"
+    source_dir.mkdir()
+    image = source_dir / "a.png"
+    image.write_bytes(_png(10, 20))
+    (source_dir / "other.png").write_bytes(_png(1, 1))
+    (source_dir / "index.md").write_text("# Index\n\n![a](a.png)\n", encoding="utf-8")
+    builder = make_builder(source_dir=source_dir, output_dir=tmp_path / "site")
+    builder.build_all()
+    index = tmp_path / "site" / "index.html"
+    assert 'width="10" height="20"' in index.read_text(encoding="utf-8")
+
+    image.write_bytes(_png(300, 400))
+    os.utime(image, ns=(1, 1))
+    builder.rebuild_path(image)
+    assert 'width="300" height="400"' in index.read_text(encoding="utf-8")
+    assert image.read_bytes() == (tmp_path / "site" / "a.png").read_bytes()
+
+    # Images no page shows are only copied.
+    os.utime(index, ns=(3, 3))
+    builder.rebuild_path(source_dir / "other.png")
+    assert (tmp_path / "site" / "other.png").is_file() and index.stat().st_mtime_ns == 3
+
+    app = create_app(source_dir=source_dir, poll_interval=60)
+    environ = {"PATH_INFO": "/index.html"}
+    setup_testing_defaults(environ)
+    headers = {}
+
+    def get():
+        body = b"".join(app(dict(environ), lambda status, response: headers.update(response)))
+        return headers["X-Md2html-Cache"], body.decode("utf-8")
+
+    cache, html = get()
+    assert cache == "miss" and 'width="300" height="400"' in html
+    assert get()[0] == "hit"
+    image.write_bytes(_png(50, 60))
+    os.utime(image, ns=(2, 2))
+    cache, html = get()
+    assert cache == "miss" and 'width="50" height="60"' in html
@@ -0,0 +1,91 @@
+import os
+from wsgiref.util import setup_testing_defaults
+
+from md2html.wsgi import create_app
+
+SNIPPET = "## JVM flags\n\n`-Xmx4g`\n\n## MySQL settings\n\n`innodb_buffer_pool_size = 8G`\n\n### Details\n\nMore.\n"
+
+
+def _make_sources(tmp_path, pages):
+    source_dir = tmp_path / "docs"
+    (source_dir / "ops").mkdir(parents=True)
+    (source_dir / "_settings.md").write_text(SNIPPET, encoding="utf-8")
+    for name, text in pages.items():
+        (source_dir / name).write_text(text, encoding="utf-8")
+    return source_dir
+
+
+def test_includes_splice_files_and_sections(tmp_path, make_builder):
+    pages = {f"ops/page{index}.md": f"# Page {index}\n\n!include /_settings.md#jvm-flags\n" for index in range(20)}
+    pages["mysql.md"] = "# MySQL\n\n::: note\n!include _settings.md#MySQL settings\n:::\n"
+    pages["plain.md"] = "# Plain\n"
+    source_dir = _make_sources(tmp_path, pages)
+    builder = make_builder(source_dir=source_dir, output_dir=tmp_path / "site")
+
+    results = {result.url: result for result in builder.build_all()}
+    assert "settings.html" not in results and "-settings.html" not in results  # partials are not pages
+    assert "<code>-Xmx4g</code>" in results["ops/page7.html"].html
+    assert "innodb" not in results["ops/page7.html"].html
+    mysql = results["mysql.html"]
+    assert [entry["title"] for entry in mysql.toc] == ["MySQL", "MySQL settings", "Details"]
+    assert "JVM flags" not in mysql.html
+    # One parse per distinct snippet, however many pages include it.
+    assert builder.include_cache.stats.misses == 1
+    assert builder.include_graph.dependents(source_dir / "_settings.md") == {
+        source_dir / name for name in pages if name != "plain.md"
+    }
+
+
+def test_editing_a_snippet_rerenders_only_its_dependents(tmp_path, make_builder):
+    source_dir = _make_sources(tmp_path, {"a.md": "# A\n!include _settings.md\n", "b.md": "# B\n", "c.md": "# C\n"})
+    builder = make_builder(source_dir=source_dir, output_dir=tmp_path / "site")
+    builder.build_all()
+    misses = builder.fragment_cache.stats.misses
+
+    (source_dir / "_unused.md").write_text("# Unused\n", encoding="utf-8")
+    builder.rebuild_path(source_dir / "_unused.md")
+    assert builder.fragment_cache.stats.misses == misses  # nothing includes it: no build at all
+
+    (source_dir / "_settings.md").write_text(SNIPPET.replace("4g", "8g"), encoding="utf-8")
+    builder.rebuild_path(source_dir / "_settings.md")
+    assert builder.fragment_cache.stats.misses == misses + 1
+    assert builder.last_changes.changed == ["a.html"]
+    assert "-Xmx8g" in (tmp_path / "site" / "a.html").read_text(encoding="utf-8")
+
+
+def test_broken_includes_become_error_pages(tmp_path, make_builder):
+    source_dir = _make_sources(
+        tmp_path,
+        {
+            "missing.md": "# Missing\n!include _nowhere.md\n",
+            "cycle.md": "# Cycle\n!include cycle.md\n",
+            "section.md": "# Section\n!include _settings.md#nope\n",
+            "escape.md": "# Escape\n!include ../../etc/passwd.md\n",
+            "fenced.md": "# Fenced\n\n```\n!include _nowhere.md\n```\n",
+        },
+    )
+    builder = make_builder(source_dir=source_dir, output_dir=tmp_path / "site")
+    errors = {result.url: result.error for result in builder.build_all() if result.error}
+    assert set(errors) == {"missing.html", "cycle.html", "section.html", "escape.html"}
+    assert "cycle cycle.md -> cycle.md" in errors["cycle.html"]
+    assert "no section 'nope'" in errors["section.html"]
+    assert "outside the source directory" in errors["escape.html"]
+
+
+def test_wsgi_pages_revalidate_against_their_includes(tmp_path):
+    source_dir = _make_sources(tmp_path, {"a.md": "# A\n!include _settings.md#jvm-flags\n"})
+    app = create_app(source_dir=source_dir, poll_interval=60)
+    environ = {"PATH_INFO": "/a.html"}
+    setup_testing_defaults(environ)
+    headers = {}
+
+    def get():
+        body = b"".join(app(dict(environ), lambda status, response: headers.update(response)))
+        return headers["X-Md2html-Cache"], body.decode("utf-8")
+
+    assert get()[0] == "miss" and get()[0] == "hit"
+    snippet = source_dir / "_settings.md"
+    snippet.write_text(SNIPPET.replace("4g", "16g"), encoding="utf-8")
+    os.utime(snippet, ns=(0, 10**9))
+    state, body = get()
+    assert state == "miss" and "-Xmx16g" in body
@@ -0,0 +1,111 @@
+import functools
+import operator
+import time
+
+import pytest  # type: ignore[import]
+
+from md2html import converter
+from md2html.cli import main
+from md2html.config import AppConfig
+from md2html.converter import _first_heading, build_variants
+from md2html.limits import DocumentLimitError, run_isolated
+
+PATHOLOGICAL = {
+    "blank-lines.md": "\n" * 300_000 + "# Late\n",
+    "long-heading.md": "# x" + " " * 200_000 + "x\n",
+    "deep-quote.md": ">" * 5000 + " lost\n",
+    "deep-list.md": "".join("  " * depth + "- item\n" for depth in range(200)),
+    "unclosed-front-matter.md": "---\n" + "key: value\n" * 50_000,
+    "long-fence.md": "---" + "-" * 100_000 + "\n",
+    "bad-front-matter.md": "---\ntitle: [unclosed\n---\n\n# Body\n",
+    "brackets.md": "[" * 50_000 + "x" + "]" * 50_000 + "\n",
+}
+
+
+def test_pathological_documents_become_error_pages(tmp_path, make_builder):
+    source_dir = tmp_path / "docs"
+    source_dir.mkdir()
+    (source_dir / "index.md").write_text("# Home\n\nFine.\n", encoding="utf-8")
+    for name, text in PATHOLOGICAL.items():
+        (source_dir / name).write_text(text, encoding="utf-8")
+    (source_dir / "huge.md").write_text("# Huge\n\n" + "word " * 300_000, encoding="utf-8")
+    (source_dir / "latin1.md").write_bytes("# Café\n".encode("latin-1"))
+    builder = make_builder(
+        source_dir=source_dir, output_dir=tmp_path / "site", max_document_size="1MB", render_timeout=20
+    )
+
+    started = time.perf_counter()
+    results = builder.build_all()
+    assert time.perf_counter() - started < 30
+
+    errors = {result.url: result.error for result in results if result.error}
+    assert set(errors) == {"bad-front-matter.html", "deep-quote.html", "deep-list.html", "huge.html", "latin1.html"}
+    assert "over the document size limit" in errors["huge.html"]
+    assert "nesting" in errors["deep-quote.html"]
+    for url in errors:
+        assert "data-md2html-error" in (tmp_path / "site" / url).read_text(encoding="utf-8")
+    index = (tmp_path / "site" / "index.html").read_text(encoding="utf-8")
+    assert "Fine." in index and "data-md2html-error" not in index
+    assert "Late" in (tmp_path / "site" / "blank-lines.html").read_text(encoding="utf-8")
+
+
+def test_isolated_renders_use_the_fragment_cache_and_shared_parse(tmp_path, monkeypatch, make_builder):
+    source_dir = tmp_path / "docs"
+    source_dir.mkdir()
+    (source_dir / "large.md").write_text("# Large\n\n" + "word " * 60_000 + "\n", encoding="utf-8")
+    workers = []
+
+    def counting_run_isolated(function, timeout, *, label):
+        workers.append(function)
+        return run_isolated(function, timeout, label=label)
+
+    monkeypatch.setattr(converter, "run_isolated", counting_run_isolated)
+    builder = make_builder(source_dir=source_dir, output_dir=tmp_path / "site")
+    first = builder.build_all()[0].html
+    assert len(workers) == 1 and builder.fragment_cache.stats.misses == 1
+    # A rebuild, e.g. in watch mode, reuses the fragment without starting a worker.
+    assert builder.build_all()[0].html == first
+    assert len(workers) == 1 and builder.fragment_cache.stats.hits == 1
+
+    workers.clear()
+    config = AppConfig()
+    config.apply_updates(
+        {
+            "source_dir": source_dir,
+            "output_dir": tmp_path / "full",
+            "variants": [{"name": "full"}, {"name": "hide", "output_dir": tmp_path / "hide", "exclude_hide": True}],
+        }
+    )
+    assert [result.error for result in build_variants(config)] == [None, None]
+    # The second variant's worker renders from the parse the first one sent back.
+    assert [worker._parsed is not None for worker in workers] == [False, True]
+
+
+def test_cli_fails_after_writing_error_pages(tmp_path):
+    source_dir = tmp_path / "docs"
+    source_dir.mkdir()
+    (source_dir / "index.md").write_text("# Home\n", encoding="utf-8")
+    (source_dir / "deep.md").write_text("> " * 30 + "x\n", encoding="utf-8")
+    arguments = ["--src", str(source_dir), "--dst", str(tmp_path / "site")]
+
+    assert main(arguments) == 1
+    assert (tmp_path / "site" / "index.html").exists()
+    assert main(arguments + ["--max-nesting-depth", "64"]) == 0
+
+
+def test_run_isolated_kills_slow_workers():
+    started = time.perf_counter()
+    with pytest.raises(DocumentLimitError, match="longer than 0.5s"):
+        run_isolated(functools.partial(time.sleep, 30), 0.5, label="slow.md")
+    assert time.perf_counter() - started < 5
+
+    with pytest.raises(KeyError):
+        run_isolated(functools.partial(operator.getitem, {}, "missing"), 5, label="broken.md")
+    assert run_isolated(functools.partial(operator.mul, 6, 7), 5, label="fine.md") == 42
+
+
+def test_title_extraction_is_linear():
+    started = time.perf_counter()
+    assert _first_heading("\n" * 200_000 + "## Found ##\n") == "Found"
+    assert _first_heading("# a" + " " * 200_000 + "b #\n").endswith("b")
+    assert time.perf_counter() - started < 1
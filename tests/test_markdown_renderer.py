@@ -2,6 +2,7 @@ from pathlib import Path
 
 import pytest  # type: ignore[import]
 
+from md2html.cache import LRUCache
 from md2html.converter import MarkdownRenderer
 from md2html.theme import ThemeManager
 from md2html.utils import parse_front_matter, slugify
@@ -40,6 +41,38 @@ def test_hide_container_shorthand_without_keyword(renderer: MarkdownRenderer) ->
     assert "data-md2html-hide-collapse" in result.html
 
 
+def test_large_hide_bodies_are_deferred() -> None:
+    theme = ThemeManager().load("github")
+    markdown = """::: hide 小
+
+短内容
+:::
+
+::: hide 大
+
+## 长标题
+
+""" + "很长的内容。" * 400 + """
+
+::: hide 内层
+
+内层内容
+:::
+:::
+"""
+    eager = MarkdownRenderer(theme).render_fragment(markdown, source_path=Path("doc.md"))
+    deferred = MarkdownRenderer(theme, defer_hide_threshold=1024).render_fragment(markdown, source_path=Path("doc.md"))
+
+    assert deferred.html.count("<template data-md2html-hide-body>") == 1
+    body = deferred.html.split('<template data-md2html-hide-body>\n', 1)[1]
+    assert body.startswith('<h2 id="长标题">')
+    assert deferred.html.replace("<template data-md2html-hide-body>\n", "").replace("</template>\n", "") == eager.html
+    assert deferred.toc == eager.toc
+    assert MarkdownRenderer(theme, defer_hide_threshold=0).render_fragment(markdown, source_path=Path("doc.md")).html.count(
+        "<template data-md2html-hide-body>"
+    ) == 3
+
+
 def test_note_container_renders_admonition(renderer: MarkdownRenderer) -> None:
     markdown = """::: note 提示
 内容
@@ -70,3 +103,43 @@ def test_table_markdown_renders_table(renderer: MarkdownRenderer) -> None:
     result = renderer.render(markdown, source_path=Path("table.md"))
     assert "<table" in result.html
     assert "<td" in result.html
+
+
+def test_fragment_cache_reuses_parsed_body() -> None:
+    theme = ThemeManager().load("github")
+    cache = LRUCache(8)
+    renderer = MarkdownRenderer(theme, fragment_cache=cache)
+    markdown = "# 标题\n\n正文\n"
+
+    first = renderer.render(markdown, source_path=Path("a.md"))
+    second = renderer.render(markdown, source_path=Path("b.md"))
+
+    assert cache.stats.misses == 1
+    assert cache.stats.hits == 1
+    assert first.html == second.html
+
+    hiding = MarkdownRenderer(theme, exclude_hide=True, fragment_cache=cache)
+    hiding.render(markdown, source_path=Path("a.md"))
+    assert cache.stats.misses == 2
+
+
+def test_fragment_title_falls_back_to_source_name() -> None:
+    theme = ThemeManager().load("github")
+    renderer = MarkdownRenderer(theme, fragment_cache=LRUCache(8))
+
+    first = renderer.render_fragment("正文\n", source_path=Path("first-page.md"))
+    second = renderer.render_fragment("正文\n", source_path=Path("second_page.md"))
+
+    assert first.metadata["title"] == "first page"
+    assert second.metadata["title"] == "second page"
+
+
+def test_lru_cache_evicts_least_recent_entry() -> None:
+    cache: LRUCache[str] = LRUCache(2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"
+    cache.put("c", "3")
+    assert "b" not in cache
+    assert "a" in cache and "c" in cache
+    assert cache.stats.evictions == 1
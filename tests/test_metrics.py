@@ -0,0 +1,87 @@
+import json
+import threading
+import time
+import urllib.request
+
+from md2html.cli import build_argument_parser, resolve_configuration
+from md2html.converter import SiteBuilder
+from md2html.devserver import DevServer
+from md2html.metrics import MetricsRegistry
+from md2html.theme import ThemeManager
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    registry.counter("jobs_total", "Jobs.", labelnames=("kind",)).inc(2, kind='a"b')
+    histogram = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    registry.gauge("queue_depth", "Depth.", callback=lambda: 3)
+
+    assert registry.render().splitlines() == [
+        "# HELP jobs_total Jobs.",
+        "# TYPE jobs_total counter",
+        'jobs_total{kind="a\\"b"} 2',
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1"} 2',
+        'latency_seconds_bucket{le="+Inf"} 2',
+        "latency_seconds_sum 0.55",
+        "latency_seconds_count 2",
+        "# HELP queue_depth Depth.",
+        "# TYPE queue_depth gauge",
+        "queue_depth 3",
+    ]
+    assert registry.as_dict()["latency_seconds"]["count"] == 2
+
+
+def test_build_dumps_metrics_json(tmp_path):
+    source_dir = tmp_path / "docs"
+    source_dir.mkdir()
+    (source_dir / "a.md").write_text("# A\n", encoding="utf-8")
+    (source_dir / "b.md").write_text("# B\n", encoding="utf-8")
+    args = build_argument_parser().parse_args(
+        ["--src", str(source_dir), "--dst", str(tmp_path / "site"), "--metrics-file", "stats/metrics.json"]
+    )
+    config = resolve_configuration(args, cwd=tmp_path)
+    builder = SiteBuilder(config, ThemeManager().load("github"))
+    builder.build_all()
+    (source_dir / "b.md").write_text("# B\n\nEdited.\n", encoding="utf-8")
+    builder.build_all()
+
+    metrics = json.loads((tmp_path / "stats" / "metrics.json").read_text(encoding="utf-8"))
+    assert metrics["md2html_builds_total"] == 2
+    assert metrics["md2html_pages_total"] == {"rendered": 3, "skipped": 1}
+    assert set(metrics["md2html_build_phase_seconds"]) == {"scan", "prepare", "navigation", "render", "static", "write", "finish"}
+    assert metrics["md2html_build_duration_seconds"]["count"] == 2
+
+
+def test_devserver_serves_metrics(tmp_path):
+    source_dir = tmp_path / "docs"
+    source_dir.mkdir()
+    (source_dir / "index.md").write_text("# Home\n", encoding="utf-8")
+    args = build_argument_parser().parse_args(
+        ["--src", str(source_dir), "--dst", str(tmp_path / "site"), "--watch-backend", "polling"]
+    )
+    server = DevServer(resolve_configuration(args, cwd=tmp_path), host="127.0.0.1", port=0, open_browser=False)
+    thread = threading.Thread(target=server.serve, daemon=True)
+    thread.start()
+    try:
+        for _ in range(100):
+            if server._server is not None and server._watch_handler is not None:
+                break
+            time.sleep(0.05)
+        port = server._server.server_address[1]
+        urllib.request.urlopen(f"http://127.0.0.1:{port}/index.html").read()
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/__metrics__") as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            text = response.read().decode("utf-8")
+    finally:
+        server.shutdown()
+        thread.join(timeout=5)
+
+    assert "md2html_builds_total 1" in text
+    assert 'md2html_http_requests_total{code="200"} 1' in text
+    assert "md2html_livereload_clients 0" in text
+    assert "md2html_watch_queue_depth 0" in text
@@ -0,0 +1,87 @@
+import logging
+import re
+
+from md2html.minify import minify_css, minify_html, minify_js
+
+PAGE = """<!DOCTYPE html>
+<html>
+  <head>
+    <!-- generated -->
+    <style>
+      .a > :first-child { margin : 0 ; content: "a  b"; }  /* note */
+      @media (max-width: 960px) { .b { width: calc(100% - 10px); } }
+    </style>
+  </head>
+  <body>
+    <div
+      class="md2html-nav__item"
+      data-title="two  spaces">
+      <p>Some   <strong>bold</strong> <em>text</em>
+        continues&nbsp; here.</p>
+      <pre><code>  indented
+    lines   kept
+</code></pre>
+      <p>Inline <code>a  =  b</code> and <textarea>
+  raw </textarea></p>
+    </div>
+    <script>
+      // comment
+      const value = 1;
+
+      if (value) {
+        console.log('  spaced  ');
+      }
+    </script>
+  </body>
+</html>
+"""
+
+
+def test_minify_keeps_preformatted_content_and_inline_spacing():
+    minified = minify_html(PAGE)
+    assert minified.startswith('<!DOCTYPE html><html><head><style>.a>:first-child{margin : 0;content: "a  b"}')
+    assert "@media (max-width: 960px){.b{width: calc(100% - 10px)}}" in minified
+    assert "generated" not in minified and "note" not in minified
+    assert '<div class="md2html-nav__item" data-title="two  spaces"><p>Some <strong>bold</strong> <em>text</em> continues' in minified
+    assert "continues&nbsp; here.</p>" in minified
+    assert "<pre><code>  indented\n    lines   kept\n</code></pre>" in minified
+    assert "<code>a  =  b</code> and <textarea>\n  raw </textarea></p></div>" in minified
+    assert "<script>const value = 1;\nif (value) {\nconsole.log('  spaced  ');\n}</script></body></html>" in minified
+    assert minify_html(minified) == minified
+
+
+def test_css_and_js_helpers_leave_risky_input_alone():
+    assert minify_css("a::after { content: '/* x */' ; }") == "a::after{content: '/* x */'}"
+    assert minify_css('a::after{content:";}" ;}') == 'a::after{content:";}"}'
+    template = "const html = `\n  <p>keep</p>\n`;\n"
+    assert minify_js(template) == template
+
+
+def test_raw_html_inside_a_paragraph_keeps_word_spacing():
+    html = (
+        "<p>foo <script>track()</script> bar <style>b{}</style> baz</p>\n"
+        "<p>line <br>\n next <template data-md2html-hide-body>\n<b>x</b>\n</template> end</p>\n"
+    )
+    assert minify_html(html) == (
+        "<p>foo <script>track()</script> bar <style>b{}</style> baz</p>"
+        "<p>line <br> next <template data-md2html-hide-body> <b>x</b> </template> end</p>"
+    )
+
+
+def test_build_minifies_pages_and_reports_the_savings(tmp_path, caplog, make_builder):
+    source_dir = tmp_path / "docs"
+    source_dir.mkdir()
+    (source_dir / "index.md").write_text(
+        "# Home\n\n::: hide Details\n```python\ndef f():\n    return  1\n```\n:::\n", encoding="utf-8"
+    )
+    pages = {}
+    for minify in (False, True):
+        builder = make_builder(source_dir=source_dir, output_dir=tmp_path / str(minify), minify_html=minify)
+        with caplog.at_level(logging.INFO, logger="md2html.converter"):
+            pages[minify] = builder.build_all()[0].html
+    assert len(pages[True]) < 0.9 * len(pages[False])
+    highlighted = [re.search(r"<pre>.*?</pre>", page, re.DOTALL).group(0) for page in (pages[False], pages[True])]
+    assert highlighted[0] == highlighted[1]
+    saved = builder.metrics.minify_saved_bytes.value()
+    assert saved == len(pages[False].encode("utf-8")) - len(pages[True].encode("utf-8"))
+    assert any(record.getMessage().startswith("Minified HTML:") for record in caplog.records)
@@ -0,0 +1,53 @@
+import tarfile
+import zipfile
+
+import pytest  # type: ignore[import]
+
+from md2html.output import archive_format
+
+
+def _make_sources(tmp_path):
+    source_dir = tmp_path / "docs"
+    (source_dir / "guide").mkdir(parents=True)
+    (source_dir / "index.md").write_text("# Home\n", encoding="utf-8")
+    (source_dir / "guide" / "intro.md").write_text("# Intro\n", encoding="utf-8")
+    (source_dir / "guide" / "logo.svg").write_text("<svg/>", encoding="utf-8")
+    return source_dir
+
+
+def test_archive_format_from_suffix(tmp_path):
+    assert archive_format(tmp_path / "site.tar") == ("tar", None)
+    assert archive_format(tmp_path / "site.tgz") == ("tar", "gz")
+    assert archive_format(tmp_path / "site.tar.zst") == ("tar", "zst")
+    assert archive_format(tmp_path / "site.zip") == ("zip", None)
+    with pytest.raises(ValueError):
+        archive_format(tmp_path / "site.rar")
+
+
+@pytest.mark.parametrize("name", ["site.tar", "site.tar.gz", "site.zip"])
+def test_archive_output_is_deterministic(tmp_path, name, make_builder):
+    archive = tmp_path / name
+    builder = make_builder(source_dir=_make_sources(tmp_path), output_dir=tmp_path / "html", archive=archive)
+    builder.build_all()
+    first = archive.read_bytes()
+    builder.build_all()
+
+    assert archive.read_bytes() == first
+    assert not (tmp_path / "html").exists()
+    if name.endswith(".zip"):
+        with zipfile.ZipFile(archive) as handle:
+            members = handle.namelist()
+            assert handle.read("guide/logo.svg") == b"<svg/>"
+    else:
+        with tarfile.open(archive) as handle:
+            members = handle.getnames()
+            assert {member.mtime for member in handle.getmembers()} == {315532800}
+    assert members == ["guide/intro.html", "guide/logo.svg", "index.html"]
+
+
+def test_directory_writer_records_outputs(tmp_path, make_builder):
+    builder = make_builder(source_dir=_make_sources(tmp_path), output_dir=tmp_path / "html")
+    builder.build_all()
+    assert set(builder.writer.records) == {"guide/intro.html", "guide/logo.svg", "index.html"}
+    assert builder.writer.records["guide/logo.svg"].size == len(b"<svg/>")
+    assert (tmp_path / "html" / "guide" / "intro.html").exists()
@@ -0,0 +1,76 @@
+from wsgiref.util import setup_testing_defaults
+
+from md2html.wsgi import create_app
+
+GUIDE = (
+    "# Guide\n\nIntro.\n\n"
+    "## Install\n\n### Details\n\nPip.\n\n"
+    "## Configure `md2html`\n\n::: hide\n## Hidden heading\n:::\n\n### Details\n\nYAML.\n\n"
+    "## Deploy\n\n### Details\n\nCI.\n"
+)
+
+
+def _write_sources(tmp_path, pages):
+    source_dir = tmp_path / "docs"
+    source_dir.mkdir(parents=True, exist_ok=True)
+    for name, text in pages.items():
+        (source_dir / name).write_text(text, encoding="utf-8")
+    return source_dir
+
+
+def test_documents_split_at_the_configured_heading_level(tmp_path, make_builder):
+    source_dir = _write_sources(tmp_path, {"guide.md": GUIDE, "other.md": "# Other\n\n## One\n\n## Two\n"})
+    builder = make_builder(source_dir=source_dir, output_dir=tmp_path / "site", paginate_level=2)
+    results = {result.url: result for result in builder.build_all()}
+    assert list(results) == ["guide.html", "guide-2.html", "guide-3.html", "other.html", "other-2.html"]
+    first, second, third = results["guide.html"], results["guide-2.html"], results["guide-3.html"]
+    assert [part.url for part in first.parts] == ["guide-2.html", "guide-3.html"]
+    # The introduction stays with the first section; headings inside containers never split.
+    assert "Intro." in first.html and "Pip." in first.html and "YAML." not in first.html
+    assert 'id="hidden-heading"' in second.html
+    # Titles are plain text, whatever markup the heading uses.
+    assert second.metadata["title"] == "Configure md2html - Guide"
+    assert ">Configure md2html<" in third.html
+
+    # Ids are assigned once for the whole document, and the TOC links across pages.
+    assert [entry["slug"] for entry in second.toc if entry["title"] == "Details"] == ["details", "details-1", "details-2"]
+    assert 'href="/guide.html#details"' in second.html and 'href="#details-1"' in second.html
+    assert 'href="/guide-3.html#details-2"' in second.html
+    assert '"details": "guide.html"' in second.html and '"details-1":' not in second.html
+    assert 'rel="prev" href="/guide.html"' in second.html and 'rel="next" href="/guide-3.html"' in second.html
+    assert 'rel="prev"' not in first.html and 'rel="next"' not in third.html
+    assert (tmp_path / "site" / "guide-3.html").is_file()
+
+
+def test_front_matter_and_threshold_choose_what_to_paginate(tmp_path, make_builder):
+    pages = {
+        "guide.md": GUIDE,
+        "short.md": "---\npaginate: false\n---\n# Short\n\n## A\n\n## B\n" + "x" * 400 + "\n",
+        "opt-in.md": "---\npaginate: 3\n---\n# Opt in\n\n## A\n\n### B\n\n### C\n",
+    }
+    source_dir = _write_sources(tmp_path, pages)
+    builder = make_builder(
+        source_dir=source_dir, output_dir=tmp_path / "site", paginate_level=2, paginate_threshold=300
+    )
+    urls = [result.url for result in builder.build_all()]
+    assert urls == ["guide.html", "opt-in.html", "opt-in-2.html", "short.html"]
+
+
+def test_wsgi_serves_later_pages_before_the_first(tmp_path):
+    source_dir = _write_sources(tmp_path, {"guide.md": "---\npaginate: 2\n---\n" + GUIDE})
+    app = create_app(source_dir=source_dir, poll_interval=60)
+    headers = {}
+
+    def get(path):
+        environ = {"PATH_INFO": path}
+        setup_testing_defaults(environ)
+        body = b"".join(app(environ, lambda status, response: headers.update(response, status=status)))
+        return headers["status"], headers.get("X-Md2html-Cache"), body.decode("utf-8")
+
+    status, _, body = get("/guide-3.html")
+    assert status == "200 OK" and "CI." in body
+    assert get("/guide.html")[1] == "hit"  # rendered along with its other pages
+    assert get("/guide-4.html")[0] == "404 Not Found"
+    renders = app.renders
+    assert get("/guide-4.html")[0] == "404 Not Found"
+    assert app.renders == renders  # known to be past the last page until the source changes
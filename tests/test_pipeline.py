@@ -0,0 +1,93 @@
+import os
+import tarfile
+import threading
+import time
+
+import pytest  # type: ignore[import]
+
+from md2html.manifest import BUILD_MANIFEST_NAME
+from md2html.pipeline import WriterPool, prefetch
+
+
+def test_prefetch_keeps_order_and_bounds_read_ahead():
+    consumed = []
+    started = []
+    lock = threading.Lock()
+
+    def read(item):
+        with lock:
+            started.append(item)
+        time.sleep(0.001 * (item % 3))
+        return item * 2
+
+    for item, value in prefetch(range(50), read, threads=4, depth=5):
+        consumed.append(item)
+        with lock:
+            # Never more than `depth` items read ahead of the consumer.
+            assert len(started) - len(consumed) <= 5
+        assert value == item * 2
+    assert consumed == list(range(50))
+
+
+def test_writer_pool_applies_backpressure_and_reports_errors():
+    release = threading.Event()
+    done = []
+    pool = WriterPool(1, 2)
+    pool.submit(release.wait)
+    pool.submit(lambda: done.append(1))
+    pool.submit(lambda: done.append(2))
+    blocked = threading.Thread(target=pool.submit, args=(lambda: done.append(3),))
+    blocked.start()
+    blocked.join(0.2)
+    assert blocked.is_alive()  # the queue is full until the first job finishes
+    release.set()
+    blocked.join()
+    pool.close()
+    assert done == [1, 2, 3]
+
+    failing = WriterPool(2, 4)
+    failing.submit(lambda: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        failing.close()
+
+
+def test_pipelined_build_matches_serial_build(tmp_path, make_builder):
+    source_dir = tmp_path / "docs"
+    for index in range(40):
+        page = source_dir / f"section{index % 4}" / f"page{index}.md"
+        page.parent.mkdir(parents=True, exist_ok=True)
+        page.write_text(f"# Page {index}\n\n" + "text " * index + "\n", encoding="utf-8")
+        (page.parent / f"asset{index}.txt").write_text(str(index), encoding="utf-8")
+
+    make_builder(source_dir=source_dir, output_dir=tmp_path / "serial", io_threads=0).build_all()
+    piped = make_builder(source_dir=source_dir, output_dir=tmp_path / "piped", io_threads=4, pipeline_depth=3)
+    results = piped.build_all()
+    assert [result.url for result in results] == sorted(result.url for result in results)
+    serial = (tmp_path / "serial" / BUILD_MANIFEST_NAME).read_text(encoding="utf-8")
+    assert (tmp_path / "piped" / BUILD_MANIFEST_NAME).read_text(encoding="utf-8") == serial
+
+    # Archives keep a stable member order however many threads there are.
+    names = []
+    for threads in (0, 4):
+        archive = tmp_path / f"site{threads}.tar"
+        make_builder(source_dir=source_dir, archive=archive, io_threads=threads).build_all()
+        with tarfile.open(archive) as tar:
+            names.append(tar.getnames())
+    assert names[0] == names[1]
+
+
+def test_suspect_documents_render_in_workers_during_a_pipelined_build(tmp_path, monkeypatch, make_builder):
+    source_dir = tmp_path / "docs"
+    source_dir.mkdir()
+    for index in range(8):
+        (source_dir / f"page{index}.md").write_text(f"# Page {index}\n", encoding="utf-8")
+    (source_dir / "stars.md").write_text("# Stars\n\n" + "*" * 300 + "\n", encoding="utf-8")
+
+    def fork():
+        raise AssertionError("forked while reader and writer threads are running")
+
+    # Isolated workers must not be forked from the build and its thread pools.
+    monkeypatch.setattr(os, "fork", fork)
+    results = make_builder(source_dir=source_dir, output_dir=tmp_path / "site", io_threads=4).build_all()
+    assert not any(result.error for result in results)
+    assert "Stars" in (tmp_path / "site" / "stars.html").read_text(encoding="utf-8")
@@ -0,0 +1,53 @@
+import json
+import re
+
+from md2html.manifest import BUILD_MANIFEST_NAME
+from md2html.shards import merge_shards
+
+
+def _embedded(script, name):
+    return json.loads(re.search(rf"^const {name} = (.*?);$", script, re.MULTILINE | re.DOTALL).group(1))
+
+
+def test_service_worker_lists_revisions_and_respects_cap(tmp_path, make_builder):
+    source_dir = tmp_path / "docs"
+    source_dir.mkdir()
+    (source_dir / "index.md").write_text("# Home\n", encoding="utf-8")
+    (source_dir / "large.bin").write_bytes(b"\0" * 200_000)
+    (source_dir / "small.bin").write_bytes(b"\0" * 100)
+    site = tmp_path / "site"
+    settings = {"source_dir": source_dir, "output_dir": site, "service_worker": True}
+    make_builder(**settings, service_worker_cache_size="150KB", base_url="/docs").build_all()
+
+    script = (site / "sw.js").read_text(encoding="utf-8")
+    records = json.loads((site / BUILD_MANIFEST_NAME).read_text(encoding="utf-8"))["files"]
+    revisions = _embedded(script, "REVISIONS")
+    assert revisions == {path: info["blob"] for path, info in records.items() if path != "sw.js"}
+    assert _embedded(script, "PRECACHE") == ["index.html", "small.bin"]
+    assert "sw.js" in records
+    assert 'navigator.serviceWorker.register("/docs/sw.js")' in (site / "index.html").read_text(encoding="utf-8")
+
+    # Unchanged outputs keep their revisions, so browsers only refetch what changed.
+    (source_dir / "small.bin").write_bytes(b"\1" * 100)
+    make_builder(**settings, service_worker_cache_size="150KB").build_all()
+    changed = {
+        path
+        for path, blob in _embedded((site / "sw.js").read_text(encoding="utf-8"), "REVISIONS").items()
+        if revisions.get(path) != blob
+    }
+    assert "small.bin" in changed and "large.bin" not in changed
+
+
+def test_merged_shards_get_the_same_service_worker(tmp_path, make_builder):
+    source_dir = tmp_path / "docs"
+    source_dir.mkdir()
+    for index in range(4):
+        (source_dir / f"page{index}.md").write_text(f"# Page {index}\n", encoding="utf-8")
+    make_builder(source_dir=source_dir, output_dir=tmp_path / "full", service_worker=True).build_all()
+    shard_dirs = [tmp_path / f"shard{index}" for index in (1, 2)]
+    for index, shard_dir in enumerate(shard_dirs, start=1):
+        make_builder(source_dir=source_dir, output_dir=shard_dir, service_worker=True, shard=f"{index}/2").build_all()
+        assert not (shard_dir / "sw.js").exists()
+
+    merge_shards(shard_dirs, tmp_path / "merged")
+    assert (tmp_path / "merged" / "sw.js").read_bytes() == (tmp_path / "full" / "sw.js").read_bytes()
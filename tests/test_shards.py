@@ -0,0 +1,61 @@
+import json
+
+import pytest  # type: ignore[import]
+
+from md2html.shards import SHARD_MANIFEST_NAME, ShardMergeError, ShardSpec, merge_shards
+
+
+def _make_sources(root):
+    source_dir = root / "docs"
+    (source_dir / "guide").mkdir(parents=True)
+    for index in range(6):
+        (source_dir / f"page{index}.md").write_text(f"# Page {index}\n\n" + "x" * index * 100, encoding="utf-8")
+    (source_dir / "guide" / "intro.md").write_text("# Intro\n", encoding="utf-8")
+    (source_dir / "guide" / "image.png").write_bytes(b"\x89PNG")
+    return source_dir
+
+
+def _tree(root):
+    return {
+        path.relative_to(root).as_posix(): path.read_bytes()
+        for path in root.rglob("*")
+        if path.is_file() and path.name != SHARD_MANIFEST_NAME
+    }
+
+
+def test_shard_spec_parse():
+    assert ShardSpec.parse("2/4") == ShardSpec(2, 4)
+    with pytest.raises(ValueError):
+        ShardSpec.parse("5/4")
+    with pytest.raises(ValueError):
+        ShardSpec.parse("2")
+
+
+def test_sharded_build_merges_into_full_site(tmp_path, make_builder):
+    source_dir = _make_sources(tmp_path)
+    make_builder(source_dir=source_dir, output_dir=tmp_path / "full").build_all()
+    shard_dirs = [tmp_path / f"shard{index}" for index in range(1, 4)]
+    for index, shard_dir in enumerate(shard_dirs, start=1):
+        make_builder(source_dir=source_dir, output_dir=shard_dir, shard=f"{index}/3").build_all()
+
+    owned = [set(json.loads((d / SHARD_MANIFEST_NAME).read_text("utf-8"))["files"]) for d in shard_dirs]
+    assert all(owned)
+    assert not owned[0] & owned[1] and not owned[1] & owned[2]
+
+    merge_shards(shard_dirs, tmp_path / "merged")
+    assert _tree(tmp_path / "merged") == _tree(tmp_path / "full")
+
+
+def test_merge_rejects_colliding_outputs(tmp_path, make_builder):
+    source_dir = _make_sources(tmp_path)
+    first, second = tmp_path / "a", tmp_path / "b"
+    make_builder(source_dir=source_dir, output_dir=first, shard="1/2").build_all()
+    make_builder(source_dir=source_dir, output_dir=second, shard="2/2").build_all()
+    manifest_path = second / SHARD_MANIFEST_NAME
+    manifest = json.loads(manifest_path.read_text("utf-8"))
+    stolen = next(iter(json.loads((first / SHARD_MANIFEST_NAME).read_text("utf-8"))["files"].items()))
+    manifest["files"][stolen[0]] = stolen[1]
+    manifest_path.write_text(json.dumps(manifest), encoding="utf-8")
+
+    with pytest.raises(ShardMergeError):
+        merge_shards([first, second], tmp_path / "merged")
@@ -1,7 +1,10 @@
+import re
 from pathlib import Path
 
-from md2html.config import AppConfig
-from md2html.converter import SiteBuilder
+import pytest  # type: ignore[import]
+
+from md2html.config import AppConfig, load_config
+from md2html.converter import MarkdownRenderer, SiteBuilder, build_variants
 from md2html.theme import ThemeManager
 
 
@@ -28,3 +31,146 @@ def test_site_builder_respects_ignore(tmp_path):
     assert {result.source for result in results} == {keep_file}
     assert (output_dir / "keep.html").exists()
     assert not any("mianshiya" in str(path) for path in output_dir.rglob("*"))
+
+
+def test_variant_builder_shares_parse_between_outputs(tmp_path, monkeypatch):
+    source_dir = tmp_path / "docs"
+    source_dir.mkdir()
+    (source_dir / "page.md").write_text("# Page\n\n::: hide 更多\n秘密\n:::\n", encoding="utf-8")
+
+    config = AppConfig()
+    config.apply_updates(
+        {
+            "source_dir": source_dir,
+            "output_dir": tmp_path / "full",
+            "variants": [
+                {"name": "full"},
+                {"name": "hide", "output_dir": tmp_path / "hide", "exclude_hide": True},
+            ],
+        }
+    )
+
+    parse_calls = []
+    original_parse = MarkdownRenderer.parse
+
+    def counting_parse(self, text, **kwargs):
+        parse_calls.append(text)
+        return original_parse(self, text, **kwargs)
+
+    monkeypatch.setattr(MarkdownRenderer, "parse", counting_parse)
+    results = build_variants(config)
+
+    assert len(results) == 2
+    assert len(parse_calls) == 1
+    assert "秘密" in (tmp_path / "full" / "page.html").read_text(encoding="utf-8")
+    assert "秘密" not in (tmp_path / "hide" / "page.html").read_text(encoding="utf-8")
+
+
+def test_variants_must_not_share_output_dir(tmp_path):
+    config = AppConfig()
+    config.apply_updates({"source_dir": tmp_path, "variants": [{"name": "a"}, {"name": "b"}]})
+
+    with pytest.raises(ValueError):
+        build_variants(config)
+
+
+def test_variant_paths_resolve_against_the_config_file(tmp_path, monkeypatch):
+    project = tmp_path / "project"
+    project.mkdir()
+    config_path = project / "md2html.config.yaml"
+    config_path.write_text(
+        "variants:\n"
+        "  - name: beta\n"
+        "    source_dir: beta-docs\n"
+        "    output_dir: site/beta\n"
+        "    archive: dist/beta.zip\n"
+        "    metrics_file: reports/metrics.json\n"
+        "    weight_report: reports/weight.json\n"
+        "    image_cache: cache/images.json\n"
+        "    theme_dirs: [themes]\n",
+        encoding="utf-8",
+    )
+    monkeypatch.chdir(tmp_path)
+    config = AppConfig()
+    config.apply_updates(load_config(config_path), base_path=project)
+
+    [(name, variant)] = config.resolve_variants()
+    assert name == "beta"
+    assert variant.source_dir == project / "beta-docs"
+    assert variant.output_dir == project / "site" / "beta"
+    assert variant.archive == project / "dist" / "beta.zip"
+    assert variant.metrics_file == project / "reports" / "metrics.json"
+    assert variant.weight_report == project / "reports" / "weight.json"
+    assert variant.image_cache == project / "cache" / "images.json"
+    assert variant.theme_dirs == [project / "themes"]
+
+
+def test_navigation_is_shared_and_indexed(tmp_path, make_builder):
+    source_dir = tmp_path / "docs"
+    (source_dir / "guide" / "advanced").mkdir(parents=True)
+    (source_dir / "index.md").write_text("# Home\n", encoding="utf-8")
+    (source_dir / "guide" / "intro.md").write_text("# Intro\n", encoding="utf-8")
+    (source_dir / "guide" / "advanced" / "tips.md").write_text("# Tips\n", encoding="utf-8")
+
+    builder = make_builder(source_dir=source_dir, output_dir=tmp_path / "build")
+    navigation = builder._build_navigation_structure(builder.scan_sources())
+
+    trail = navigation.trail(["guide", "advanced", "tips"])
+    assert [node.title for node in trail] == ["guide", "advanced", "Tips"]
+    assert trail[-1].segments is navigation.find(("guide", "advanced", "tips")).segments
+    assert trail[1] is trail[0].children[0]
+    with pytest.raises(AttributeError):
+        trail[0].title = "Changed"
+
+    builder.build_all()
+    html = (tmp_path / "build" / "guide" / "advanced" / "tips.html").read_text(encoding="utf-8")
+    assert 'md2html-nav__item md2html-nav__item--active' in html
+
+
+def test_navigation_sorts_by_front_matter_order(tmp_path, make_builder):
+    source_dir = tmp_path / "docs"
+    source_dir.mkdir()
+    (source_dir / "alpha.md").write_text("---\norder: 3\n---\n# Alpha\n", encoding="utf-8")
+    (source_dir / "beta.md").write_text("---\nweight: 1\n---\n# Beta\n", encoding="utf-8")
+    (source_dir / "gamma.md").write_text("# Gamma\n", encoding="utf-8")
+
+    builder = make_builder(source_dir=source_dir, output_dir=tmp_path / "build", nav_sort="order")
+    entries = builder.scan_sources()
+
+    assert [node.name for node in builder._build_navigation_structure(entries)] == ["beta", "alpha", "gamma"]
+    assert [node.name for node in builder._build_navigation_structure(entries, order="desc")] == ["alpha", "beta", "gamma"]
+
+    # The browser's order toggle keeps the entries marked here at the end.
+    guide = source_dir / "guide"
+    guide.mkdir()
+    for path in list(source_dir.glob("*.md")):
+        path.rename(guide / path.name)
+    (guide / "index.md").write_text("---\norder: 0\n---\n# Guide\n", encoding="utf-8")
+    builder.build_all()
+    html = (tmp_path / "build" / "guide" / "beta.html").read_text(encoding="utf-8")
+    assert set(re.findall(r'data-nav-name="([^"]+)"\s+data-nav-sorts-last', html)) == {"guide/gamma"}
+
+
+def test_instant_navigation_prefetches_neighbours(tmp_path, make_builder):
+    source_dir = tmp_path / "docs"
+    (source_dir / "guide" / "advanced").mkdir(parents=True)
+    (source_dir / "guide" / "intro.md").write_text("# Intro\n", encoding="utf-8")
+    (source_dir / "guide" / "advanced" / "tips.md").write_text("# Tips\n", encoding="utf-8")
+    (source_dir / "guide" / "zoo.md").write_text("# Zoo\n", encoding="utf-8")
+
+    settings = {"source_dir": source_dir, "output_dir": tmp_path / "build", "base_url": "/docs"}
+    builder = make_builder(**settings)
+    navigation = builder._build_navigation_structure(builder.scan_sources())
+    previous, following = navigation.neighbours(["guide", "intro"])
+    assert (previous.title, following.title) == ("Tips", "Zoo")
+    assert navigation.neighbours(["guide", "advanced", "tips"])[0] is None
+    assert navigation.neighbours(["missing"]) == (None, None)
+
+    builder.build_all()
+    assert 'rel="prefetch"' not in (tmp_path / "build" / "guide" / "intro.html").read_text(encoding="utf-8")
+    make_builder(**settings, instant_navigation=True).build_all()
+    html = (tmp_path / "build" / "guide" / "intro.html").read_text(encoding="utf-8")
+    assert '<link rel="prefetch" href="/docs/guide/advanced/tips.html" />' in html
+    assert '<link rel="prefetch" href="/docs/guide/zoo.html" />' in html
+    assert 'data-md2html-nav-scope="guide"' in html
+    assert "function initInstantNavigation()" in html
@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+
+# Cumulative import time allowed for `md2html.cli`, in microseconds. The
+# rendering stack (markdown-it, Jinja2, Pygments, watchdog) alone costs more.
+CLI_IMPORT_BUDGET_US = 150_000
+HEAVY_MODULES = {"markdown_it", "mdit_py_plugins", "jinja2", "pygments", "watchdog", "yaml"}
+
+
+def _import_times(module: str) -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(SRC_DIR), env.get("PYTHONPATH")]))
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:") :].split("|"))
+        if cumulative.isdigit():
+            times[name] = int(cumulative)
+    return times
+
+
+def test_cli_import_skips_heavy_dependencies():
+    imported = {name.split(".")[0] for name in _import_times("md2html.cli")}
+    assert not imported & HEAVY_MODULES
+
+
+def test_converter_import_defers_watch_and_syntax_dependencies():
+    imported = {name.split(".")[0] for name in _import_times("md2html.converter")}
+    assert not imported & {"watchdog", "pygments", "mdit_py_plugins"}
+
+
+def test_cli_import_time_budget():
+    # Take the best of a few runs to keep the budget robust on noisy machines.
+    best = min(_import_times("md2html.cli")["md2html.cli"] for _ in range(3))
+    assert best < CLI_IMPORT_BUDGET_US, f"md2html.cli import took {best}us"
@@ -0,0 +1,115 @@
+import os
+import shutil
+
+from md2html.cli import build_argument_parser, resolve_configuration
+from md2html.converter import SiteBuilder, _WatchHandler
+from md2html.theme import ThemeManager
+from md2html.watcher import PollingWatcher, SettingsWatcher, create_observer, diff_snapshots, take_snapshot
+
+
+def test_snapshot_diff_reports_moves_and_prunes_ignored(tmp_path):
+    (tmp_path / "skip").mkdir()
+    (tmp_path / "skip" / "a.md").write_text("a", encoding="utf-8")
+    (tmp_path / "b.md").write_text("b", encoding="utf-8")
+    (tmp_path / "c.md").write_text("c", encoding="utf-8")
+    ignore = lambda path: path.endswith(os.sep + "skip")  # noqa: E731
+
+    before = take_snapshot(tmp_path, ignore)
+    assert sorted(os.path.basename(path) for path in before) == ["b.md", "c.md"]
+
+    (tmp_path / "b.md").rename(tmp_path / "renamed.md")
+    os.utime(tmp_path / "c.md", ns=(0, 10**9))
+    (tmp_path / "skip" / "a.md").write_text("changed", encoding="utf-8")
+    events = diff_snapshots(before, take_snapshot(tmp_path, ignore))
+
+    assert [(event.event_type, os.path.basename(event.src_path)) for event in events] == [
+        ("moved", "b.md"),
+        ("modified", "c.md"),
+    ]
+    assert events[0].dest_path == str(tmp_path / "renamed.md")
+
+
+def test_polling_watcher_feeds_rebuild_path(tmp_path, make_builder):
+    source_dir = tmp_path / "docs"
+    source_dir.mkdir()
+    (source_dir / "page.md").write_text("# Page\n", encoding="utf-8")
+    builder = make_builder(
+        source_dir=source_dir, output_dir=tmp_path / "build", watch_backend="polling", poll_interval=0.1
+    )
+    builder.build_all()
+    rebuilt = []
+    watcher = create_observer(builder, _WatchHandler(builder, on_rebuild=rebuilt.append))
+    assert isinstance(watcher, PollingWatcher) and watcher.interval == 0.1
+
+    watcher._snapshot = take_snapshot(source_dir)
+    (source_dir / "page.md").write_text("# Page\n\nPolled change.\n", encoding="utf-8")
+    (source_dir / "other.md").write_text("# Other\n", encoding="utf-8")
+    (source_dir / "logo.svg").write_text("<svg/>", encoding="utf-8")
+    events = watcher.poll()
+
+    assert len(events) == 3
+    # Both Markdown changes are covered by a single full rebuild.
+    assert sorted(path.name for path in rebuilt) in (["logo.svg", "other.md"], ["logo.svg", "page.md"])
+    assert "Polled change." in (tmp_path / "build" / "page.html").read_text(encoding="utf-8")
+    assert (tmp_path / "build" / "logo.svg").exists()
+
+
+def test_polling_watcher_ignore_cache_follows_the_tree_and_the_rules(tmp_path):
+    (tmp_path / "keep.md").write_text("keep", encoding="utf-8")
+    (tmp_path / "drafts").mkdir()
+    rules = ["drafts"]
+    calls = []
+
+    def should_ignore(path):
+        calls.append(path.name)
+        return path.name in rules
+
+    watcher = PollingWatcher(tmp_path, None, should_ignore=should_ignore, ignore_key=lambda: tuple(rules))
+    watcher._prime()
+    assert sorted(calls) == ["drafts", "keep.md"]
+
+    for index in range(5):
+        (tmp_path / f"tmp{index}.swp").write_text("x", encoding="utf-8")
+        watcher._take_snapshot()
+        (tmp_path / f"tmp{index}.swp").unlink()
+    watcher._take_snapshot()
+    # Only paths of the latest walk are remembered; known ones were not asked again.
+    assert sorted(os.path.basename(path) for path in watcher._ignore_cache) == ["drafts", "keep.md"]
+    assert calls.count("keep.md") == 1
+
+    # Reloaded rules drop every cached answer.
+    rules[:] = []
+    assert sorted(os.path.basename(path) for path in watcher._take_snapshot()) == ["keep.md"]
+    assert calls.count("keep.md") == 2 and calls.count("drafts") == 2
+
+
+def test_settings_watcher_reloads_theme_and_config(tmp_path):
+    theme_dir = tmp_path / "mytheme"
+    shutil.copytree(ThemeManager().load("github").root, theme_dir)
+    source_dir = tmp_path / "docs"
+    source_dir.mkdir()
+    (source_dir / "page.md").write_text("# Page\n", encoding="utf-8")
+    config_file = tmp_path / "site.yaml"
+    config_file.write_text(f"source_dir: docs\noutput_dir: build\ntheme: {theme_dir}\n", encoding="utf-8")
+
+    args = build_argument_parser().parse_args(["--config", str(config_file)])
+    config = resolve_configuration(args, cwd=tmp_path)
+    builder = SiteBuilder(config, ThemeManager().load(config.theme))
+    builder.build_all()
+    handler = _WatchHandler(builder, reload_config=lambda: resolve_configuration(args, cwd=tmp_path))
+    watcher = SettingsWatcher(builder, handler, config_path=config.config_path)
+    watcher._prime()
+    page = tmp_path / "build" / "page.html"
+
+    with (theme_dir / "styles.css").open("a", encoding="utf-8") as handle:
+        handle.write("\n.hot-reloaded-style { color: red; }\n")
+    assert watcher.poll() == theme_dir / "styles.css"
+    assert ".hot-reloaded-style" in page.read_text(encoding="utf-8")
+    # Only the template changed, so the rendered Markdown fragment was reused.
+    assert builder.fragment_cache.stats.hits == 1
+
+    config_file.write_text(config_file.read_text(encoding="utf-8") + "metadata:\n  title: Reloaded Site\n", encoding="utf-8")
+    assert watcher.poll() == config_file
+    assert builder.config.metadata["title"] == "Reloaded Site"
+    assert "Reloaded Site" in page.read_text(encoding="utf-8")
+    assert watcher.poll() is None
@@ -0,0 +1,59 @@
+import json
+
+import pytest  # type: ignore[import]
+
+from md2html.regions import find_element_spans
+from md2html.weight import BudgetExceededError, measure_page
+
+
+def test_measure_page_splits_parts():
+    html = (
+        "<html><head><style>a{}</style><script src='x.js'></script></head><body>"
+        "<nav><a>n</a></nav><div data-md2html-toc><div>t</div></div>"
+        "<article><p>body</p><script>1</script></article><script>go()</script></body></html>"
+    )
+    weight = measure_page("page.html", html)
+    assert weight.total == len(html)
+    assert weight.parts["css"] == len("<style>a{}</style>")
+    assert weight.parts["js"] == len("<script>go()</script>")
+    assert weight.parts["navigation"] == len("<nav><a>n</a></nav>")
+    assert weight.parts["toc"] == len("<div data-md2html-toc><div>t</div></div>")
+    # Scripts inside the article belong to the content.
+    assert weight.parts["content"] == len("<article><p>body</p><script>1</script></article>")
+    assert sum(weight.parts.values()) == weight.total
+
+
+def test_element_spans_count_only_newlines_as_line_breaks():
+    html = "<body>\n<p>a\rb\x0cc\u2028d</p>\n<nav>\n<a>n</a>\n</nav>\r\n<article>x</article></body>"
+    spans = find_element_spans(html, lambda tag, attrs: tag if tag in ("nav", "article") else None)
+    assert [html[span.start : span.end] for span in spans] == ["<nav>\n<a>n</a>\n</nav>", "<article>x</article>"]
+    assert [html[span.inner_start : span.inner_end] for span in spans] == ["\n<a>n</a>\n", "x"]
+
+
+def test_build_reports_weight_and_enforces_budgets(tmp_path, make_builder):
+    source_dir = tmp_path / "docs"
+    source_dir.mkdir()
+    (source_dir / "small.md").write_text("# Small\n", encoding="utf-8")
+    (source_dir / "large.md").write_text("# Large\n\n" + "word " * 20000 + "\n", encoding="utf-8")
+    (source_dir / "data.bin").write_bytes(b"\0" * 1000)
+    report_path = tmp_path / "weight.json"
+    builder = make_builder(
+        source_dir=source_dir, output_dir=tmp_path / "site", weight_report=report_path, page_budget="100KB"
+    )
+    config = builder.config
+
+    with pytest.raises(BudgetExceededError):
+        builder.build_all()
+    report = json.loads(report_path.read_text(encoding="utf-8"))
+    assert [page["url"] for page in report["pages"]] == ["large.html", "small.html"]
+    assert report["violations"] == [f"large.html is {report['pages'][0]['total'] / 1024:.1f} KB, over the page budget of 100.0 KB"]
+    assert report["totals"]["assets"] == 1000
+    assert report["totals"]["site"] == report["totals"]["html"] + 1000
+    assert report["pages"][0]["content"] > 100_000
+
+    config.apply_updates({"page_budget": "1MB", "site_budget": 1024})
+    with pytest.raises(BudgetExceededError):
+        builder.build_all()
+    config.apply_updates({"site_budget": "10MB"})
+    builder.build_all()
+    assert json.loads(report_path.read_text(encoding="utf-8"))["violations"] == []
@@ -0,0 +1,68 @@
+import os
+from wsgiref.util import setup_testing_defaults
+
+from md2html.wsgi import create_app
+
+
+def _get(app, path, **environ):
+    environ.update(PATH_INFO=path)
+    setup_testing_defaults(environ)
+    captured = {}
+
+    def start_response(status, headers):
+        captured["status"] = status
+        captured["headers"] = dict(headers)
+
+    body = b"".join(app(environ, start_response))
+    return captured["status"], captured["headers"], body
+
+
+def test_wsgi_app_renders_lazily_and_revalidates_by_mtime(tmp_path):
+    source_dir = tmp_path / "docs"
+    (source_dir / "Guide").mkdir(parents=True)
+    page = source_dir / "Guide" / "Getting Started.md"
+    page.write_text("# Start\n\nFirst.\n", encoding="utf-8")
+    (source_dir / "Guide" / "index.md").write_text("# Guide\n", encoding="utf-8")
+    (source_dir / "logo.svg").write_text("<svg/>", encoding="utf-8")
+    app = create_app(source_dir=source_dir, poll_interval=60)
+
+    status, headers, body = _get(app, "/guide/getting-started.html")
+    assert status == "200 OK" and headers["X-Md2html-Cache"] == "miss"
+    assert "First." in body.decode("utf-8")
+    assert _get(app, "/guide/getting-started.html")[1]["X-Md2html-Cache"] == "hit"
+    assert _get(app, "/guide/getting-started.html", HTTP_IF_NONE_MATCH=headers["ETag"])[0] == "304 Not Modified"
+
+    page.write_text("# Start\n\nSecond.\n", encoding="utf-8")
+    os.utime(page, ns=(0, 10**9))
+    status, headers, body = _get(app, "/guide/getting-started.html")
+    assert headers["X-Md2html-Cache"] == "miss" and "Second." in body.decode("utf-8")
+
+    assert _get(app, "/logo.svg")[1]["Content-Type"] == "image/svg+xml"
+    assert _get(app, "/guide")[1]["Location"] == "/guide/"
+    assert _get(app, "/guide/")[0] == "200 OK"
+    assert _get(app, "/Guide/Getting Started.md")[0] == "404 Not Found"
+    assert app.stats() == {
+        "hits": 2,
+        "misses": 3,
+        "stale": 1,
+        "renders": 3,
+        "evictions": 0,
+        "entries": 2,
+        "bytes": app.cache.weight,
+    }
+
+
+def test_wsgi_page_cache_is_bounded_by_bytes(tmp_path):
+    source_dir = tmp_path / "docs"
+    source_dir.mkdir()
+    for name in ("a", "b", "c"):
+        (source_dir / f"{name}.md").write_text(f"# {name}\n", encoding="utf-8")
+    app = create_app(source_dir=source_dir, poll_interval=60)
+    page_size = len(_get(app, "/a.html")[2])
+    app.cache.max_weight = page_size * 2 + page_size // 2
+
+    for name in ("b", "c"):
+        _get(app, f"/{name}.html")
+    assert len(app.cache) == 2 and app.cache.weight <= app.cache.max_weight
+    assert app.stats()["evictions"] == 1
+    assert _get(app, "/a.html")[1]["X-Md2html-Cache"] == "miss"